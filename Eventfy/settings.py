@@ -184,3 +184,42 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
 }
+
+# Cache partagé entre les processus (salle d'attente, facettes, agrégats de carte).
+# Sans REDIS_URL, cache local à chaque processus : réservé au développement.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Compteur de vues des événements : le tampon en mémoire est écrit par lots
+EVENT_VIEWS_FLUSH_INTERVAL = config('EVENT_VIEWS_FLUSH_INTERVAL', default=10, cast=int)  # secondes
+EVENT_VIEWS_FLUSH_SIZE = config('EVENT_VIEWS_FLUSH_SIZE', default=1000, cast=int)  # vues
+
+# Autocomplétion : index en mémoire reconstruit périodiquement (écritures des autres processus)
+AUTOCOMPLETE_REBUILD_INTERVAL = config('AUTOCOMPLETE_REBUILD_INTERVAL', default=300, cast=int)  # secondes
+
+# Facettes de la page de recherche : durée de mise en cache par combinaison de filtres
+FACETS_CACHE_TTL = config('FACETS_CACHE_TTL', default=30, cast=int)  # secondes
+
+# Agrégats de la carte : invalidés à chaque modification, la durée ne sert que de garde-fou
+MAP_CLUSTERS_CACHE_TTL = config('MAP_CLUSTERS_CACHE_TTL', default=3600, cast=int)  # secondes
+
+# Places retenues pendant la finalisation d'une inscription : durée de validité
+SEAT_HOLD_TTL = config('SEAT_HOLD_TTL', default=600, cast=int)  # secondes
+
+# Exports en arrière-plan : un job 'running' sans signe de vie depuis ce délai est repris
+EXPORT_JOB_LEASE = config('EXPORT_JOB_LEASE', default=600, cast=int)  # secondes
+
+# Salle d'attente : durée pendant laquelle un jeton admis permet de s'inscrire
+WAITING_ROOM_ADMISSION_WINDOW = config('WAITING_ROOM_ADMISSION_WINDOW', default=300, cast=int)  # secondes
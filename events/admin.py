@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.db.models import Min
 from django.utils.html import format_html
-from .models import Category, Event, EventRegistration, EventImage, EventComment
+from .models import Category, Event, EventRegistration, EventImage, EventComment, ExportJob, GeocodeCache
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -20,6 +21,20 @@ class CategoryAdmin(admin.ModelAdmin):
         return obj.event_set.count()
     event_count.short_description = 'Nombre d\'événements'
 
+class CityListFilter(admin.SimpleListFilter):
+    """Filtre par ville sur la forme canonique : une entrée par ville, quelle que soit la graphie"""
+    title = 'ville'
+    parameter_name = 'city_key'
+    
+    def lookups(self, request, model_admin):
+        cities = Event.objects.order_by('city_key').values('city_key').annotate(label=Min('city'))
+        return [(city['city_key'], city['label'].strip()) for city in cities if city['city_key']]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(city_key=self.value())
+        return queryset
+
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = [
@@ -27,7 +42,7 @@ class EventAdmin(admin.ModelAdmin):
         'city', 'status', 'is_featured', 'participant_count', 'is_full_display'
     ]
     list_filter = [
-        'status', 'category', 'city', 'is_free', 'is_featured', 
+        'status', 'category', CityListFilter, 'is_free', 'is_featured', 
         'start_date', 'created_at'
     ]
     search_fields = ['title', 'description', 'location', 'city', 'organizer__username']
@@ -43,7 +58,7 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('start_date', 'end_date')
         }),
         ('Localisation', {
-            'fields': ('location', 'address', 'city', 'postal_code', 'country')
+            'fields': ('location', 'address', 'city', 'postal_code', 'country', 'latitude', 'longitude')
         }),
         ('Détails', {
             'fields': ('max_participants', 'is_free', 'price', 'organizer')
@@ -63,7 +78,7 @@ class EventAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'published_at', 'current_participants']
     
     def participant_count(self, obj):
-        return f"{obj.current_participants}/{obj.max_participants or '∞'}"
+        return f"{obj.participant_count}/{obj.max_participants or '∞'}"
     participant_count.short_description = 'Participants'
     
     def is_full_display(self, obj):
@@ -92,11 +107,11 @@ class EventRegistrationAdmin(admin.ModelAdmin):
             'fields': ('event', 'user', 'status')
         }),
         ('Détails', {
-            'fields': ('notes', 'registration_date')
+            'fields': ('notes', 'seat', 'registration_date')
         }),
     )
     
-    readonly_fields = ['registration_date']
+    readonly_fields = ['seat', 'registration_date']
     
     def event_date(self, obj):
         return obj.event.start_date
@@ -145,3 +160,18 @@ class EventCommentAdmin(admin.ModelAdmin):
     def content_preview(self, obj):
         return obj.content[:100] + "..." if len(obj.content) > 100 else obj.content
     content_preview.short_description = 'Contenu'
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'scope', 'event', 'format', 'status', 'progress', 'created_at']
+    list_filter = ['status', 'scope', 'format', 'created_at']
+    search_fields = ['user__username', 'event__title']
+    ordering = ['-created_at']
+    readonly_fields = ['total_rows', 'processed_rows', 'file', 'error', 'created_at', 'started_at', 'finished_at']
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['query', 'latitude', 'longitude', 'source', 'created_at']
+    list_filter = ['source']
+    search_fields = ['query']
+    readonly_fields = ['key', 'query', 'created_at']
@@ -0,0 +1,174 @@
+import atexit
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+# Précision du sketch HyperLogLog : 2**10 registres d'un octet (~3 % d'erreur)
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+
+class HyperLogLog:
+    """Estimation compacte du nombre de visiteurs uniques (1 Ko par événement)"""
+
+    def __init__(self, registers=None):
+        if registers:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(HLL_REGISTERS)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - HLL_PRECISION)
+        remaining = hashed & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = (64 - HLL_PRECISION) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+        estimate = alpha * HLL_REGISTERS ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros:
+            # Petites cardinalités : comptage linéaire
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+class ViewBuffer:
+    """
+    Tampon de vues local au processus. Les vues sont accumulées en mémoire et
+    écrites par lots dans EventViewStats, jamais sur la ligne Event. L'écriture
+    est faite par un thread dédié, jamais dans la requête qui lit l'événement.
+    """
+
+    # Fréquence à laquelle le thread d'écriture vérifie l'échéance du lot
+    POLL_INTERVAL = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.counts = defaultdict(int)
+        self.sketches = {}
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.worker_pid = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'EVENT_VIEWS_FLUSH_INTERVAL', 10)
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'EVENT_VIEWS_FLUSH_SIZE', 1000)
+
+    def record(self, event_id, visitor):
+        with self.lock:
+            self.counts[event_id] += 1
+            if event_id not in self.sketches:
+                self.sketches[event_id] = HyperLogLog()
+            self.sketches[event_id].add(visitor)
+            self.pending += 1
+            full = self.pending >= self.flush_size
+        self.start()
+        if full:
+            self.wakeup.set()
+
+    def start(self):
+        """Démarrer le thread d'écriture du processus courant (relancé après un fork)"""
+        if self.worker_pid == os.getpid():
+            return
+        with self.lock:
+            if self.worker_pid == os.getpid():
+                return
+            self.worker_pid = os.getpid()
+        threading.Thread(target=self.run, name='event-views-flush', daemon=True).start()
+
+    def run(self):
+        while True:
+            woken = self.wakeup.wait(self.POLL_INTERVAL)
+            self.wakeup.clear()
+            if not woken and time.monotonic() - self.last_flush < self.flush_interval:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                # Les vues restent en mémoire pour le prochain lot
+                pass
+            finally:
+                connection.close()
+
+    def flush(self):
+        """Écrire les vues accumulées ; renvoie le nombre de vues écrites"""
+        with self.lock:
+            counts, sketches = self.counts, self.sketches
+            self.counts, self.sketches = defaultdict(int), {}
+            self.pending = 0
+            self.last_flush = time.monotonic()
+        if not counts:
+            return 0
+
+        from .models import Event, EventViewStats
+
+        try:
+            with transaction.atomic():
+                # Les événements supprimés entre-temps sont ignorés
+                existing = Event.objects.filter(pk__in=counts).values_list('pk', flat=True)
+                EventViewStats.objects.bulk_create(
+                    [EventViewStats(event_id=event_id) for event_id in existing],
+                    ignore_conflicts=True
+                )
+                rows = list(EventViewStats.objects.select_for_update().filter(event_id__in=counts))
+                for row in rows:
+                    sketch = HyperLogLog(row.visitors_sketch)
+                    sketch.merge(sketches[row.event_id])
+                    row.views_count += counts[row.event_id]
+                    row.visitors_sketch = sketch.to_bytes()
+                    row.unique_visitors = sketch.count()
+                EventViewStats.objects.bulk_update(
+                    rows, ['views_count', 'visitors_sketch', 'unique_visitors']
+                )
+        except Exception:
+            # On remet les vues dans le tampon pour le prochain lot
+            with self.lock:
+                for event_id, count in counts.items():
+                    self.counts[event_id] += count
+                    if event_id in self.sketches:
+                        sketches[event_id].merge(self.sketches[event_id])
+                    self.sketches[event_id] = sketches[event_id]
+                self.pending += sum(counts.values())
+            raise
+        return sum(counts.values())
+
+
+def visitor_key(request):
+    """Identifiant de visiteur : l'utilisateur connecté, sinon IP + navigateur"""
+    if request.user and request.user.is_authenticated:
+        return f'u:{request.user.pk}'
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    address = forwarded.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+    return f"a:{address}|{request.META.get('HTTP_USER_AGENT', '')}"
+
+
+view_buffer = ViewBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_buffer.flush()
+    except Exception:
+        pass
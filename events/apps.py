@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        # Connecte les signaux de mise à jour de l'autocomplétion, des agrégats de carte et des salles d'attente
+        from . import autocomplete, clusters, waiting_room  # noqa: F401
+        from .search import ensure_sqlite_triggers
+
+        # Les migrations qui reconstruisent events_event sous SQLite suppriment les triggers FTS5
+        post_migrate.connect(ensure_sqlite_triggers, sender=self)
@@ -0,0 +1,275 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .search import fold
+
+# Nombre maximal d'entrées examinées par préfixe avant le classement
+SCAN_LIMIT = 200
+
+SUGGESTION_TYPES = ('event', 'city', 'category')
+
+
+class PrefixIndex:
+    """Tableau trié de (clé, référence) : recherche par préfixe en O(log n + k)"""
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, key, ref):
+        bisect.insort(self.entries, (key, ref))
+
+    def remove(self, key, ref):
+        index = bisect.bisect_left(self.entries, (key, ref))
+        if index < len(self.entries) and self.entries[index] == (key, ref):
+            del self.entries[index]
+
+    def prefix(self, prefix, limit=SCAN_LIMIT):
+        index = bisect.bisect_left(self.entries, (prefix,))
+        refs = []
+        while index < len(self.entries) and len(refs) < limit:
+            key, ref = self.entries[index]
+            if not key.startswith(prefix):
+                break
+            refs.append(ref)
+            index += 1
+        return refs
+
+
+def title_keys(title):
+    """Une clé par début de mot : « Fête de Dakar » se trouve avec « fe » ou « dak »"""
+    words = fold(title).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class Snapshot:
+    """Index des titres d'événements publiés, des villes et des catégories à un instant donné"""
+
+    def __init__(self):
+        self.events = {}        # id -> (titre, clé ville, ville, id catégorie, mis en avant, clés)
+        self.cities = {}        # clé ville -> Counter des graphies
+        self.categories = {}    # id -> nom
+        self.category_counts = Counter()
+        self.indexes = {kind: PrefixIndex() for kind in SUGGESTION_TYPES}
+
+    def load(self):
+        """Remplir l'index depuis la base (lecture complète, sans verrou)"""
+        from .models import Category, Event
+
+        for category in Category.objects.only('id', 'name'):
+            self.add_category(category.pk, category.name)
+        published = Event.objects.filter(status='published').only(
+            'id', 'title', 'city', 'city_key', 'category_id', 'is_featured'
+        )
+        for event in published.iterator(chunk_size=2000):
+            self.add_event(event)
+
+    def add_category(self, category_id, name):
+        self.categories[category_id] = name
+        self.indexes['category'].add(fold(name), category_id)
+
+    def remove_category(self, category_id):
+        name = self.categories.pop(category_id, None)
+        if name is not None:
+            self.indexes['category'].remove(fold(name), category_id)
+
+    def add_event(self, event):
+        keys = title_keys(event.title)
+        key = event.city_key
+        label = event.city.strip()
+        self.events[event.pk] = (event.title, key, label, event.category_id, event.is_featured, keys)
+        for title_key in keys:
+            self.indexes['event'].add(title_key, event.pk)
+        if key:
+            if key not in self.cities:
+                self.cities[key] = Counter()
+                self.indexes['city'].add(key, key)
+            self.cities[key][label] += 1
+        if event.category_id:
+            self.category_counts[event.category_id] += 1
+
+    def remove_event(self, event_id):
+        entry = self.events.pop(event_id, None)
+        if entry is None:
+            return
+        title, key, label, category_id, _, keys = entry
+        for title_key in keys:
+            self.indexes['event'].remove(title_key, event_id)
+        spellings = self.cities.get(key)
+        if spellings is not None:
+            spellings[label] -= 1
+            if spellings[label] <= 0:
+                del spellings[label]
+            if not spellings:
+                del self.cities[key]
+                self.indexes['city'].remove(key, key)
+        if category_id:
+            self.category_counts[category_id] -= 1
+
+    # Mises à jour rejouables sur un index plus récent (idempotentes)
+
+    def event_changed(self, event):
+        self.remove_event(event.pk)
+        if event.status == 'published':
+            self.add_event(event)
+
+    def category_changed(self, category):
+        self.remove_category(category.pk)
+        self.add_category(category.pk, category.name)
+
+
+class Autocomplete:
+    """
+    Index en mémoire des titres d'événements publiés, des villes et des
+    catégories. Construit à la première requête, mis à jour à chaque
+    enregistrement, et reconstruit périodiquement en arrière-plan pour prendre
+    en compte les écritures faites par les autres processus : le nouvel index
+    est rempli hors verrou pendant que l'ancien continue de répondre, puis
+    remplace celui-ci d'un coup.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rebuilding = threading.Lock()
+        self.snapshot = None
+        self.built_at = None
+        # Modifications reçues pendant une reconstruction, rejouées sur le nouvel index
+        self.pending = None
+
+    @property
+    def rebuild_interval(self):
+        return getattr(settings, 'AUTOCOMPLETE_REBUILD_INTERVAL', 300)
+
+    def reset(self):
+        with self.lock:
+            self.snapshot = None
+            self.built_at = None
+
+    def build(self, wait=True):
+        """Reconstruire l'index ; sans attente, ne fait rien si une reconstruction est déjà en cours"""
+        if not self.rebuilding.acquire(blocking=wait):
+            return
+        try:
+            with self.lock:
+                self.pending = []
+            snapshot = Snapshot()
+            snapshot.load()
+            with self.lock:
+                for change in self.pending:
+                    change(snapshot)
+                self.snapshot, self.pending = snapshot, None
+                self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.pending = None
+            self.rebuilding.release()
+
+    def _rebuild_in_background(self):
+        try:
+            self.build(wait=False)
+        finally:
+            connection.close()
+
+    def ensure_built(self):
+        if self.snapshot is None:
+            # Premier appel : rien à servir en attendant
+            self.build()
+        elif time.monotonic() - self.built_at > self.rebuild_interval and not self.rebuilding.locked():
+            threading.Thread(
+                target=self._rebuild_in_background, name='autocomplete-rebuild', daemon=True
+            ).start()
+
+    # Mises à jour incrémentales
+
+    def _apply(self, change):
+        with self.lock:
+            if self.snapshot is None:
+                return
+            change(self.snapshot)
+            if self.pending is not None:
+                self.pending.append(change)
+
+    def event_changed(self, event):
+        self._apply(lambda snapshot: snapshot.event_changed(event))
+
+    def event_deleted(self, event_id):
+        self._apply(lambda snapshot: snapshot.remove_event(event_id))
+
+    def category_changed(self, category):
+        self._apply(lambda snapshot: snapshot.category_changed(category))
+
+    def category_deleted(self, category_id):
+        self._apply(lambda snapshot: snapshot.remove_category(category_id))
+
+    # Lecture
+
+    def suggest(self, query, limit=8, types=SUGGESTION_TYPES):
+        prefix = ' '.join(fold(query).split())
+        if not prefix:
+            return []
+        self.ensure_built()
+        suggestions = []
+        with self.lock:
+            index = self.snapshot
+            if 'event' in types:
+                seen = set(index.indexes['event'].prefix(prefix))
+                # Événements mis en avant d'abord, puis titres les plus courts
+                best = heapq.nsmallest(limit, seen, key=lambda pk: (
+                    not index.events[pk][4], len(index.events[pk][0]), index.events[pk][0]
+                ))
+                suggestions += [
+                    {'type': 'event', 'id': pk, 'label': index.events[pk][0]} for pk in best
+                ]
+            if 'city' in types:
+                keys = index.indexes['city'].prefix(prefix)
+                best = heapq.nlargest(limit, keys, key=lambda key: sum(index.cities[key].values()))
+                suggestions += [{
+                    'type': 'city',
+                    'id': key,
+                    'label': index.cities[key].most_common(1)[0][0],
+                    'count': sum(index.cities[key].values()),
+                } for key in best]
+            if 'category' in types:
+                ids = index.indexes['category'].prefix(prefix)
+                best = heapq.nlargest(limit, ids, key=lambda pk: index.category_counts[pk])
+                suggestions += [{
+                    'type': 'category',
+                    'id': pk,
+                    'label': index.categories[pk],
+                    'count': index.category_counts[pk],
+                } for pk in best]
+        return suggestions
+
+
+autocomplete_index = Autocomplete()
+
+
+# Les index ne sont modifiés qu'une fois la transaction validée
+
+@receiver(post_save, sender='events.Event')
+def update_event_suggestions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete_index.event_changed(instance))
+
+
+@receiver(post_delete, sender='events.Event')
+def remove_event_suggestions(sender, instance, **kwargs):
+    event_id = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.event_deleted(event_id))
+
+
+@receiver(post_save, sender='events.Category')
+def update_category_suggestions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete_index.category_changed(instance))
+
+
+@receiver(post_delete, sender='events.Category')
+def remove_category_suggestions(sender, instance, **kwargs):
+    category_id = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.category_deleted(category_id))
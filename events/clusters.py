@@ -0,0 +1,134 @@
+"""
+Regroupement des événements publiés pour la carte.
+
+La carte est découpée en cellules geohash dont la taille dépend du niveau de
+zoom. Chaque cellule est agrégée côté serveur (nombre, barycentre, quelques
+identifiants) et mise en cache individuellement : un déplacement de la carte
+ne recalcule que les cellules nouvellement visibles. Les agrégats d'une
+cellule sont invalidés quand un événement y entre, en sort ou y change : la
+génération de la cellule est incrémentée dans le cache partagé, si bien que
+tous les processus abandonnent ensemble les anciennes entrées, y compris
+celles qu'un calcul commencé avant l'invalidation écrirait après elle.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import RowNumber, Substr
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import geo
+
+# Précision geohash utilisée pour chaque niveau de zoom de la carte (0 à 20)
+ZOOM_PRECISIONS = [1, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 8, 8, 8]
+MAX_CLUSTER_PRECISION = max(ZOOM_PRECISIONS)
+
+# Au-delà, on passe à des cellules plus grosses que ne le voudrait le zoom
+MAX_VIEW_CELLS = 1024
+
+SAMPLE_SIZE = 3
+
+CACHE_PREFIX = 'event-cluster:'
+GENERATION_PREFIX = 'event-cluster-gen:'
+
+
+def precision_for(zoom, lat_min, lat_max, lng_min, lng_max):
+    precision = ZOOM_PRECISIONS[max(0, min(zoom, len(ZOOM_PRECISIONS) - 1))]
+    while precision > 1 and geo.cell_count(lat_min, lat_max, lng_min, lng_max, precision) > MAX_VIEW_CELLS:
+        precision -= 1
+    return precision
+
+
+def _generation_key(cell):
+    return GENERATION_PREFIX + cell
+
+
+def _cache_keys(cells):
+    """Clé courante de chaque cellule, suffixée par sa génération (0 tant qu'elle n'a jamais changé)"""
+    generations = cache.get_many([_generation_key(cell) for cell in cells])
+    return {
+        cell: f'{CACHE_PREFIX}{cell}:{generations.get(_generation_key(cell), 0)}'
+        for cell in cells
+    }
+
+
+def aggregate_cells(cells, precision):
+    """Agrégats des cellules (de même précision) en deux requêtes groupées"""
+    from .models import Event
+
+    published = Event.objects.filter(geo.cell_filter(cells), status='published').annotate(
+        cell=Substr('geohash', 1, precision)
+    ).order_by()
+    aggregates = {
+        cell: {'cell': cell, 'count': 0, 'latitude': None, 'longitude': None, 'sample_ids': []}
+        for cell in cells
+    }
+    for row in published.values('cell').annotate(
+        count=Count('id'), latitude=Avg('latitude'), longitude=Avg('longitude')
+    ):
+        aggregates[row['cell']].update(row)
+
+    # Quelques événements par cellule : les mis en avant, puis les plus proches dans le temps
+    samples = published.annotate(
+        rank=Window(RowNumber(), partition_by=[F('cell')], order_by=[F('is_featured').desc(), F('start_date').asc()])
+    ).filter(rank__lte=SAMPLE_SIZE).values_list('cell', 'id')
+    for cell, event_id in samples:
+        aggregates[cell]['sample_ids'].append(event_id)
+    return aggregates
+
+
+def clusters_in_box(lat_min, lat_max, lng_min, lng_max, zoom):
+    """Groupes non vides couvrant la boîte, lus en cache ou recalculés par cellule"""
+    precision = precision_for(zoom, lat_min, lat_max, lng_min, lng_max)
+    cells = geo.cells_in_box(lat_min, lat_max, lng_min, lng_max, precision)
+    keys = _cache_keys(cells)
+    cached = cache.get_many(list(keys.values()))
+    aggregates = {cell: cached[key] for cell, key in keys.items() if key in cached}
+
+    missing = cells - set(aggregates)
+    if missing:
+        computed = aggregate_cells(missing, precision)
+        # Les cellules vides sont aussi mises en cache, sous la génération lue
+        # avant le calcul : une invalidation entre-temps les rend inaccessibles
+        cache.set_many(
+            {keys[cell]: value for cell, value in computed.items()},
+            settings.MAP_CLUSTERS_CACHE_TTL
+        )
+        aggregates.update(computed)
+    clusters = [value for value in aggregates.values() if value['count']]
+    clusters.sort(key=lambda value: value['cell'])
+    return precision, clusters
+
+
+def invalidate(*geohashes):
+    """Passer à une nouvelle génération toutes les cellules contenant ces positions"""
+    keys = {
+        _generation_key(geohash[:precision])
+        for geohash in geohashes if geohash
+        for precision in range(1, MAX_CLUSTER_PRECISION + 1)
+    }
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Première invalidation (ou génération évincée) : valeur jamais utilisée auparavant
+            if not cache.add(key, time.time_ns(), None):
+                cache.incr(key)
+
+
+# Les cellules ne sont invalidées qu'une fois la transaction validée
+
+@receiver(post_save, sender='events.Event')
+def invalidate_saved_event(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_geohash', '')
+    instance._loaded_geohash = instance.geohash
+    transaction.on_commit(lambda: invalidate(previous, instance.geohash))
+
+
+@receiver(post_delete, sender='events.Event')
+def invalidate_deleted_event(sender, instance, **kwargs):
+    geohash = instance.geohash
+    transaction.on_commit(lambda: invalidate(geohash))
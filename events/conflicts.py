@@ -0,0 +1,139 @@
+"""
+Détection des chevauchements d'horaires.
+
+Deux événements se chevauchent si a.start < b.end et b.start < a.end
+(intervalles semi-ouverts : un événement qui commence à la fin d'un autre
+n'est pas en conflit). Les requêtes bornent les lignes lues par l'index
+(city_key, location_key, end_date) pour les lieux et par les inscriptions de
+l'utilisateur pour les participants ; les vérifications par lots utilisent un
+index d'intervalles en mémoire.
+"""
+import bisect
+from collections import defaultdict
+
+from .models import Event, EventRegistration
+from .search import city_key, normalize
+
+# Statuts qui n'occupent pas le créneau
+FREE_STATUSES = ['cancelled']
+
+
+class IntervalIndex:
+    """
+    Intervalles triés par début. La durée maximale connue borne la recherche :
+    seuls les intervalles commençant après start - durée_max peuvent chevaucher.
+    """
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in self.intervals]
+        durations = [end - start for start, end, _ in self.intervals]
+        self.max_duration = max(durations) if durations else None
+
+    def overlapping(self, start, end):
+        """Éléments dont l'intervalle chevauche [start, end)"""
+        if not self.intervals:
+            return []
+        first = bisect.bisect_right(self.starts, start - self.max_duration)
+        last = bisect.bisect_left(self.starts, end)
+        return [
+            item for interval_start, interval_end, item in self.intervals[first:last]
+            if interval_end > start
+        ]
+
+
+def venue_events(location, city, start, end, exclude_pk=None):
+    """Événements au même lieu dont l'horaire chevauche [start, end)"""
+    location_key = normalize(location)[:200]
+    if not location_key:
+        return Event.objects.none()
+    queryset = Event.objects.filter(
+        city_key=city_key(city), location_key=location_key,
+        end_date__gt=start, start_date__lt=end
+    ).exclude(status__in=FREE_STATUSES)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset.only('id', 'title', 'start_date', 'end_date', 'location').order_by('start_date')
+
+
+def user_registrations(user, event):
+    """Inscriptions confirmées de l'utilisateur à des événements qui chevauchent `event`"""
+    return EventRegistration.objects.filter(
+        user=user, status='confirmed',
+        event__end_date__gt=event.start_date, event__start_date__lt=event.end_date
+    ).exclude(event_id=event.pk).exclude(event__status__in=FREE_STATUSES).select_related('event').only(
+        'id', 'event__id', 'event__title', 'event__start_date', 'event__end_date'
+    )
+
+
+def describe(event, kind):
+    return {
+        'type': kind,
+        'event_id': event.pk,
+        'title': event.title,
+        'start_date': event.start_date,
+        'end_date': event.end_date,
+    }
+
+
+def registration_warnings(user, event):
+    return [describe(registration.event, 'schedule') for registration in user_registrations(user, event)]
+
+
+def venue_warnings(location, city, start, end, exclude_pk=None):
+    return [describe(other, 'venue') for other in venue_events(location, city, start, end, exclude_pk)]
+
+
+def organizer_report(organizer, start, end=None):
+    """
+    Doubles réservations de lieu impliquant les événements de l'organisateur
+    qui se terminent après `start` (et commencent avant `end`) : une requête
+    pour ses événements, une pour tous les événements des lieux concernés,
+    puis une recherche dans l'index d'intervalles du lieu par événement de
+    l'organisateur (les chevauchements entre tiers ne sont pas examinés).
+    """
+    own = Event.objects.filter(organizer=organizer, end_date__gt=start).exclude(
+        status__in=FREE_STATUSES
+    ).exclude(location_key='')
+    if end is not None:
+        own = own.filter(start_date__lt=end)
+    own = list(own.only('id', 'title', 'start_date', 'end_date', 'city_key', 'location_key', 'location'))
+    if not own:
+        return []
+
+    window_start = min(event.start_date for event in own)
+    window_end = max(event.end_date for event in own)
+    venues = {(event.city_key, event.location_key) for event in own}
+    candidates = Event.objects.filter(
+        city_key__in={city for city, _ in venues}, location_key__in={location for _, location in venues},
+        end_date__gt=window_start, start_date__lt=window_end
+    ).exclude(status__in=FREE_STATUSES).only(
+        'id', 'title', 'start_date', 'end_date', 'city_key', 'location_key', 'location', 'organizer_id'
+    )
+
+    by_venue = defaultdict(list)
+    for event in candidates:
+        if (event.city_key, event.location_key) in venues:
+            by_venue[event.city_key, event.location_key].append((event.start_date, event.end_date, event))
+
+    own_ids = {event.pk for event in own}
+    report = []
+    for intervals in by_venue.values():
+        index = IntervalIndex(intervals)
+        for start_date, end_date, event in intervals:
+            if event.pk not in own_ids:
+                continue
+            for other in index.overlapping(start_date, end_date):
+                # Entre deux événements de l'organisateur, la paire n'est rapportée qu'une fois
+                if other.pk == event.pk or (other.pk in own_ids and other.pk < event.pk):
+                    continue
+                first, second = sorted((event, other), key=lambda item: (item.start_date, item.pk))
+                report.append({
+                    'location': first.location,
+                    'events': [describe(first, 'venue'), describe(second, 'venue')],
+                    'overlap_start': max(first.start_date, second.start_date),
+                    'overlap_end': min(first.end_date, second.end_date),
+                    'same_organizer': first.organizer_id == second.organizer_id,
+                })
+    report.sort(key=lambda conflict: conflict['overlap_start'])
+    return report
@@ -0,0 +1,74 @@
+"""
+Fenêtres de dates des filtres et du calendrier.
+
+Toutes les périodes sont converties en intervalles semi-ouverts
+[début, fin) de timestamps, calculés dans le fuseau de l'utilisateur
+(?tz=Africa/Dakar, sinon le fuseau courant). Le filtre porte donc
+directement sur start_date et peut utiliser l'index (start_date, status),
+contrairement aux lookups start_date__date.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def resolve_timezone(name):
+    """Fuseau IANA demandé, ou le fuseau courant ; ValueError s'il est inconnu"""
+    if not name:
+        return timezone.get_current_timezone()
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(name)
+
+
+def day_start(day, tz):
+    """Minuit local du jour donné, en datetime avec fuseau"""
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def month_range(year, month, tz):
+    first = datetime(year, month, 1).date()
+    following = (first + timedelta(days=32)).replace(day=1)
+    return day_start(first, tz), day_start(following, tz)
+
+
+def period_range(period, tz):
+    """Intervalle [début, fin) pour today, week et month ; None si période inconnue"""
+    today = timezone.localdate(timezone=tz)
+    if period == 'today':
+        return day_start(today, tz), day_start(today + timedelta(days=1), tz)
+    if period == 'week':
+        # Aujourd'hui et les sept jours suivants inclus
+        return day_start(today, tz), day_start(today + timedelta(days=8), tz)
+    if period == 'month':
+        return month_range(today.year, today.month, tz)
+    return None
+
+
+def parse_bound(value, tz):
+    """
+    Borne de date ou de date-heure (ISO 8601). Une date seule désigne minuit
+    local ; une date-heure sans fuseau est interprétée dans tz.
+    Lève ValueError si la valeur est invalide.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        return day_start(day, tz)
+    if timezone.is_naive(moment):
+        moment = moment.replace(tzinfo=tz)
+    return moment
+
+
+def filter_range(queryset, start=None, end=None, field='start_date'):
+    """Restreindre à start <= champ < end (bornes facultatives)"""
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
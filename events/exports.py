@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EventRegistration, ExportJob
+
+# Colonnes de l'export des participants
+PARTICIPANT_COLUMNS = ['Prénom', 'Nom', 'Email', 'Date d\'inscription', 'Notes']
+
+# Taille des lots lus en base (curseur côté serveur sur PostgreSQL)
+ITERATOR_CHUNK_SIZE = 2000
+
+# Taille approximative des blocs envoyés au client
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Fréquence de mise à jour de la progression des exports en arrière-plan
+PROGRESS_EVERY = 5000
+
+EXPORT_DIRECTORY = 'exports'
+
+# Au-delà, un job dont le worker disparaît encore est marqué échoué
+MAX_ATTEMPTS = 3
+
+
+class LeaseLost(Exception):
+    """Le bail du job a expiré et un autre worker l'a repris"""
+
+
+class Echo:
+    """Pseudo-fichier qui renvoie la ligne écrite au lieu de la stocker"""
+    def write(self, value):
+        return value
+
+
+def participant_registrations(since=None, **filters):
+    """Inscriptions confirmées correspondant aux filtres, triées par date"""
+    registrations = EventRegistration.objects.filter(status='confirmed', **filters)
+    if since is not None:
+        registrations = registrations.filter(registration_date__gt=since)
+    return registrations.select_related('user', 'event').only(
+        'registration_date', 'notes',
+        'user__first_name', 'user__last_name', 'user__email',
+        'event__title'
+    ).order_by('registration_date', 'id')
+
+
+def participant_row(registration):
+    return [
+        registration.user.first_name,
+        registration.user.last_name,
+        registration.user.email,
+        registration.registration_date.strftime('%d/%m/%Y %H:%M'),
+        registration.notes or ''
+    ]
+
+
+def iter_participant_csv(registrations):
+    """Générer le CSV ligne par ligne, regroupé en blocs d'environ 64 Ko"""
+    writer = csv.writer(Echo())
+    buffer = [writer.writerow(PARTICIPANT_COLUMNS)]
+    size = len(buffer[0])
+    for registration in registrations.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        line = writer.writerow(participant_row(registration))
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def gzip_stream(chunks):
+    """Compresser un flux d'octets au format gzip au fil de l'eau"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _leased(job):
+    """Le job, tant que cette tentative en détient le bail"""
+    return ExportJob.objects.filter(pk=job.pk, status='running', attempts=job.attempts)
+
+
+def _renew(job, **fields):
+    """Mettre à jour le job en renouvelant le bail ; LeaseLost s'il a été repris"""
+    if not _leased(job).update(heartbeat_at=timezone.now(), **fields):
+        raise LeaseLost(job.pk)
+
+
+def run_export_job(job):
+    """
+    Écrire l'export d'un job dans MEDIA_ROOT/exports/ en mettant à jour sa
+    progression. Le job doit avoir été obtenu par claim_next_export_job.
+    """
+    filters = {'event_id': job.event_id} if job.scope == 'event' else {'event__organizer_id': job.user_id}
+    registrations = participant_registrations(since=job.since, **filters)
+    multi_event = job.scope == 'organizer'
+    
+    _renew(job, total_rows=registrations.count())
+    
+    name = f'{EXPORT_DIRECTORY}/export_{job.pk}_{timezone.now():%Y%m%d%H%M%S}.{job.format}'
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    processed = 0
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            if job.format == 'csv':
+                writer = csv.writer(output)
+                writer.writerow((['Événement'] if multi_event else []) + PARTICIPANT_COLUMNS)
+            
+            for registration in registrations.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+                if job.format == 'csv':
+                    prefix = [registration.event.title] if multi_event else []
+                    writer.writerow(prefix + participant_row(registration))
+                else:
+                    output.write(json.dumps({
+                        'event_id': registration.event_id,
+                        'event_title': registration.event.title,
+                        'first_name': registration.user.first_name,
+                        'last_name': registration.user.last_name,
+                        'email': registration.user.email,
+                        'registration_date': registration.registration_date.isoformat(),
+                        'notes': registration.notes or '',
+                    }, ensure_ascii=False) + '\n')
+                
+                processed += 1
+                if processed % PROGRESS_EVERY == 0:
+                    _renew(job, processed_rows=processed)
+        
+        _renew(job, status='completed', file=name, processed_rows=processed, finished_at=timezone.now())
+    except LeaseLost:
+        # Le fichier de la tentative qui a repris le job fait foi
+        os.remove(path)
+        raise
+
+
+def fail_export_job(job, error):
+    """Marquer le job échoué, sauf s'il a entre-temps été repris par un autre worker"""
+    _leased(job).update(status='failed', error=error, finished_at=timezone.now())
+
+
+def claim_next_export_job():
+    """
+    Réserver le plus ancien job en attente, ou dont le bail a expiré (worker
+    arrêté en cours de traitement) ; None s'il n'y en a pas
+    """
+    now = timezone.now()
+    expired = Q(status='running') & (
+        Q(heartbeat_at__lt=now - timedelta(seconds=settings.EXPORT_JOB_LEASE)) | Q(heartbeat_at__isnull=True)
+    )
+    # Un job qui a déjà fait tomber plusieurs workers ne sera pas relancé
+    ExportJob.objects.filter(expired, attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', error='Traitement interrompu à chaque tentative', finished_at=now
+    )
+    
+    claimable = Q(status='pending') | expired
+    candidates = ExportJob.objects.filter(claimable).order_by('created_at').values_list('pk', 'attempts')[:5]
+    for pk, attempts in candidates:
+        # Transition conditionnelle sur le numéro de tentative : un seul worker obtient le job
+        if ExportJob.objects.filter(claimable, pk=pk, attempts=attempts).update(
+            status='running', attempts=attempts + 1, started_at=now, heartbeat_at=now, processed_rows=0
+        ):
+            return ExportJob.objects.get(pk=pk)
+    return None
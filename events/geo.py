@@ -0,0 +1,171 @@
+"""
+Recherche géographique sans PostGIS.
+
+Chaque événement localisé porte un geohash (précision 9, ~5 m) indexé en
+B-tree. Une recherche par rayon procède en trois temps :
+1. les cellules geohash couvrant la boîte englobante du cercle, traduites en
+   plages `geohash >= cellule AND geohash < cellule~` (lecture d'index) ;
+2. la boîte englobante elle-même sur latitude/longitude ;
+3. la distance haversine exacte, calculée en SQL, pour filtrer et trier.
+"""
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# '~' est après tous les caractères geohash : [cellule, cellule~) = tous ses descendants
+CELL_UPPER_BOUND = '~'
+
+# Nombre maximal de cellules dans le préfiltre (au-delà, on prend des cellules plus grosses)
+MAX_COVER_CELLS = 16
+
+MAX_RADIUS_KM = 500
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def decode_geohash(geohash):
+    """Centre de la cellule et demi-dimensions (lat, lng, dlat, dlng)"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (
+        (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2,
+        (lat_range[1] - lat_range[0]) / 2, (lng_range[1] - lng_range[0]) / 2,
+    )
+
+
+def cell_size(precision):
+    """Hauteur et largeur en degrés d'une cellule geohash"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(lat_min, lat_max, lng_min, lng_max) englobant le cercle"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    dlng = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return (
+        max(-90.0, latitude - dlat), min(90.0, latitude + dlat),
+        max(-180.0, longitude - dlng), min(180.0, longitude + dlng),
+    )
+
+
+def _steps(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def cell_count(lat_min, lat_max, lng_min, lng_max, precision):
+    """Majorant du nombre de cellules de cette précision couvrant la boîte"""
+    height, width = cell_size(precision)
+    rows = math.ceil((lat_max - lat_min) / height) + 1
+    columns = math.ceil((lng_max - lng_min) / width) + 1
+    return rows * columns
+
+
+def cells_in_box(lat_min, lat_max, lng_min, lng_max, precision):
+    """Cellules geohash de la précision donnée couvrant la boîte"""
+    height, width = cell_size(precision)
+    return {
+        encode_geohash(lat, lng, precision)
+        for lat in _steps(lat_min, lat_max, height)
+        for lng in _steps(lng_min, lng_max, width)
+    }
+
+
+def covering_cells(lat_min, lat_max, lng_min, lng_max, max_cells=MAX_COVER_CELLS):
+    """Cellules geohash les plus fines couvrant la boîte en au plus max_cells cellules"""
+    for precision in range(GEOHASH_PRECISION, 1, -1):
+        if cell_count(lat_min, lat_max, lng_min, lng_max, precision) <= max_cells:
+            return cells_in_box(lat_min, lat_max, lng_min, lng_max, precision)
+    return cells_in_box(lat_min, lat_max, lng_min, lng_max, 1)
+
+
+def cell_filter(cells, field='geohash'):
+    """Plages d'index correspondant aux cellules (et à toutes leurs sous-cellules)"""
+    condition = Q()
+    for cell in sorted(cells):
+        condition |= Q(**{f'{field}__gte': cell, f'{field}__lt': cell + CELL_UPPER_BOUND})
+    return condition
+
+
+def distance_expression(latitude, longitude):
+    """Distance haversine en km entre l'événement et le point, calculée par la base"""
+    lat = Value(math.radians(latitude), output_field=FloatField())
+    lng = Value(math.radians(longitude), output_field=FloatField())
+    a = (
+        Power(Sin((Radians(F('latitude')) - lat) / 2), 2) +
+        Cos(lat) * Cos(Radians(F('latitude'))) * Power(Sin((Radians(F('longitude')) - lng) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Sqrt(a))
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Événements à moins de radius_km du point, annotés de distance_km"""
+    lat_min, lat_max, lng_min, lng_max = bounding_box(latitude, longitude, radius_km)
+    cells = covering_cells(lat_min, lat_max, lng_min, lng_max)
+    return queryset.filter(
+        cell_filter(cells),
+        latitude__range=(lat_min, lat_max),
+        longitude__range=(lng_min, lng_max),
+    ).annotate(
+        distance_km=distance_expression(latitude, longitude)
+    ).filter(distance_km__lte=radius_km)
+
+
+def parse_point(params):
+    """
+    Lire lat, lng et radius (km) ; None si lat/lng sont absents.
+    Lève ValueError si les valeurs sont invalides.
+    """
+    lat, lng = params.get('lat'), params.get('lng')
+    if lat in (None, '') or lng in (None, ''):
+        return None
+    latitude, longitude = float(lat), float(lng)
+    radius = float(params.get('radius') or 50)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius <= MAX_RADIUS_KM:
+        raise ValueError()
+    return latitude, longitude, radius
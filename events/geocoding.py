@@ -0,0 +1,122 @@
+"""
+Géocodage hors ligne des adresses d'événements.
+
+Les coordonnées sont déduites d'un gazetteer embarqué (data/gazetteer.json :
+villes du Sénégal et de France, quelques lieux connus de Dakar) ; aucun service
+externe n'est appelé. Chaque adresse normalisée n'est résolue qu'une fois :
+le résultat, y compris l'absence de résultat, est conservé dans GeocodeCache.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from .search import normalize
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.json'
+
+# Champs d'Event utilisés pour le géocodage
+ADDRESS_FIELDS = ['location', 'address', 'city', 'postal_code', 'country']
+
+
+class Gazetteer:
+    """Index des lieux connus par nom normalisé"""
+
+    def __init__(self, data):
+        self.version = data['version']
+        self.countries = {
+            normalize(alias): code
+            for code, aliases in data['countries'].items() for alias in aliases
+        }
+        self.cities = {}    # nom -> [lieux]
+        self.venues = {}    # nom -> lieu
+        for place in data['places']:
+            names = [place['name']] + place.get('aliases', [])
+            for name in map(normalize, names):
+                if place['kind'] == 'venue':
+                    self.venues[name] = place
+                else:
+                    self.cities.setdefault(name, []).append(place)
+        # Les noms les plus longs d'abord : « saint louis » avant « louis »
+        self.city_names = sorted(self.cities, key=len, reverse=True)
+        self.venue_names = sorted(self.venues, key=len, reverse=True)
+
+    def _pick(self, places, country):
+        for place in places:
+            if place['country'] == country:
+                return place
+        # Pays absent ou laissé à sa valeur par défaut : on accepte un autre pays
+        return places[0]
+
+    def resolve(self, location='', address='', city='', postal_code='', country=''):
+        """(latitude, longitude, source) ou None ; source vaut 'venue' ou 'city'"""
+        country_code = self.countries.get(normalize(country))
+        text = f" {normalize(location)} {normalize(address)} "
+        for name in self.venue_names:
+            if f' {name} ' in text:
+                place = self.venues[name]
+                return place['latitude'], place['longitude'], 'venue'
+
+        places = self.cities.get(normalize(city))
+        if places is None:
+            # Ville non reconnue : on la cherche dans l'adresse
+            text += f"{normalize(city)} "
+            for name in self.city_names:
+                if f' {name} ' in text:
+                    places = self.cities[name]
+                    break
+        if places:
+            place = self._pick(places, country_code)
+            return place['latitude'], place['longitude'], 'city'
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    with open(GAZETTEER_PATH, encoding='utf-8') as gazetteer_file:
+        return Gazetteer(json.load(gazetteer_file))
+
+
+def address_values(event):
+    return {field: getattr(event, field) or '' for field in ADDRESS_FIELDS}
+
+
+def cache_key(values):
+    """Clé de cache de l'adresse normalisée, liée à la version du gazetteer"""
+    query = '|'.join(normalize(values[field]) for field in ADDRESS_FIELDS)
+    return hashlib.sha1(f'{get_gazetteer().version}:{query}'.encode()).hexdigest(), query
+
+
+def geocode_many(address_list):
+    """
+    Coordonnées (latitude, longitude) ou None pour chaque adresse, dans l'ordre.
+    Une requête pour lire le cache, une pour y ajouter les adresses nouvelles.
+    """
+    from .models import GeocodeCache
+
+    keys = [cache_key(values) for values in address_list]
+    known = {
+        entry.key: entry
+        for entry in GeocodeCache.objects.filter(key__in={key for key, _ in keys})
+    }
+    created = {}
+    for (key, query), values in zip(keys, address_list):
+        if key not in known and key not in created:
+            result = get_gazetteer().resolve(**values)
+            latitude, longitude, source = result if result else (None, None, '')
+            created[key] = GeocodeCache(
+                key=key, query=query, latitude=latitude, longitude=longitude, source=source
+            )
+    if created:
+        GeocodeCache.objects.bulk_create(created.values(), ignore_conflicts=True)
+        known.update(created)
+
+    results = []
+    for key, _ in keys:
+        entry = known[key]
+        results.append(None if entry.latitude is None else (entry.latitude, entry.longitude))
+    return results
+
+
+def geocode(event):
+    return geocode_many([address_values(event)])[0]
@@ -0,0 +1,136 @@
+"""
+Flux iCalendar (.ics) auxquels les agendas peuvent s'abonner.
+
+Chaque utilisateur dispose de deux flux, identifiés par un jeton signé :
+- 'registrations' : les événements auxquels il est inscrit (confirmé) ;
+- 'organizer' : les événements qu'il organise.
+Les agendas interrogent ces flux en boucle : l'ETag est calculé par une seule
+requête d'agrégat (dernière modification et nombre de lignes), et un flux
+inchangé est servi en 304 sans rien générer.
+"""
+import hashlib
+from datetime import timezone
+
+from django.core import signing
+from django.db.models import Count, Max
+
+from .models import Event, EventRegistration
+
+FEED_KINDS = ('registrations', 'organizer')
+
+ITERATOR_CHUNK_SIZE = 500
+
+# Statut iCalendar correspondant au statut de l'événement
+EVENT_STATUSES = {
+    'draft': 'TENTATIVE',
+    'published': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def _signer(kind):
+    return signing.Signer(salt=f'events.ical.{kind}')
+
+
+def feed_token(user, kind):
+    return _signer(kind).sign(str(user.pk))
+
+
+def user_id_from_token(kind, token):
+    """Identifiant de l'utilisateur du jeton ; None si le jeton est invalide"""
+    if kind not in FEED_KINDS:
+        return None
+    try:
+        return int(_signer(kind).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def feed_events(kind, user_id):
+    if kind == 'registrations':
+        events = Event.objects.filter(
+            registrations__user_id=user_id, registrations__status='confirmed'
+        ).exclude(status='draft')
+    else:
+        events = Event.objects.filter(organizer_id=user_id)
+    return events.only(
+        'id', 'title', 'short_description', 'start_date', 'end_date',
+        'location', 'address', 'city', 'status', 'updated_at'
+    ).order_by('start_date', 'id')
+
+
+def feed_etag(kind, user_id):
+    """Version du flux : change dès qu'une ligne est ajoutée, modifiée ou supprimée"""
+    if kind == 'registrations':
+        state = EventRegistration.objects.filter(user_id=user_id).aggregate(
+            updated=Max('updated_at'), event_updated=Max('event__updated_at'), rows=Count('id')
+        )
+    else:
+        state = Event.objects.filter(organizer_id=user_id).aggregate(
+            updated=Max('updated_at'), rows=Count('id')
+        )
+    version = '|'.join(f'{key}={state[key]}' for key in sorted(state))
+    return hashlib.sha1(f'{kind}:{user_id}:{version}'.encode()).hexdigest()
+
+
+def escape_text(value):
+    return (
+        (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def format_datetime(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold_line(line):
+    """Découper les lignes de plus de 75 octets (RFC 5545, 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, current, size = [], '', 0
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += length
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def render_event(event, host):
+    location = ', '.join(part for part in (event.location, event.address, event.city) if part)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{host}',
+        f'DTSTAMP:{format_datetime(event.updated_at)}',
+        f'DTSTART:{format_datetime(event.start_date)}',
+        f'DTEND:{format_datetime(event.end_date)}',
+        f'SUMMARY:{escape_text(event.title)}',
+        f'LOCATION:{escape_text(location)}',
+        f'STATUS:{EVENT_STATUSES.get(event.status, "CONFIRMED")}',
+    ]
+    if event.short_description:
+        lines.append(f'DESCRIPTION:{escape_text(event.short_description)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def iter_feed(kind, user_id, host):
+    """Générer le flux événement par événement"""
+    name = 'Mes inscriptions' if kind == 'registrations' else 'Mes événements'
+    yield ''.join(fold_line(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Eventfy//Eventfy//FR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(f"Eventfy - {name}")}',
+    ])
+    for event in feed_events(kind, user_id).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield render_event(event, host)
+    yield fold_line('END:VCALENDAR')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+from events.search import city_key, normalize
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcule les formes canoniques de la ville (city_key) et du lieu (location_key) '
+        'des événements existants, par lots.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        events = Event.objects.only('id', 'city', 'city_key', 'location', 'location_key').order_by('id')
+        last_id, updated = 0, 0
+        while True:
+            batch = list(events.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for event in batch:
+                keys = (city_key(event.city), normalize(event.location)[:200])
+                if (event.city_key, event.location_key) != keys:
+                    event.city_key, event.location_key = keys
+                    changed.append(event)
+            Event.objects.bulk_update(changed, ['city_key', 'location_key'])
+            updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} événements mis à jour'))
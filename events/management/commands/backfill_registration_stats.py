@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from events.models import EventDailyStats, EventRegistration
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule les agrégats quotidiens d\'inscriptions à partir de EventRegistration : '
+        'chaque inscription est comptée une fois, avec son statut actuel, le jour de sa '
+        'date d\'inscription (même définition que la mise à jour incrémentale).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Limiter le recalcul à un événement')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        registrations = EventRegistration.objects.all()
+        stats = EventDailyStats.objects.all()
+        if options['event']:
+            registrations = registrations.filter(event_id=options['event'])
+            stats = stats.filter(event_id=options['event'])
+
+        rows = registrations.order_by().annotate(
+            day=TruncDate('registration_date')
+        ).values('event_id', 'day').annotate(
+            confirmed=Count('id', filter=Q(status='confirmed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            waitlisted=Count('id', filter=Q(status='waitlist')),
+        )
+
+        with transaction.atomic():
+            stats.delete()
+            created = EventDailyStats.objects.bulk_create(
+                (EventDailyStats(**row) for row in rows.iterator()),
+                batch_size=options['batch_size']
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} agrégats quotidiens recalculés'))
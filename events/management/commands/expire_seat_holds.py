@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.models import EventRegistration
+
+
+class Command(BaseCommand):
+    help = (
+        'Libère les places retenues dont le délai est dépassé, par lots. '
+        'Chaque place rendue passe au premier de la liste d\'attente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--once', action='store_true', help='Un seul balayage puis arrêt')
+        parser.add_argument('--interval', type=float, default=15.0, help='Délai entre deux balayages (secondes)')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = EventRegistration.objects.expire_holds(batch_size=options['batch_size'])
+            if expired:
+                self.stdout.write(f'{expired} réservations expirées libérées')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from events import clusters, geo
+from events.geocoding import ADDRESS_FIELDS, address_values, geocode_many
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        'Géocode par lots les événements sans coordonnées à l\'aide du gazetteer local. '
+        'Les coordonnées saisies à la main ne sont jamais modifiées.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Recalculer aussi les coordonnées déjà géocodées'
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(latitude__isnull=True)
+        if options['refresh']:
+            events = Event.objects.filter(Q(latitude__isnull=True) | Q(geocoded=True))
+        events = events.only('id', 'latitude', 'longitude', 'geohash', 'geocoded', *ADDRESS_FIELDS).order_by('id')
+
+        last_id, examined, located = 0, 0, 0
+        while True:
+            batch = list(events.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            examined += len(batch)
+
+            changed, moved = [], []
+            for event, point in zip(batch, geocode_many([address_values(event) for event in batch])):
+                latitude, longitude = point or (None, None)
+                if (latitude, longitude) == (event.latitude, event.longitude):
+                    continue
+                moved.append(event.geohash)
+                event.latitude, event.longitude = latitude, longitude
+                event.geocoded = point is not None
+                event.geohash = geo.encode_geohash(latitude, longitude) if point else ''
+                moved.append(event.geohash)
+                changed.append(event)
+                located += point is not None
+
+            # bulk_update n'envoie pas de signaux : on invalide la carte ici
+            Event.objects.bulk_update(changed, ['latitude', 'longitude', 'geocoded', 'geohash'])
+            clusters.invalidate(*moved)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{examined} événements examinés, {located} localisés'
+        ))
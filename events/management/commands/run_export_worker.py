@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.exports import LeaseLost, claim_next_export_job, fail_export_job, run_export_job
+
+
+class Command(BaseCommand):
+    help = 'Traite les exports en arrière-plan (worker local, sans file externe ; reprend les jobs abandonnés)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Traiter les jobs en attente puis s\'arrêter')
+        parser.add_argument('--interval', type=float, default=2.0, help='Délai entre deux scrutations (secondes)')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker d\'export démarré...')
+        while True:
+            job = claim_next_export_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Export {job.pk} en cours...')
+            try:
+                run_export_job(job)
+            except LeaseLost:
+                self.stdout.write(self.style.WARNING(f'Export {job.pk} repris par un autre worker'))
+            except Exception as e:
+                fail_export_job(job, str(e))
+                self.stdout.write(self.style.ERROR(f'Export {job.pk} échoué: {e}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Export {job.pk} terminé'))
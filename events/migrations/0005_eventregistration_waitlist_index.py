@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_remove_event_views_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['event', 'status', 'registration_date'], name='events_even_event_i_b5cdf9_idx'),
+        ),
+    ]
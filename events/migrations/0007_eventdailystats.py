@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('confirmed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('waitlisted', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='events.event')),
+            ],
+            options={
+                'verbose_name_plural': 'Event daily stats',
+                'ordering': ['event', 'day'],
+                'unique_together': {('event', 'day')},
+            },
+        ),
+    ]
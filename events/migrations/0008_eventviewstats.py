@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_eventdailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventViewStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_stats', serialize=False, to='events.event')),
+                ('views_count', models.PositiveBigIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('visitors_sketch', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Event view stats',
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:02
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Figés ici : la migration ne doit pas dépendre de l'évolution de events.search
+FTS_TABLE = 'events_event_fts'
+SEARCH_FIELDS = ['title', 'location', 'city', 'description']
+
+
+def build_search_document(event):
+    text = '\n'.join(getattr(event, field) or '' for field in SEARCH_FIELDS)
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def build_documents(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    events = Event.objects.only('id', 'title', 'location', 'city', 'description')
+    batch = []
+    for event in events.iterator(chunk_size=1000):
+        event.search_document = build_search_document(event)
+        batch.append(event)
+        if len(batch) >= 1000:
+            Event.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Event.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX events_event_search_gin ON events_event "
+            "USING GIN (to_tsvector('simple', search_document))"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "search_document, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, search_document) "
+            "SELECT id, search_document FROM events_event"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS events_event_search_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_eventviewstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
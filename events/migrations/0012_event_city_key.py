@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_geocoding'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_even_city_f0a559_idx',
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='city_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['city_key', 'status', 'start_date'], name='events_even_city_ke_69e49a_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_event_city_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_event_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='location_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['city_key', 'location_key', 'end_date'], name='events_even_city_ke_d219a8_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_seat_maps'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='held_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='eventregistration',
+            name='status',
+            field=models.CharField(choices=[('confirmed', 'Confirmé'), ('waitlist', "Liste d'attente"), ('held', 'Place retenue'), ('cancelled', 'Annulé')], default='confirmed', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(condition=models.Q(('status', 'held')), fields=['hold_expires_at'], name='registration_hold_expiry'),
+        ),
+    ]
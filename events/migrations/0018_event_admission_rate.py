@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_seat_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='admission_rate',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
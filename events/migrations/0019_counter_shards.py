@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:27
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0018_event_admission_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(64)]),
+        ),
+        migrations.CreateModel(
+            name='EventCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('held', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='events.event')),
+            ],
+            options={
+                'unique_together': {('event', 'shard')},
+            },
+        ),
+    ]
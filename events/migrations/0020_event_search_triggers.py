@@ -0,0 +1,54 @@
+from django.db import migrations
+
+FTS_TABLE = 'events_event_fts'
+
+# La table FTS5 suit search_document quel que soit le chemin d'écriture
+# (save, bulk_create, bulk_update, update, SQL brut). Figés ici ; recréés après chaque
+# migrate par events.search.ensure_sqlite_triggers si une reconstruction de table les a supprimés
+TRIGGERS = [
+    (
+        'events_event_fts_insert',
+        "AFTER INSERT ON events_event BEGIN "
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, search_document) VALUES (new.id, new.search_document); END"
+    ),
+    (
+        'events_event_fts_update',
+        "AFTER UPDATE OF search_document ON events_event BEGIN "
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, search_document) VALUES (new.id, new.search_document); END"
+    ),
+    (
+        'events_event_fts_delete',
+        "AFTER DELETE ON events_event BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+]
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, body in TRIGGERS:
+        schema_editor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+    # Rattraper les écritures qui ont contourné Event.save
+    schema_editor.execute(f'DELETE FROM {FTS_TABLE}')
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, search_document) SELECT id, search_document FROM events_event'
+    )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, _ in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0019_counter_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
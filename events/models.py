@@ -1,10 +1,19 @@
-from django.db import models
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from . import geo, geocoding, search, seating
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('participant', 'Participant'),
@@ -43,6 +52,99 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class EventFullError(Exception):
+    """Plus aucune place disponible pour l'événement"""
+
+class NoContiguousSeatsError(EventFullError):
+    """Aucun bloc de places côte à côte assez grand pour le groupe"""
+
+class AlreadyRegisteredError(Exception):
+    """L'utilisateur a déjà une inscription active pour l'événement"""
+
+# Nombre maximal de lignes d'un compteur réparti
+MAX_COUNTER_SHARDS = 64
+
+# Compteurs écrits uniquement par des UPDATE conditionnels (EventManager)
+EVENT_COUNTER_FIELDS = ('current_participants', 'held_seats')
+
+class EventManager(models.Manager):
+    """
+    Compteurs de places d'un événement. Pour un événement à compteur réparti
+    (counter_shards > 0), les écritures portent sur les lignes EventCounterShard
+    au lieu des colonnes current_participants et held_seats.
+    """
+    def _shard_count(self, event_id):
+        return self.filter(pk=event_id).values_list('counter_shards', flat=True).first()
+    
+    def _with_capacity(self, event_id, count):
+        # Les places retenues (held_seats) comptent dans la jauge
+        return self.filter(pk=event_id).filter(
+            Q(max_participants__isnull=True) |
+            Q(current_participants__lte=F('max_participants') - F('held_seats') - count)
+        )
+    
+    def reserve_seats(self, event_id, count=1):
+        """
+        Réserver des places par un UPDATE conditionnel : la place n'est prise
+        que s'il reste de la capacité. Renvoie True si la réservation a réussi.
+        """
+        shards = self._shard_count(event_id)
+        if shards:
+            return EventCounterShard.objects.take(event_id, shards, count) == count
+        return self._with_capacity(event_id, count).update(
+            current_participants=F('current_participants') + count
+        ) == 1
+    
+    def release_seats(self, event_id, count=1):
+        """Libérer des places sans jamais passer sous zéro"""
+        if self._shard_count(event_id):
+            return EventCounterShard.objects.give_back(event_id, count)
+        return self.filter(
+            pk=event_id, current_participants__gte=count
+        ).update(current_participants=F('current_participants') - count) == 1
+    
+    def hold_seats(self, event_id, count=1):
+        """Retenir des places (réservation temporaire) aux mêmes conditions que reserve_seats"""
+        shards = self._shard_count(event_id)
+        if shards:
+            return EventCounterShard.objects.take(event_id, shards, count, field='held') == count
+        return self._with_capacity(event_id, count).update(held_seats=F('held_seats') + count) == 1
+    
+    def release_holds(self, event_id, count=1, confirmed=0):
+        """
+        Rendre `count` places retenues, dont `confirmed` deviennent des
+        inscriptions confirmées, en un seul UPDATE
+        """
+        if self._shard_count(event_id):
+            return EventCounterShard.objects.convert_holds(event_id, count, confirmed)
+        return self.filter(pk=event_id, held_seats__gte=count).update(
+            held_seats=F('held_seats') - count,
+            current_participants=F('current_participants') + confirmed
+        ) == 1
+    
+    def reserve_up_to(self, event_id, count):
+        """
+        Réserver autant de places que possible, dans la limite de `count`.
+        Renvoie le nombre de places obtenues ; l'UPDATE conditionnel garantit
+        la capacité, on recommence seulement si le compteur a bougé entre-temps.
+        """
+        shards = self._shard_count(event_id)
+        if shards:
+            return EventCounterShard.objects.take(event_id, shards, count, partial=True)
+        while count > 0:
+            row = self.filter(pk=event_id).values_list(
+                'current_participants', 'held_seats', 'max_participants'
+            ).first()
+            if row is None:
+                return 0
+            current, held, maximum = row
+            granted = count if maximum is None else min(count, maximum - current - held)
+            if granted <= 0:
+                return 0
+            if self.reserve_seats(event_id, granted):
+                return granted
+        return 0
+
 class Event(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Brouillon'),
@@ -61,15 +163,34 @@ class Event(models.Model):
     
     # Localisation
     location = models.CharField(max_length=200)
+    # Forme canonique du lieu, pour repérer les doubles réservations
+    location_key = models.CharField(max_length=200, blank=True, default='', editable=False)
     address = models.TextField()
     city = models.CharField(max_length=100)
+    # Forme canonique de la ville (sans accents ni casse), utilisée pour les filtres
+    city_key = models.CharField(max_length=100, blank=True, default='', editable=False)
     postal_code = models.CharField(max_length=10)
     country = models.CharField(max_length=100, default="France")
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Cellule geohash des coordonnées, pour le préfiltre des recherches par rayon
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    # Coordonnées déduites de l'adresse (et non saisies), recalculées si l'adresse change
+    geocoded = models.BooleanField(default=False, editable=False)
     
     # Détails
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     max_participants = models.PositiveIntegerField(null=True, blank=True)
+    # Salle d'attente : inscriptions admises par minute (vide = accès direct)
+    admission_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
     current_participants = models.PositiveIntegerField(default=0)
+    # Places retenues par des réservations temporaires (statut 'held') pas encore libérées
+    held_seats = models.PositiveIntegerField(default=0)
+    # Compteur réparti sur N lignes EventCounterShard pour les événements très demandés
+    # (0 = colonnes current_participants et held_seats)
+    counter_shards = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(MAX_COUNTER_SHARDS)]
+    )
     
     # Prix
     is_free = models.BooleanField(default=True)
@@ -91,43 +212,589 @@ class Event(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
     
+    # Occurrence matérialisée d'un événement récurrent : maître et horaire prévu
+    series = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='occurrences', editable=False
+    )
+    occurrence_start = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    # Texte normalisé (sans accents) indexé pour la recherche plein texte
+    search_document = models.TextField(blank=True, default='', editable=False)
+    
+    objects = EventManager()
+    
+    # Totaux du compteur réparti, chargés à la demande (ou par lots, voir EventCounterShard.objects.load_totals)
+    _counter_totals = None
+    
     class Meta:
         ordering = ['-start_date']
+        unique_together = ['series', 'occurrence_start']
         indexes = [
             models.Index(fields=['start_date', 'status']),
             models.Index(fields=['category', 'status']),
-            models.Index(fields=['city', 'status']),
+            models.Index(fields=['city_key', 'status', 'start_date']),
+            models.Index(fields=['city_key', 'location_key', 'end_date']),
+            models.Index(fields=['geohash', 'status']),
         ]
     
     def __str__(self):
         return self.title
     
-    def increment_views(self):
-        """Incrémenter le nombre de vues"""
-        self.views_count = (self.views_count or 0) + 1
-        self.save(update_fields=['views_count'])
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Cellule d'origine, pour invalider les agrégats de carte si l'événement se déplace
+        loaded = dict(zip(field_names, values))
+        instance._loaded_geohash = loaded.get('geohash', '')
+        instance._loaded_coordinates = (loaded.get('latitude'), loaded.get('longitude'))
+        instance._loaded_counters = (loaded.get('max_participants'), loaded.get('counter_shards'))
+        return instance
+    
+    def locate(self):
+        """
+        Géocoder l'adresse si les coordonnées manquent ou ont elles-mêmes été
+        géocodées ; des coordonnées saisies ne sont jamais écrasées.
+        """
+        coordinates = (self.latitude, self.longitude)
+        if self.latitude is not None and coordinates != getattr(self, '_loaded_coordinates', (None, None)):
+            self.geocoded = False
+            return
+        if self.latitude is not None and not self.geocoded:
+            return
+        point = geocoding.geocode(self)
+        self.latitude, self.longitude = point or (None, None)
+        self.geocoded = point is not None
     
     def save(self, *args, **kwargs):
         if self.status == 'published' and not self.published_at:
             self.published_at = timezone.now()
-        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'city', 'location'} & set(update_fields):
+            self.city_key = search.city_key(self.city)
+            self.location_key = search.normalize(self.location)[:200]
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'city_key', 'location_key'}
+        
+        # Document de recherche recalculé seulement si un champ indexé est enregistré
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or bool(set(update_fields) & set(search.SEARCH_FIELDS))
+        if reindex:
+            self.search_document = search.build_search_document(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'search_document'}
+        
+        if update_fields is None or set(update_fields) & set(geocoding.ADDRESS_FIELDS):
+            self.locate()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'latitude', 'longitude', 'geocoded'}
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'latitude', 'longitude'} & set(update_fields):
+            if self.latitude is not None and self.longitude is not None:
+                self.geohash = geo.encode_geohash(self.latitude, self.longitude)
+            else:
+                self.geohash = ''
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'geohash'}
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if update_fields:
+                # updated_at sert de version aux flux iCalendar
+                kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+        elif self.pk is not None and not self._state.adding:
+            # Sauvegarde complète (formulaire, admin) : les compteurs de l'instance
+            # peuvent être périmés et ne doivent pas écraser les réservations concurrentes
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in EVENT_COUNTER_FIELDS
+            ]
+        
+        counters = (self.max_participants, self.counter_shards)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            loaded = getattr(self, '_loaded_counters', (None, 0))
+            if counters != loaded and (self.counter_shards or loaded[1]):
+                # Jauge ou répartition modifiée : les parts de capacité des lignes sont recalculées
+                EventCounterShard.objects.configure(self)
+                self._counter_totals = None
+        self._loaded_coordinates = (self.latitude, self.longitude)
+        self._loaded_counters = counters
+    
+    def counter_totals(self):
+        """(participants confirmés, places retenues), lus sur les lignes du compteur réparti le cas échéant"""
+        if not self.counter_shards:
+            return self.current_participants, self.held_seats
+        if self._counter_totals is None:
+            self._counter_totals = EventCounterShard.objects.totals([self.pk]).get(self.pk, (0, 0))
+        return self._counter_totals
+    
+    def adjust_counters(self, participants=0, held=0):
+        """Garder l'instance cohérente après une écriture des compteurs, sans la relire"""
+        if not self.counter_shards:
+            self.current_participants += participants
+            self.held_seats += held
+        elif self._counter_totals is not None:
+            current, held_seats = self._counter_totals
+            self._counter_totals = (current + participants, held_seats + held)
+    
+    @property
+    def participant_count(self):
+        return self.counter_totals()[0]
+    
+    @property
+    def held_count(self):
+        return self.counter_totals()[1]
     
     @property
     def is_full(self):
         if self.max_participants is None:
             return False
-        return self.current_participants >= self.max_participants
+        return self.participant_count + self.held_count >= self.max_participants
     
     @property
     def remaining_spots(self):
         if self.max_participants is None:
             return None
-        return max(0, self.max_participants - self.current_participants)
+        return max(0, self.max_participants - self.participant_count - self.held_count)
+
+class _NotEnoughSeats(Exception):
+    pass
+
+class EventCounterShardManager(models.Manager):
+    def totals(self, event_ids):
+        """{event_id: (participants, places retenues)} en une requête groupée"""
+        rows = self.filter(event_id__in=event_ids).values('event_id').annotate(
+            participants_total=models.Sum('participants'), held_total=models.Sum('held')
+        ).order_by()
+        return {row['event_id']: (row['participants_total'], row['held_total']) for row in rows}
+    
+    def load_totals(self, events):
+        """Charger en une requête les totaux des événements à compteur réparti d'une liste"""
+        pending = [event for event in events if event.counter_shards and event.pk and event._counter_totals is None]
+        if not pending:
+            return
+        totals = self.totals([event.pk for event in pending])
+        for event in pending:
+            event._counter_totals = totals.get(event.pk, (0, 0))
+    
+    def _room(self, count):
+        # Chaque ligne ne dépasse jamais sa part de la jauge
+        return Q(capacity__isnull=True) | Q(participants__lte=F('capacity') - F('held') - count)
+    
+    def take(self, event_id, shards, count, field='participants', partial=False):
+        """
+        Prendre `count` places (ou en retenir, field='held'). Une des `shards`
+        lignes, tirée au hasard, est essayée d'abord, puis les autres ; sans
+        partial, c'est tout ou rien. Renvoie le nombre de places obtenues.
+        """
+        shard = random.randrange(shards)
+        if self.filter(event_id=event_id, shard=shard).filter(self._room(count)).update(**{field: F(field) + count}):
+            return count
+        try:
+            with transaction.atomic():
+                granted = 0
+                rows = list(self.filter(event_id=event_id).values_list('shard', 'participants', 'held', 'capacity'))
+                random.shuffle(rows)
+                for shard, participants, held, capacity in rows:
+                    wanted = count - granted
+                    if wanted <= 0:
+                        break
+                    taken = wanted if capacity is None else min(wanted, capacity - participants - held)
+                    if taken > 0 and self.filter(event_id=event_id, shard=shard).filter(
+                        self._room(taken)
+                    ).update(**{field: F(field) + taken}):
+                        granted += taken
+                if granted < count and not partial:
+                    raise _NotEnoughSeats()
+                return granted
+        except _NotEnoughSeats:
+            return 0
+    
+    def give_back(self, event_id, count=1):
+        """Rendre des places confirmées, prises sur n'importe quelles lignes"""
+        with transaction.atomic():
+            remaining = count
+            for shard, participants in self.filter(event_id=event_id, participants__gt=0).values_list('shard', 'participants'):
+                returned = min(remaining, participants)
+                if self.filter(event_id=event_id, shard=shard, participants__gte=returned).update(
+                    participants=F('participants') - returned
+                ):
+                    remaining -= returned
+                if not remaining:
+                    return True
+            transaction.set_rollback(True)
+            return False
+    
+    def convert_holds(self, event_id, count=1, confirmed=0):
+        """
+        Rendre `count` places retenues, dont `confirmed` deviennent confirmées :
+        la conversion reste dans la ligne qui retenait la place
+        """
+        with transaction.atomic():
+            for shard, held in self.filter(event_id=event_id, held__gt=0).values_list('shard', 'held'):
+                released = min(count, held)
+                kept = min(confirmed, released)
+                if self.filter(event_id=event_id, shard=shard, held__gte=released).update(
+                    held=F('held') - released, participants=F('participants') + kept
+                ):
+                    count, confirmed = count - released, confirmed - kept
+                if not count:
+                    return True
+            transaction.set_rollback(True)
+            return False
+    
+    def configure(self, event):
+        """
+        Créer, redimensionner ou supprimer les lignes du compteur d'un événement
+        et répartir la jauge entre elles : chaque ligne reçoit ce qu'elle compte
+        déjà plus une part des places libres, la somme des parts valant la jauge.
+        """
+        with transaction.atomic():
+            row = Event.objects.select_for_update().filter(pk=event.pk).values_list(
+                'current_participants', 'held_seats', 'max_participants', 'counter_shards'
+            ).first()
+            if row is None:
+                return
+            participants, held, maximum, shard_count = row
+            shards = list(self.select_for_update().filter(event_id=event.pk).order_by('shard'))
+            
+            if len(shards) != shard_count:
+                # Les compteurs existants sont regroupés avant la nouvelle répartition
+                participants += sum(shard.participants for shard in shards)
+                held += sum(shard.held for shard in shards)
+                self.filter(event_id=event.pk).delete()
+                if not shard_count:
+                    Event.objects.filter(pk=event.pk).update(current_participants=participants, held_seats=held)
+                    event.current_participants, event.held_seats = participants, held
+                    return
+                shards = [self.model(event_id=event.pk, shard=index) for index in range(shard_count)]
+                shards[0].participants, shards[0].held = participants, held
+                Event.objects.filter(pk=event.pk).update(current_participants=0, held_seats=0)
+                event.current_participants = event.held_seats = 0
+            if not shards:
+                return
+            
+            if maximum is None:
+                for shard in shards:
+                    shard.capacity = None
+            else:
+                free = max(0, maximum - sum(shard.participants + shard.held for shard in shards))
+                share, extra = divmod(free, len(shards))
+                for index, shard in enumerate(shards):
+                    shard.capacity = shard.participants + shard.held + share + (index < extra)
+            if shards and shards[0].pk is None:
+                self.bulk_create(shards)
+            else:
+                self.bulk_update(shards, ['capacity'])
+
+class EventCounterShard(models.Model):
+    """Une ligne du compteur réparti d'un événement, avec sa part de la jauge"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='counters')
+    shard = models.PositiveSmallIntegerField()
+    participants = models.PositiveIntegerField(default=0)
+    held = models.PositiveIntegerField(default=0)
+    # Part de max_participants attribuée à la ligne (vide si la jauge est illimitée)
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    
+    objects = EventCounterShardManager()
+    
+    class Meta:
+        unique_together = ['event', 'shard']
+    
+    def __str__(self):
+        return f"{self.event_id} #{self.shard}"
+
+class EventRecurrence(models.Model):
+    """Règle de répétition d'un événement (équivalent RRULE), dont il est la première occurrence"""
+    FREQUENCY_CHOICES = [
+        ('daily', 'Quotidienne'),
+        ('weekly', 'Hebdomadaire'),
+        ('monthly', 'Mensuelle'),
+    ]
+    
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='recurrence')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(52)])
+    # Jours de la semaine (0 = lundi), séparés par des virgules ; hebdomadaire uniquement
+    weekdays = models.CharField(max_length=20, blank=True)
+    until = models.DateTimeField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
+    # Fuseau dans lequel l'heure de l'événement est conservée d'une occurrence à l'autre
+    timezone = models.CharField(max_length=50, default=settings.TIME_ZONE)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.event.title} ({self.get_frequency_display()})"
+    
+    def weekday_list(self):
+        return sorted({int(day) for day in self.weekdays.split(',') if day.strip()})
+
+class EventSeatMapManager(models.Manager):
+    def _swap(self, event_id, change):
+        """
+        Appliquer change(bitmap, plan) -> (nouveau bitmap, résultat) par un UPDATE
+        conditionnel sur la version : on recommence seulement si le plan a changé
+        entre-temps. Renvoie None si l'événement n'a pas de plan.
+        """
+        while True:
+            seat_map = self.filter(event_id=event_id).first()
+            if seat_map is None:
+                return None
+            bitmap, result = change(seat_map.bitmap, seat_map)
+            if self.filter(pk=seat_map.pk, version=seat_map.version).update(
+                occupied=seating.encode(bitmap, seat_map.capacity),
+                version=F('version') + 1, updated_at=timezone.now()
+            ):
+                return result
+    
+    def allocate(self, event_id, count=1, contiguous=False):
+        """
+        Attribuer `count` places (contiguës de préférence, obligatoirement avec
+        contiguous). Renvoie la liste des places, None si l'événement n'a pas de
+        plan ; EventFullError s'il n'y a pas assez de places libres,
+        NoContiguousSeatsError si aucun bloc ne convient.
+        """
+        def change(bitmap, seat_map):
+            seats = seating.allocate(bitmap, seat_map.rows, seat_map.seats_per_row, count, contiguous)
+            if seats is None:
+                raise NoContiguousSeatsError() if contiguous else EventFullError()
+            return bitmap | seating.seats_mask(seats), seats
+        return self._swap(event_id, change)
+    
+    def release(self, event_id, seats):
+        seats = [seat for seat in seats if seat is not None]
+        if seats:
+            self._swap(event_id, lambda bitmap, seat_map: (bitmap & ~seating.seats_mask(seats), None))
+
+class EventSeatMap(models.Model):
+    """Plan de salle numéroté : une rangée de bits par rangée de places (1 = occupée)"""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='seat_map')
+    rows = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(seating.MAX_ROWS)])
+    seats_per_row = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(seating.MAX_SEATS_PER_ROW)]
+    )
+    occupied = models.BinaryField(default=b'')
+    # Incrémentée à chaque écriture du plan (mise à jour conditionnelle)
+    version = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = EventSeatMapManager()
+    
+    def __str__(self):
+        return f"{self.event.title} ({self.rows} x {self.seats_per_row})"
+    
+    @property
+    def capacity(self):
+        return self.rows * self.seats_per_row
+    
+    @property
+    def bitmap(self):
+        return seating.decode(self.occupied)
+    
+    def available(self):
+        return self.capacity - self.bitmap.bit_count()
+    
+    def label(self, seat):
+        return seating.seat_label(seat, self.seats_per_row)
+
+class EventRegistrationManager(models.Manager):
+    def register(self, event, user, notes='', waitlist=True):
+        """
+        Inscrire un utilisateur : la place est réservée atomiquement avec la
+        création (ou la réactivation) de l'inscription. Si l'événement est
+        complet, l'inscription est mise en liste d'attente (sauf waitlist=False).
+        """
+        try:
+            with transaction.atomic():
+                registration = self.select_for_update().filter(event=event, user=user).first()
+                if registration is None:
+                    registration = self.model(event=event, user=user, notes=notes, status='confirmed')
+                elif registration.status in ('cancelled', 'held'):
+                    # Une réservation temporaire devient une inscription sur la place retenue
+                    registration.status = 'confirmed'
+                    registration.notes = notes
+                    registration.event = event
+                else:
+                    raise AlreadyRegisteredError()
+                try:
+                    self._save_reclaiming(registration)
+                except EventFullError:
+                    if not waitlist:
+                        raise
+                    # Événement complet : l'utilisateur rejoint la liste d'attente
+                    registration.status = 'waitlist'
+                    registration.save()
+        except IntegrityError:
+            # Inscription concurrente du même utilisateur
+            raise AlreadyRegisteredError()
+        return registration
+    
+    def hold(self, event, user, ttl=None):
+        """
+        Retenir une place pendant `ttl` secondes (SEAT_HOLD_TTL par défaut), le
+        temps de finaliser l'inscription. La place compte dans la jauge jusqu'à
+        confirmation, annulation ou expiration. Une réservation en cours est
+        renvoyée telle quelle (sans prolonger son délai) ; EventFullError si
+        l'événement est complet.
+        """
+        expires_at = timezone.now() + timedelta(seconds=ttl or settings.SEAT_HOLD_TTL)
+        try:
+            with transaction.atomic():
+                registration = self.select_for_update().filter(event=event, user=user).first()
+                if registration is None:
+                    registration = self.model(event=event, user=user, status='held', hold_expires_at=expires_at)
+                elif registration.status == 'held':
+                    return registration
+                elif registration.status in ('cancelled', 'waitlist'):
+                    registration.status = 'held'
+                    registration.hold_expires_at = expires_at
+                    registration.event = event
+                else:
+                    raise AlreadyRegisteredError()
+                self._save_reclaiming(registration)
+        except IntegrityError:
+            raise AlreadyRegisteredError()
+        return registration
+    
+    def _save_reclaiming(self, registration):
+        """
+        Enregistrer l'inscription ; si l'événement est complet, libérer d'abord
+        ses réservations expirées pas encore balayées puis réessayer une fois.
+        """
+        try:
+            with transaction.atomic():
+                registration.save()
+        except EventFullError:
+            if not self.expire_holds(event_id=registration.event_id):
+                raise
+            registration.save()
+    
+    def expire_holds(self, event_id=None, now=None, batch_size=500):
+        """
+        Annuler les réservations temporaires expirées, par lots de `batch_size`
+        lus sur l'index partiel des réservations. Chaque place rendue passe au
+        premier de la liste d'attente, sinon elle est libérée ; les compteurs
+        sont corrigés en un UPDATE par événement. Renvoie le nombre de réservations annulées.
+        """
+        now = now or timezone.now()
+        total = 0
+        while True:
+            with transaction.atomic():
+                expired = self.select_for_update(skip_locked=True).filter(
+                    status='held', hold_expires_at__lte=now
+                )
+                if event_id is not None:
+                    expired = expired.filter(event_id=event_id)
+                batch = list(expired.order_by('hold_expires_at').values_list(
+                    'pk', 'event_id', 'seat', 'registration_date'
+                )[:batch_size])
+                if not batch:
+                    return total
+                self.filter(pk__in=[pk for pk, _, _, _ in batch]).update(
+                    status='cancelled', seat=None, hold_expires_at=None, updated_at=now
+                )
+                
+                seats_by_event = defaultdict(list)
+                for _, held_event_id, seat, registered_at in batch:
+                    seats_by_event[held_event_id].append(seat)
+                    EventDailyStats.objects.move(held_event_id, registered_at, 'held', 'cancelled')
+                for held_event_id, seats in seats_by_event.items():
+                    released = [seat for seat in seats if not self.promote_next(held_event_id, seat=seat)]
+                    Event.objects.release_holds(held_event_id, len(seats), confirmed=len(seats) - len(released))
+                    EventSeatMap.objects.release(held_event_id, released)
+            total += len(batch)
+            if len(batch) < batch_size:
+                return total
+    
+    def bulk_register(self, event, users, notes='', all_or_nothing=False, contiguous=False):
+        """
+        Inscrire un groupe d'utilisateurs en une transaction : les places sont
+        réservées en un seul UPDATE et les inscriptions insérées par bulk_create.
+        Avec all_or_nothing, EventFullError est levée s'il manque des places ;
+        sinon les inscriptions excédentaires passent en liste d'attente. Avec
+        contiguous, les places confirmées d'une salle numérotée forment un bloc
+        dans une rangée (NoContiguousSeatsError sinon, rien n'est enregistré).
+        Renvoie un dictionnaire {user_id: statut}.
+        """
+        results = {}
+        with transaction.atomic():
+            existing = {
+                registration.user_id: registration
+                for registration in self.select_for_update().filter(event=event, user__in=users)
+            }
+            candidates = []
+            for user in users:
+                registration = existing.get(user.pk)
+                if registration is not None and registration.status != 'cancelled':
+                    results[user.pk] = 'already_registered'
+                else:
+                    candidates.append(user)
+            
+            if all_or_nothing:
+                if not Event.objects.reserve_seats(event.pk, len(candidates)):
+                    raise EventFullError()
+                granted = len(candidates)
+            else:
+                granted = Event.objects.reserve_up_to(event.pk, len(candidates))
+            # Salle numérotée : le groupe est placé côte à côte si possible (ou obligatoirement)
+            seats = (EventSeatMap.objects.allocate(event.pk, granted, contiguous) if granted else None) or []
+            event.adjust_counters(granted)
+            
+            now = timezone.now()
+            to_create = []
+            reactivated = []
+            for index, user in enumerate(candidates):
+                registration_status = 'confirmed' if index < granted else 'waitlist'
+                seat = seats[index] if index < len(seats) else None
+                results[user.pk] = registration_status
+                if user.pk in existing:
+                    registration = existing[user.pk]
+                    # L'inscription réactivée quitte les annulations de son ancien jour
+                    EventDailyStats.objects.move(event.pk, registration.registration_date, 'cancelled')
+                    registration.status, registration.notes, registration.seat = registration_status, notes, seat
+                    registration.registration_date = registration.updated_at = now
+                    reactivated.append(registration)
+                else:
+                    to_create.append(self.model(
+                        event=event, user=user, notes=notes, status=registration_status, seat=seat
+                    ))
+            
+            # bulk_create ne passe pas par save() : les places sont déjà comptées
+            self.bulk_create(to_create)
+            self.bulk_update(reactivated, ['status', 'notes', 'seat', 'registration_date', 'updated_at'])
+            
+            if candidates:
+                EventDailyStats.objects.record(
+                    event.pk, day=timezone.localdate(now), confirmed=granted, waitlist=len(candidates) - granted
+                )
+        return results
+    
+    def promote_next(self, event_id, seat=None):
+        """
+        Transférer une place libérée (et son siège numéroté) au premier inscrit
+        de la liste d'attente (ordre d'arrivée). Renvoie True si quelqu'un a été promu.
+        """
+        candidates = self.select_for_update(skip_locked=True).filter(
+            event_id=event_id, status='waitlist'
+        ).order_by('registration_date', 'id').values_list('pk', 'registration_date')[:1]
+        for pk, registered_at in candidates:
+            if self.filter(pk=pk, status='waitlist').update(status='confirmed', seat=seat, updated_at=timezone.now()):
+                EventDailyStats.objects.move(event_id, registered_at, 'waitlist', 'confirmed')
+                return True
+        return False
 
 class EventRegistration(models.Model):
     STATUS_CHOICES = [
         ('confirmed', 'Confirmé'),
         ('waitlist', 'Liste d\'attente'),
+        ('held', 'Place retenue'),
         ('cancelled', 'Annulé'),
     ]
     
@@ -136,25 +803,227 @@ class EventRegistration(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
     registration_date = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
+    # Place attribuée dans le plan de salle (index du bit), pour une inscription confirmée
+    seat = models.PositiveIntegerField(null=True, blank=True)
+    # Fin de validité d'une place retenue (statut 'held')
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = EventRegistrationManager()
+    
+    # Statuts qui occupent une place de la jauge
+    PLACE_STATUSES = ('confirmed', 'held')
+    
+    # Statut tel que lu en base, pour détecter les transitions
+    _loaded_status = None
     
     class Meta:
         unique_together = ['event', 'user']
         ordering = ['-registration_date']
+        indexes = [
+            # Promotion de la liste d'attente : premier inscrit par événement
+            models.Index(fields=['event', 'status', 'registration_date']),
+            # Balayage des réservations expirées : seules les places retenues sont indexées
+            models.Index(fields=['hold_expires_at'], condition=Q(status='held'), name='registration_hold_expiry'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'seat'], condition=Q(seat__isnull=False), name='unique_event_seat'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+    
+    def _adjust_cached_event(self, delta, held=0):
+        # Garder l'événement déjà chargé cohérent sans le relire
+        event = self._state.fields_cache.get('event')
+        if event is not None:
+            event.adjust_counters(delta, held)
+    
+    def _take_place(self, previous):
+        """Réserver la place (et le siège) d'une inscription qui devient confirmée ou retenue"""
+        if self.status == 'confirmed' and previous == 'held':
+            # Réservation pas encore balayée (même expirée) : sa place n'a été donnée à personne
+            if EventRegistration.objects.filter(pk=self.pk, status='held').update(status='confirmed'):
+                Event.objects.release_holds(self.event_id, confirmed=1)
+                self._adjust_cached_event(1, held=-1)
+                return
+            self.seat = None
+        if self.status == 'confirmed':
+            reserved = Event.objects.reserve_seats(self.event_id)
+        else:
+            reserved = Event.objects.hold_seats(self.event_id)
+        if not reserved:
+            raise EventFullError()
+        # Salle numérotée : le siège est pris dans la même transaction
+        seats = EventSeatMap.objects.allocate(self.event_id)
+        if seats:
+            self.seat = seats[0]
+        if self.status == 'confirmed':
+            self._adjust_cached_event(1)
+        else:
+            self._adjust_cached_event(0, held=1)
+    
+    def _free_place(self, previous, seat):
+        """La place quittée passe au premier de la liste d'attente, sinon elle est libérée"""
+        promoted = EventRegistration.objects.promote_next(self.event_id, seat=seat)
+        if previous == 'held':
+            Event.objects.release_holds(self.event_id, confirmed=int(promoted))
+            self._adjust_cached_event(int(promoted), held=-1)
+        elif not promoted:
+            Event.objects.release_seats(self.event_id)
+            self._adjust_cached_event(-1)
+        if not promoted:
+            EventSeatMap.objects.release(self.event_id, [seat])
+    
     def save(self, *args, **kwargs):
-        if self.status == 'confirmed' and self.pk is None:
-            # Nouvelle inscription confirmée
-            self.event.current_participants += 1
-            self.event.save()
-        elif self.status == 'cancelled' and self.pk and self._state.fields_cache.get('status') != 'cancelled':
-            # Annulation d'une inscription confirmée
-            if self._state.fields_cache.get('status') == 'confirmed':
-                self.event.current_participants -= 1
-                self.event.save()
-        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None:
+            # updated_at sert de version aux flux iCalendar
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'updated_at', 'seat', 'hold_expires_at'}
+        previous = self._loaded_status if self.pk else None
+        changed = self.status != previous
+        if self.status != 'held':
+            self.hold_expires_at = None
+        # Une place retenue qui devient confirmée est conservée
+        converting = previous == 'held' and self.status == 'confirmed'
+        with transaction.atomic():
+            if changed and previous in self.PLACE_STATUSES and not converting:
+                # Transition conditionnelle : une seule annulation libère la place
+                if EventRegistration.objects.filter(pk=self.pk, status=previous).update(
+                    status=self.status, seat=None, hold_expires_at=None
+                ):
+                    self._free_place(previous, self.seat)
+                else:
+                    changed = False
+                self.seat = None
+            if changed and self.status in self.PLACE_STATUSES:
+                self._take_place(previous)
+            super().save(*args, **kwargs)
+            if changed:
+                EventDailyStats.objects.move(self.event_id, self.registration_date, previous, self.status)
+        self._loaded_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if self._loaded_status in self.PLACE_STATUSES:
+                seat, self.seat = self.seat, None
+                if self.pk and seat is not None:
+                    # Le siège doit être libre avant d'être transféré
+                    EventRegistration.objects.filter(pk=self.pk).update(seat=None)
+                self._free_place(self._loaded_status, seat)
+            return super().delete(*args, **kwargs)
+    
+    def waitlist_position(self):
+        """Position (1-based) dans la liste d'attente, None si non applicable"""
+        if self.status != 'waitlist':
+            return None
+        return EventRegistration.objects.filter(
+            event_id=self.event_id, status='waitlist'
+        ).filter(
+            Q(registration_date__lt=self.registration_date) |
+            Q(registration_date=self.registration_date, id__lt=self.id)
+        ).count() + 1
+    
+    def cancel(self):
+        """Annuler l'inscription et libérer la place"""
+        self.status = 'cancelled'
+        self.save(update_fields=['status'])
+
+class EventDailyStatsManager(models.Manager):
+    # Statut d'inscription -> colonne de l'agrégat
+    STATUS_FIELDS = {
+        'confirmed': 'confirmed',
+        'cancelled': 'cancelled',
+        'waitlist': 'waitlisted',
+    }
+    
+    def record(self, event_id, day=None, **deltas):
+        """
+        Ajuster les compteurs du jour pour un événement, par exemple
+        record(event_id, confirmed=1). Les clés sont des statuts d'inscription.
+        """
+        changes = {
+            self.STATUS_FIELDS[status]: Greatest(F(self.STATUS_FIELDS[status]) + delta, 0)
+            for status, delta in deltas.items() if delta
+        }
+        if not changes:
+            return
+        day = day or timezone.localdate()
+        if self.filter(event_id=event_id, day=day).update(**changes):
+            return
+        if all(delta <= 0 for delta in deltas.values()):
+            # Rien à retirer d'un jour sans agrégat
+            return
+        try:
+            with transaction.atomic():
+                self.create(event_id=event_id, day=day, **{
+                    self.STATUS_FIELDS[status]: max(delta, 0) for status, delta in deltas.items()
+                })
+        except IntegrityError:
+            # Ligne du jour créée entre-temps par une autre requête
+            self.filter(event_id=event_id, day=day).update(**changes)
+    
+    def move(self, event_id, registered_at, previous=None, current=None, count=1):
+        """
+        Faire passer `count` inscriptions de `previous` à `current` dans
+        l'agrégat de leur jour d'inscription. Chaque inscription est comptée une
+        fois, avec son statut actuel (hors places retenues), le jour de sa date
+        d'inscription : la même définition que backfill_registration_stats.
+        """
+        deltas = Counter()
+        if previous in self.STATUS_FIELDS:
+            deltas[previous] -= count
+        if current in self.STATUS_FIELDS:
+            deltas[current] += count
+        self.record(event_id, day=timezone.localdate(registered_at), **deltas)
+
+class EventDailyStats(models.Model):
+    """
+    Inscriptions agrégées par événement et par jour d'inscription, selon leur
+    statut actuel, mises à jour à chaque écriture
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    confirmed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    waitlisted = models.PositiveIntegerField(default=0)
+    
+    objects = EventDailyStatsManager()
+    
+    class Meta:
+        unique_together = ['event', 'day']
+        ordering = ['event', 'day']
+        verbose_name_plural = "Event daily stats"
+    
+    def __str__(self):
+        return f"{self.event_id} - {self.day}"
+
+@receiver(post_delete, sender=EventRegistration)
+def remove_registration_from_stats(sender, instance, **kwargs):
+    # Une inscription supprimée (y compris en cascade) n'est plus comptée
+    EventDailyStats.objects.move(instance.event_id, instance.registration_date, instance._loaded_status)
+
+class EventViewStats(models.Model):
+    """Vues d'un événement, écrites par lots depuis le tampon de events.analytics"""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='view_stats')
+    views_count = models.PositiveBigIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    # Registres HyperLogLog des visiteurs
+    visitors_sketch = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Event view stats"
+    
+    def __str__(self):
+        return f"{self.event_id} - {self.views_count} vues"
 
 class EventImage(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='images')
@@ -185,3 +1054,70 @@ class EventComment(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
+
+class ExportJob(models.Model):
+    SCOPE_CHOICES = [
+        ('event', 'Un événement'),
+        ('organizer', 'Tous mes événements'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, default='event')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True, related_name='export_jobs')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    since = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progression
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    
+    file = models.FileField(upload_to='exports/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    # Bail du worker : renouvelé à chaque étape, le job est repris s'il expire
+    attempts = models.PositiveIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Export {self.pk} - {self.user.username} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.processed_rows * 100 / self.total_rows))
+
+class GeocodeCache(models.Model):
+    """Résultat du géocodage d'une adresse normalisée (coordonnées vides si inconnue)"""
+    key = models.CharField(max_length=40, unique=True)
+    query = models.TextField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    source = models.CharField(max_length=10, blank=True)  # 'venue', 'city' ou vide
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.query
@@ -0,0 +1,190 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class EventCursorPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur (start_date, id), ou sur
+    (distance_km, start_date, id) pour les recherches à proximité.
+    Aucune requête COUNT(*) ni OFFSET : chaque page reprend après la dernière
+    clé lue, quelle que soit la profondeur. ?include_total=1 ajoute un total approximatif.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    total_query_param = 'include_total'
+    # Au-delà de ce seuil, le total calculé hors PostgreSQL est tronqué
+    approximate_total_cap = 1000
+    invalid_cursor_message = 'Curseur invalide'
+    # Clé parcourue selon le premier champ de tri, et conversion des valeurs du curseur
+    keysets = {
+        'start_date': ('start_date', 'id'),
+        'distance_km': ('distance_km', 'start_date', 'id'),
+    }
+    key_parsers = {
+        'start_date': parse_datetime,
+        'distance_km': float,
+        'id': int,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None, page_size=None):
+        """page_size : taille par défaut propre à l'action, si ?page_size= est absent"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fallback = None
+        page_size = self.get_page_size(request, default=page_size)
+
+        # Un tri explicite sur un autre champ (?ordering=price) ne peut pas
+        # utiliser de clé : on revient à la pagination par page
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        leading = ordering[0] if ordering else '-start_date'
+        if leading.lstrip('-') not in self.keysets:
+            self.fallback = PageNumberPagination()
+            self.fallback.page_size = page_size
+            return self.fallback.paginate_queryset(queryset, request, view)
+        self.fields = self.keysets[leading.lstrip('-')]
+        self.descending = leading.startswith('-')
+
+        self.total = None
+        if request.query_params.get(self.total_query_param) in ('1', 'true'):
+            self.total = self.estimate_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        # En mode « précédent », on parcourt l'index dans l'autre sens
+        descending = self.descending != reverse
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field in self.fields])
+
+        if cursor:
+            lookup = 'lt' if descending else 'gt'
+            after = Q()
+            for index, field in enumerate(self.fields):
+                equal = dict(zip(self.fields[:index], cursor['k']))
+                after |= Q(**equal, **{f'{field}__{lookup}': cursor['k'][index]})
+            queryset = queryset.filter(after)
+
+        results = list(queryset[:page_size + 1])
+        virtual = self.get_virtual_events(view, cursor, descending)
+        if virtual:
+            results = sorted(results + virtual, key=self.position, reverse=descending)[:page_size + 1]
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def position(self, event):
+        """Valeurs de la clé ; une occurrence calculée prend l'id de son maître"""
+        return tuple(
+            (event.pk if event.pk is not None else event.series_id) if field == 'id' else getattr(event, field)
+            for field in self.fields
+        )
+
+    def get_virtual_events(self, view, cursor, descending):
+        """Occurrences non enregistrées fournies par la vue, au-delà du curseur"""
+        if view is None or not hasattr(view, 'get_virtual_events'):
+            return []
+        events = view.get_virtual_events()
+        if cursor:
+            bound = tuple(cursor['k'])
+            if descending:
+                events = [event for event in events if self.position(event) < bound]
+            else:
+                events = [event for event in events if self.position(event) > bound]
+        return events
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            payload['count'], payload['count_is_exact'] = self.total
+        payload['results'] = data
+        return Response(payload)
+
+    def get_page_size(self, request, default=None):
+        default = default or self.page_size
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return default
+        if size <= 0:
+            return default
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, event, reverse):
+        values = [
+            value.isoformat() if field == 'start_date' else value
+            for field, value in zip(self.fields, self.position(event))
+        ]
+        position = {'k': values, 'r': int(reverse)}
+        token = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            values = position['k']
+            if len(values) != len(self.fields):
+                raise ValueError()
+            position['k'] = [self.key_parsers[field](value) for field, value in zip(self.fields, values)]
+            position['r'] = bool(position.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position['k']:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def estimate_count(self, queryset):
+        """Retourne (total, exact) sans parcourir toute la table"""
+        queryset = queryset.order_by()
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            # Estimation du planificateur : coût constant
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows']), False
+
+        # Ailleurs : comptage borné
+        capped = queryset[:self.approximate_total_cap + 1].count()
+        return min(capped, self.approximate_total_cap), capped <= self.approximate_total_cap
@@ -0,0 +1,161 @@
+"""
+Événements récurrents.
+
+Un événement « maître » porte une règle EventRecurrence (équivalent d'une
+RRULE : fréquence, intervalle, jours, UNTIL, COUNT) et constitue la première
+occurrence. Les occurrences suivantes ne sont pas stockées : elles sont
+calculées à la demande pour la fenêtre de dates consultée. Une occurrence
+n'obtient une ligne Event (series = maître, occurrence_start = horaire prévu)
+que lorsqu'elle en a besoin : inscription ou modification ponctuelle.
+Les occurrences matérialisées remplacent alors l'occurrence calculée.
+"""
+import copy
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import IntegrityError, transaction
+
+# Garde-fous de l'expansion
+MAX_OCCURRENCES = 1000
+MAX_WINDOW = timedelta(days=366)
+
+# Champs recopiés du maître vers une occurrence matérialisée
+COPIED_FIELDS = [
+    'title', 'description', 'short_description', 'location', 'address', 'city',
+    'postal_code', 'country', 'latitude', 'longitude', 'category', 'max_participants',
+    'is_free', 'price', 'organizer', 'status', 'is_featured', 'is_private', 'main_image',
+    'admission_rate', 'counter_shards',
+]
+
+
+def _add_months(day, months):
+    """Même jour du mois, None si le mois ne le contient pas (31 février)"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    try:
+        return day.replace(year=year, month=month)
+    except ValueError:
+        return None
+
+
+def _local_dates(rule, first_day, from_day):
+    """Dates locales des occurrences, dans l'ordre, à partir de from_day environ"""
+    interval = rule.interval
+    if rule.frequency == 'daily':
+        # Saut direct à la première période utile (sauf avec COUNT, qui compte depuis le début)
+        step = 0 if rule.count else max(0, (from_day - first_day).days // interval - 1)
+        while True:
+            yield first_day + timedelta(days=step * interval)
+            step += 1
+    elif rule.frequency == 'weekly':
+        weekdays = rule.weekday_list() or [first_day.weekday()]
+        first_monday = first_day - timedelta(days=first_day.weekday())
+        step = 0 if rule.count else max(0, (from_day - first_monday).days // (7 * interval) - 1)
+        while True:
+            monday = first_monday + timedelta(weeks=step * interval)
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if day >= first_day:
+                    yield day
+            step += 1
+    else:
+        months = (from_day.year - first_day.year) * 12 + from_day.month - first_day.month
+        step = 0 if rule.count else max(0, months // interval - 1)
+        while True:
+            day = _add_months(first_day, step * interval)
+            if day is not None:
+                yield day
+            step += 1
+
+
+def occurrence_starts(rule, first_start, window_start, window_end):
+    """
+    Débuts des occurrences dans [window_start, window_end), calculés en heure
+    locale du fuseau de la règle (19 h reste 19 h après un changement d'heure).
+    La première occurrence (l'événement maître) est comprise.
+    """
+    tz = ZoneInfo(rule.timezone)
+    local_first = first_start.astimezone(tz)
+    from_day = max(window_start, first_start).astimezone(tz).date()
+    for index, day in enumerate(_local_dates(rule, local_first.date(), from_day)):
+        if index >= MAX_OCCURRENCES or (rule.count and index >= rule.count):
+            return
+        start = datetime.combine(day, local_first.time(), tzinfo=tz)
+        if start >= window_end or (rule.until and start > rule.until):
+            return
+        if start >= window_start:
+            yield start
+
+
+def virtual_occurrence(master, start):
+    """Occurrence non enregistrée : copie du maître décalée à `start`"""
+    occurrence = copy.copy(master)
+    occurrence._state = copy.copy(master._state)
+    occurrence.pk = None
+    occurrence.start_date = start
+    occurrence.end_date = start + (master.end_date - master.start_date)
+    occurrence.series_id = master.pk
+    occurrence.occurrence_start = start
+    occurrence.current_participants = 0
+    occurrence.held_seats = 0
+    occurrence._counter_totals = (0, 0)
+    occurrence.published_at = None
+    return occurrence
+
+
+def expand(masters, window_start, window_end):
+    """
+    Occurrences calculées des maîtres dans la fenêtre, hors première
+    occurrence et occurrences déjà matérialisées (une requête pour ces dernières).
+    """
+    from .models import Event
+
+    masters = [master for master in masters if getattr(master, 'recurrence', None)]
+    if not masters:
+        return []
+    stored = set(Event.objects.filter(
+        series__in=masters, occurrence_start__gte=window_start, occurrence_start__lt=window_end
+    ).values_list('series_id', 'occurrence_start'))
+
+    occurrences = []
+    for master in masters:
+        for start in occurrence_starts(master.recurrence, master.start_date, window_start, window_end):
+            if start != master.start_date and (master.pk, start) not in stored:
+                occurrences.append(virtual_occurrence(master, start))
+    return occurrences
+
+
+def is_occurrence(master, start):
+    rule = master.recurrence
+    return any(
+        candidate == start
+        for candidate in occurrence_starts(rule, master.start_date, start, start + timedelta(seconds=1))
+    )
+
+
+def materialize(master, start):
+    """
+    Ligne Event de l'occurrence prévue à `start` (créée au besoin).
+    Renvoie (événement, créé) ; le maître lui-même pour la première occurrence.
+    """
+    from .models import Event
+
+    if start == master.start_date:
+        return master, False
+    existing = Event.objects.filter(series=master, occurrence_start=start).first()
+    if existing is not None:
+        return existing, False
+    occurrence = Event(
+        series=master,
+        occurrence_start=start,
+        start_date=start,
+        end_date=start + (master.end_date - master.start_date),
+        **{field: getattr(master, field) for field in COPIED_FIELDS}
+    )
+    try:
+        with transaction.atomic():
+            occurrence.save()
+    except IntegrityError:
+        # Matérialisée en parallèle par une autre requête
+        return Event.objects.get(series=master, occurrence_start=start), False
+    return occurrence, True
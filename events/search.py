@@ -0,0 +1,217 @@
+"""
+Recherche plein texte des événements.
+
+Chaque événement porte un `search_document` (titre, lieu, ville, description)
+normalisé sans accents ni majuscules, recalculé dans Event.save (une écriture
+par update() sur ces champs doit aussi fournir search_document). Il est indexé :
+- sur PostgreSQL par un index GIN sur to_tsvector('simple', search_document) ;
+- sur SQLite par la table FTS5 `events_event_fts`, tenue à jour par des triggers
+  sur events_event, quel que soit le chemin d'écriture. SQLite supprime ces
+  triggers quand une migration reconstruit la table : ils sont recréés après
+  chaque migrate (ensure_sqlite_triggers, branché sur post_migrate).
+Les autres moteurs se rabattent sur un filtre `contains` sur le document.
+"""
+import re
+import unicodedata
+
+from django.db import connection, connections
+from django.db.models import F, Func
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+FTS_TABLE = 'events_event_fts'
+
+# Champs d'Event qui composent le document de recherche
+SEARCH_FIELDS = ['title', 'location', 'city', 'description']
+
+SNIPPET_WIDTH = 160
+
+TOKEN_RE = re.compile(r'\w+')
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+# Triggers de synchronisation de la table FTS5 (mêmes définitions que la migration 0020)
+FTS_TRIGGERS = {
+    'events_event_fts_insert': (
+        "AFTER INSERT ON events_event BEGIN "
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, search_document) VALUES (new.id, new.search_document); END"
+    ),
+    'events_event_fts_update': (
+        "AFTER UPDATE OF search_document ON events_event BEGIN "
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, search_document) VALUES (new.id, new.search_document); END"
+    ),
+    'events_event_fts_delete': (
+        "AFTER DELETE ON events_event BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+}
+
+
+def fold(text):
+    """Minuscules sans accents : « Fête » -> « fete »"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def normalize(text):
+    """Repliée, ponctuation remplacée par des espaces : « Saint-Louis » -> « saint louis »"""
+    return NON_WORD_RE.sub(' ', fold(text)).strip()
+
+
+def city_key(city):
+    """Forme canonique d'un nom de ville : « DAKAR », « dakar » et « Dakar » se confondent"""
+    return normalize(city)[:100]
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(fold(query))[:10]
+
+
+def build_search_document(event):
+    return fold('\n'.join(getattr(event, field) or '' for field in SEARCH_FIELDS))
+
+
+def ensure_sqlite_triggers(using='default', **kwargs):
+    """
+    Recréer les triggers FTS5 manquants et, dans ce cas, resynchroniser la
+    table : des écritures ont pu être faites pendant leur absence
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE (type = 'table' AND name = %s) "
+            "OR (type = 'trigger' AND tbl_name = 'events_event')", [FTS_TABLE]
+        )
+        existing = {(kind, name) for kind, name in cursor.fetchall()}
+        if ('table', FTS_TABLE) not in existing:
+            # Migration 0009 pas encore appliquée
+            return
+        missing = [name for name in FTS_TRIGGERS if ('trigger', name) not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {FTS_TRIGGERS[name]}')
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, search_document) SELECT id, search_document FROM events_event'
+        )
+
+
+def _vendor():
+    return connection.vendor
+
+
+def _fts5_query(tokens):
+    # Chaque mot entre guillemets, en préfixe : aucune syntaxe FTS5 injectée
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _tsquery(tokens):
+    from django.contrib.postgres.search import SearchQuery
+
+    return SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple')
+
+
+def _document_vector():
+    """to_tsvector('simple', search_document), à l'identique de l'expression indexée"""
+    from django.contrib.postgres.search import SearchVectorField
+
+    return Func(
+        F('search_document'), template="to_tsvector('simple'::regconfig, %(expressions)s)",
+        output_field=SearchVectorField()
+    )
+
+
+def filter_queryset(queryset, query):
+    """Restreindre un queryset d'événements aux correspondances de la recherche"""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+    vendor = _vendor()
+    if vendor == 'postgresql':
+        return queryset.alias(search_vector=_document_vector()).filter(search_vector=_tsquery(tokens))
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts5_query(tokens)]
+        ))
+    for token in tokens:
+        queryset = queryset.filter(search_document__contains=token)
+    return queryset
+
+
+def _sqlite_ranked(queryset, tokens, limit):
+    """
+    Une seule évaluation de MATCH : les meilleures entrées FTS5 parmi les
+    événements du queryset, puis ces événements en une requête
+    """
+    candidates, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        # rank vaut bm25 (négatif, plus petit = meilleur) : on l'inverse
+        cursor.execute(
+            f'SELECT rowid, -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid IN ({candidates}) ORDER BY rank LIMIT %s',
+            [_fts5_query(tokens), *params, limit]
+        )
+        ranks = dict(cursor.fetchall())
+    events = queryset.in_bulk(list(ranks))
+    for event_id, event in events.items():
+        event.search_rank = ranks[event_id]
+    return sorted(events.values(), key=lambda event: (-event.search_rank, -event.start_date.timestamp()))
+
+
+def ranked_search(queryset, query, limit=20):
+    """Événements correspondants, du plus pertinent au moins pertinent (attribut search_rank)"""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    vendor = _vendor()
+    if vendor == 'sqlite':
+        return _sqlite_ranked(queryset, tokens, limit)
+    queryset = filter_queryset(queryset, query)
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchRank
+
+        queryset = queryset.annotate(search_rank=SearchRank(F('search_vector'), _tsquery(tokens)))
+        return list(queryset.order_by('-search_rank', '-start_date')[:limit])
+    return list(queryset.order_by('-start_date')[:limit])
+
+
+def _folded_with_positions(text):
+    """Texte replié et, pour chaque caractère replié, sa position dans l'original"""
+    folded, positions = [], []
+    for index, char in enumerate(text):
+        for folded_char in fold(char):
+            folded.append(folded_char)
+            positions.append(index)
+    return ''.join(folded), positions
+
+
+def highlight(text, query, width=SNIPPET_WIDTH):
+    """Extrait autour de la première correspondance, termes entourés de <mark>"""
+    text = text or ''
+    tokens = tokenize(query)
+    folded, positions = _folded_with_positions(text)
+    matches = []
+    for token in tokens:
+        for match in re.finditer(r'\b' + re.escape(token), folded):
+            end = match.end()
+            while end < len(folded) and folded[end].isalnum():
+                end += 1
+            matches.append((positions[match.start()], positions[end - 1] + 1))
+    if not matches:
+        return escape(text[:width]) + ('…' if len(text) > width else '')
+
+    matches.sort()
+    start = max(0, matches[0][0] - width // 3)
+    end = min(len(text), start + width)
+    parts, cursor = [], start
+    for match_start, match_end in matches:
+        if match_start < cursor or match_end > end:
+            continue
+        parts.append(escape(text[cursor:match_start]))
+        parts.append(f'<mark>{escape(text[match_start:match_end])}</mark>')
+        cursor = match_end
+    parts.append(escape(text[cursor:end]))
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
@@ -0,0 +1,94 @@
+"""
+Plans de salle numérotés.
+
+Un plan est une grille de `rows` rangées de `seats_per_row` places. L'occupation
+est un ensemble de bits (bit i = place i, rangée i // seats_per_row), stocké en
+octets little-endian et manipulé comme un entier Python : chercher N places
+contiguës revient à quelques décalages et ET logiques sur tout le plan à la
+fois (O(log N) opérations sur l'entier), sans parcourir les places une à une.
+"""
+from functools import lru_cache
+
+MAX_ROWS = 500
+MAX_SEATS_PER_ROW = 500
+
+
+def decode(data):
+    return int.from_bytes(bytes(data or b''), 'little')
+
+
+def encode(bitmap, capacity):
+    return bitmap.to_bytes((capacity + 7) // 8, 'little')
+
+
+def seats_mask(seats):
+    mask = 0
+    for seat in seats:
+        mask |= 1 << seat
+    return mask
+
+
+@lru_cache(maxsize=256)
+def start_mask(rows, seats_per_row, count):
+    """Places où peut commencer un bloc de `count` places sans déborder de la rangée"""
+    if count > seats_per_row:
+        return 0
+    row_starts = (1 << (seats_per_row - count + 1)) - 1
+    # Répétition du motif sur chaque rangée : motif * (1 + 2^p + 2^2p + ...)
+    repeat = ((1 << (rows * seats_per_row)) - 1) // ((1 << seats_per_row) - 1)
+    return row_starts * repeat
+
+
+def find_block(occupied, rows, seats_per_row, count):
+    """Première place (de l'avant de la salle) d'un bloc de `count` places libres contiguës, ou None"""
+    capacity = rows * seats_per_row
+    free = ~occupied & ((1 << capacity) - 1)
+    # runs : bits i tels que les places i .. i + length - 1 sont libres ; la longueur double à chaque tour
+    runs, length = free, 1
+    while length < count and runs:
+        step = min(length, count - length)
+        runs &= runs >> step
+        length += step
+    runs &= start_mask(rows, seats_per_row, count)
+    if not runs:
+        return None
+    return (runs & -runs).bit_length() - 1
+
+
+def first_free(occupied, capacity, count):
+    """Les `count` premières places libres, ou None s'il n'y en a pas assez"""
+    free = ~occupied & ((1 << capacity) - 1)
+    seats = []
+    while free and len(seats) < count:
+        lowest = free & -free
+        seats.append(lowest.bit_length() - 1)
+        free ^= lowest
+    return seats if len(seats) == count else None
+
+
+def allocate(occupied, rows, seats_per_row, count, contiguous=False):
+    """
+    Places attribuées à un groupe de `count` personnes : un bloc contigu dans une
+    rangée si possible, sinon (sauf contiguous=True) les premières places libres.
+    """
+    start = find_block(occupied, rows, seats_per_row, count)
+    if start is not None:
+        return list(range(start, start + count))
+    if contiguous:
+        return None
+    return first_free(occupied, rows * seats_per_row, count)
+
+
+def row_name(row):
+    """A, B, ..., Z, AA, AB, ..."""
+    name = ''
+    row += 1
+    while row:
+        row, remainder = divmod(row - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def seat_label(seat, seats_per_row):
+    row, number = divmod(seat, seats_per_row)
+    return f'{row_name(row)}{number + 1}'
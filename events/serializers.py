@@ -1,6 +1,13 @@
+import base64
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, Event, EventRegistration, EventImage, EventComment, UserProfile
+from django.db import models
+from . import conflicts, seating, waiting_room
+from .models import (
+    Category, Event, EventRegistration, EventImage, EventComment, UserProfile, ExportJob, EventRecurrence, EventSeatMap,
+    EventCounterShard
+)
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -56,11 +63,21 @@ class EventCommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'content', 'rating', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class EventCounterListSerializer(serializers.ListSerializer):
+    """Listes d'événements : totaux des compteurs répartis chargés en une requête"""
+    
+    def to_representation(self, data):
+        events = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        EventCounterShard.objects.load_totals(events)
+        return super().to_representation(events)
+
 class EventSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     organizer = UserSerializer(read_only=True)
     images = EventImageSerializer(many=True, read_only=True)
     comments = EventCommentSerializer(many=True, read_only=True)
+    # Total des lignes pour un événement à compteur réparti
+    current_participants = serializers.IntegerField(source='participant_count', read_only=True)
     is_full = serializers.ReadOnlyField()
     remaining_spots = serializers.ReadOnlyField()
     
@@ -69,13 +86,102 @@ class EventSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'short_description',
             'start_date', 'end_date', 'location', 'address', 'city',
-            'postal_code', 'country', 'category', 'max_participants',
-            'current_participants', 'is_free', 'price', 'organizer',
+            'postal_code', 'country', 'latitude', 'longitude', 'category', 'max_participants',
+            'admission_rate', 'counter_shards', 'current_participants', 'is_free', 'price', 'organizer',
             'status', 'is_featured', 'is_private', 'main_image', 'created_at',
             'updated_at', 'published_at', 'images', 'comments',
-            'is_full', 'remaining_spots'
+            'is_full', 'remaining_spots', 'geocoded', 'series', 'occurrence_start'
+        ]
+        list_serializer_class = EventCounterListSerializer
+        read_only_fields = [
+            'id', 'created_at', 'updated_at', 'published_at', 'current_participants', 'geocoded',
+            'series', 'occurrence_start'
+        ]
+
+def parse_field_list(value):
+    """Transformer un paramètre de type 'a,b,c' en ensemble de noms de champs"""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class EventListSerializer(serializers.ModelSerializer):
+    """
+    Représentation compacte d'un événement pour les listes.
+    ?fields=a,b restreint les champs renvoyés et ?expand=organizer,images,comments
+    ajoute les données imbriquées correspondantes.
+    """
+    EXPANDABLE_FIELDS = {
+        'organizer': lambda: UserSerializer(read_only=True),
+        'images': lambda: EventImageSerializer(many=True, read_only=True),
+        'comments': lambda: EventCommentSerializer(many=True, read_only=True),
+    }
+    
+    category = CategorySerializer(read_only=True)
+    # Total des lignes pour un événement à compteur réparti
+    current_participants = serializers.IntegerField(source='participant_count', read_only=True)
+    is_full = serializers.ReadOnlyField()
+    remaining_spots = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Event
+        fields = [
+            'id', 'title', 'short_description', 'start_date', 'end_date',
+            'location', 'city', 'latitude', 'longitude', 'category', 'max_participants',
+            'current_participants', 'is_free', 'price', 'organizer',
+            'status', 'is_featured', 'is_private', 'main_image',
+            'is_full', 'remaining_spots', 'series', 'occurrence_start'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'published_at', 'current_participants']
+        read_only_fields = fields
+        list_serializer_class = EventCounterListSerializer
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        
+        expanded = self.get_expanded_fields(request)
+        for name in expanded:
+            self.fields[name] = self.EXPANDABLE_FIELDS[name]()
+        
+        requested = parse_field_list(request.query_params.get('fields'))
+        if requested:
+            for name in set(self.fields) - requested - expanded:
+                self.fields.pop(name)
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Présent uniquement pour les recherches par rayon
+        if getattr(instance, 'distance_km', None) is not None:
+            data['distance_km'] = round(instance.distance_km, 3)
+        return data
+    
+    @classmethod
+    def get_expanded_fields(cls, request):
+        """Champs imbriqués demandés via ?expand="""
+        return parse_field_list(request.query_params.get('expand')) & set(cls.EXPANDABLE_FIELDS)
+    
+    @classmethod
+    def get_related_fields(cls, request):
+        """Relations réellement sérialisées, pour ne charger que celles-ci"""
+        related = cls.get_expanded_fields(request)
+        requested = parse_field_list(request.query_params.get('fields'))
+        if not requested or 'category' in requested:
+            related.add('category')
+        return related
+
+COORDINATE_KWARGS = {
+    'latitude': {'min_value': -90, 'max_value': 90},
+    'longitude': {'min_value': -180, 'max_value': 180},
+}
+
+def check_admission_rate(value):
+    """La salle d'attente n'est fiable qu'avec un cache commun à tous les processus"""
+    if value is not None and not waiting_room.shared_cache():
+        raise serializers.ValidationError(
+            "La salle d'attente nécessite un cache partagé entre les processus (REDIS_URL)."
+        )
+    return value
 
 class EventCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -83,9 +189,14 @@ class EventCreateSerializer(serializers.ModelSerializer):
         fields = [
             'title', 'description', 'short_description',
             'start_date', 'end_date', 'location', 'address', 'city',
-            'postal_code', 'country', 'category', 'max_participants',
-            'is_free', 'price', 'status', 'is_featured', 'is_private', 'main_image'
+            'postal_code', 'country', 'latitude', 'longitude', 'category', 'max_participants',
+            'admission_rate', 'counter_shards', 'is_free', 'price', 'status', 'is_featured', 'is_private',
+            'main_image'
         ]
+        extra_kwargs = COORDINATE_KWARGS
+    
+    def validate_admission_rate(self, value):
+        return check_admission_rate(value)
     
     def validate(self, data):
         # Vérifier que la date de fin est après la date de début
@@ -98,6 +209,19 @@ class EventCreateSerializer(serializers.ModelSerializer):
         if data['start_date'] <= timezone.now() - timedelta(minutes=5):
             raise serializers.ValidationError("La date de début doit être dans le futur.")
         
+        if (data.get('latitude') is None) != (data.get('longitude') is None):
+            raise serializers.ValidationError("La latitude et la longitude doivent être fournies ensemble.")
+        
+        # Lieu déjà occupé sur ce créneau : avertissement, sans bloquer la création
+        self.conflict_warnings = conflicts.venue_warnings(
+            data['location'], data['city'], data['start_date'], data['end_date']
+        )
+        return data
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if getattr(self, 'conflict_warnings', None):
+            data['warnings'] = self.conflict_warnings
         return data
 
 class EventUpdateSerializer(serializers.ModelSerializer):
@@ -106,9 +230,14 @@ class EventUpdateSerializer(serializers.ModelSerializer):
         fields = [
             'title', 'description', 'short_description',
             'start_date', 'end_date', 'location', 'address', 'city',
-            'postal_code', 'country', 'category', 'max_participants',
-            'is_free', 'price', 'status', 'is_featured', 'is_private', 'main_image'
+            'postal_code', 'country', 'latitude', 'longitude', 'category', 'max_participants',
+            'admission_rate', 'counter_shards', 'is_free', 'price', 'status', 'is_featured', 'is_private',
+            'main_image'
         ]
+        extra_kwargs = COORDINATE_KWARGS
+    
+    def validate_admission_rate(self, value):
+        return check_admission_rate(value)
     
     def validate(self, data):
         # Vérifier que la date de fin est après la date de début
@@ -122,16 +251,41 @@ class EventUpdateSerializer(serializers.ModelSerializer):
             if self.instance.end_date <= data['start_date']:
                 raise serializers.ValidationError("La date de fin doit être après la date de début.")
         
+        latitude = data.get('latitude', self.instance.latitude)
+        longitude = data.get('longitude', self.instance.longitude)
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("La latitude et la longitude doivent être fournies ensemble.")
+        
+        if {'location', 'city', 'start_date', 'end_date'} & set(data):
+            self.conflict_warnings = conflicts.venue_warnings(
+                data.get('location', self.instance.location),
+                data.get('city', self.instance.city),
+                data.get('start_date', self.instance.start_date),
+                data.get('end_date', self.instance.end_date),
+                exclude_pk=self.instance.pk
+            )
+        return data
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if getattr(self, 'conflict_warnings', None):
+            data['warnings'] = self.conflict_warnings
         return data
 
 class EventRegistrationSerializer(serializers.ModelSerializer):
     event = EventSerializer(read_only=True)
     user = UserSerializer(read_only=True)
+    seat_label = serializers.SerializerMethodField()
     
     class Meta:
         model = EventRegistration
-        fields = ['id', 'event', 'user', 'status', 'registration_date', 'notes']
-        read_only_fields = ['id', 'registration_date']
+        fields = ['id', 'event', 'user', 'status', 'registration_date', 'notes', 'seat', 'seat_label', 'hold_expires_at']
+        # Les changements de statut passent par register/hold et cancel()
+        read_only_fields = ['id', 'status', 'registration_date', 'seat', 'hold_expires_at']
+    
+    def get_seat_label(self, obj):
+        seat_map = getattr(obj.event, 'seat_map', None) if obj.seat is not None else None
+        return seat_map.label(obj.seat) if seat_map else None
 
 class EventRegistrationCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -191,3 +345,85 @@ class EventCommentUpdateSerializer(serializers.ModelSerializer):
         if value is not None and (value < 1 or value > 5):
             raise serializers.ValidationError("La note doit être entre 1 et 5.")
         return value
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.ReadOnlyField()
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'scope', 'event', 'format', 'since', 'status', 'progress',
+            'total_rows', 'processed_rows', 'download_url', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.file:
+            return None
+        request = self.context.get('request')
+        url = f'/api/exports/{obj.pk}/download/'
+        return request.build_absolute_uri(url) if request else url
+
+class ExportJobCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = ['scope', 'event', 'format', 'since']
+    
+    def validate(self, data):
+        user = self.context['request'].user
+        if data.get('scope', 'event') == 'event':
+            event = data.get('event')
+            if event is None:
+                raise serializers.ValidationError("Un événement est requis pour ce type d'export.")
+            if event.organizer != user:
+                raise serializers.ValidationError("Vous n'avez pas l'autorisation d'exporter les participants de cet événement.")
+        else:
+            data['event'] = None
+        return data
+
+class EventRecurrenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EventRecurrence
+        fields = ['frequency', 'interval', 'weekdays', 'until', 'count', 'timezone', 'updated_at']
+        read_only_fields = ['updated_at']
+    
+    def validate_weekdays(self, value):
+        try:
+            days = sorted({int(day) for day in value.split(',') if day.strip()})
+        except ValueError:
+            raise serializers.ValidationError("Jours attendus sous la forme 0,2,4 (0 = lundi).")
+        if any(day < 0 or day > 6 for day in days):
+            raise serializers.ValidationError("Les jours vont de 0 (lundi) à 6 (dimanche).")
+        return ','.join(map(str, days))
+    
+    def validate_timezone(self, value):
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Fuseau horaire inconnu.")
+        return value
+    
+    def validate(self, data):
+        event = self.context['event']
+        if data.get('until') and data['until'] < event.start_date:
+            raise serializers.ValidationError("La fin de la récurrence doit être après le début de l'événement.")
+        if data.get('weekdays') and data.get('frequency', 'weekly') != 'weekly':
+            raise serializers.ValidationError("Les jours ne s'appliquent qu'à une récurrence hebdomadaire.")
+        return data
+
+class EventSeatMapSerializer(serializers.ModelSerializer):
+    """Plan de salle ; occupied est le bitmap en base64 (bit i = place i, octets little-endian)"""
+    capacity = serializers.IntegerField(read_only=True)
+    available = serializers.IntegerField(read_only=True)
+    occupied = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = EventSeatMap
+        fields = ['rows', 'seats_per_row', 'capacity', 'available', 'occupied', 'updated_at']
+        read_only_fields = ['updated_at']
+    
+    def get_occupied(self, obj):
+        return base64.b64encode(seating.encode(obj.bitmap, obj.capacity)).decode()
@@ -1,3 +1,1452 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+from unittest.mock import MagicMock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import clusters as map_clusters, conflicts, exports, seating
+from .pagination import EventCursorPagination
+from .analytics import HyperLogLog, view_buffer
+from .autocomplete import Snapshot, autocomplete_index
+from .geocoding import geocode
+from .models import (
+    Category, Event, EventComment, EventCounterShard, EventRecurrence, EventRegistration, EventFullError, EventSeatMap, EventViewStats,
+    ExportJob, GeocodeCache
+)
+
+
+def create_event(organizer, **kwargs):
+    start = timezone.now() + timedelta(days=7)
+    data = {
+        'title': 'Concert au Grand Théâtre',
+        'description': 'Description',
+        'start_date': start,
+        'end_date': start + timedelta(hours=3),
+        'location': 'Grand Théâtre',
+        'address': 'Boulevard de la République',
+        'city': 'Dakar',
+        'postal_code': '10200',
+        'status': 'published',
+    }
+    data.update(kwargs)
+    return Event.objects.create(organizer=organizer, **data)
+
+
+class EventListSerializerTests(TestCase):
+    url = '/api/events/'
+
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.category = Category.objects.create(name='Musique')
+        self.client = APIClient()
+
+    def add_events(self, count):
+        for _ in range(count):
+            event = create_event(self.organizer, category=self.category)
+            EventComment.objects.create(event=event, user=self.organizer, content='Super')
+
+    def assert_constant_queries(self, params):
+        self.add_events(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, params)
+        self.add_events(8)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['results']), 10)
+        return response.data['results']
+
+    def test_compact_list_without_nested_relations(self):
+        results = self.assert_constant_queries({})
+        self.assertEqual(results[0]['organizer'], self.organizer.id)
+        self.assertEqual(results[0]['category']['name'], 'Musique')
+        self.assertNotIn('description', results[0])
+        self.assertNotIn('comments', results[0])
+
+    def test_expand_nests_relations_without_per_row_queries(self):
+        results = self.assert_constant_queries({'expand': 'organizer,comments'})
+        self.assertEqual(results[0]['organizer']['username'], 'organizer')
+        self.assertEqual([comment['content'] for comment in results[0]['comments']], ['Super'])
+
+    def test_fields_restricts_the_payload(self):
+        self.add_events(1)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'fields': 'id,title'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        start = timezone.now() + timedelta(days=3)
+        # Cinq événements à la même date : seul l'id départage
+        self.events = [create_event(self.organizer, start_date=start, end_date=start + timedelta(hours=1)) for _ in range(5)]
+        self.events += [create_event(self.organizer, start_date=start + timedelta(days=i)) for i in (1, 2)]
+        self.client = APIClient()
+
+    def walk(self, url, params=None, direction='next'):
+        pages = []
+        data = self.client.get(url, params).data
+        while True:
+            pages.append([event['id'] for event in data['results']])
+            if not data[direction]:
+                return pages, data
+            data = self.client.get(data[direction]).data
+
+    def test_forward_and_back_across_equal_start_dates(self):
+        pages, last = self.walk('/api/events/', {'ordering': 'start_date', 'page_size': 2, 'fields': 'id'})
+        self.assertEqual(sum(pages, []), [event.pk for event in self.events])
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertNotIn('count', last)
+
+        # Depuis l'adresse de la dernière page, les liens previous refont le chemin à l'envers
+        last_url = self.client.get(last['previous']).data['next']
+        backward, _ = self.walk(last_url, direction='previous')
+        self.assertEqual(backward, pages[::-1])
+
+        pages, _ = self.walk('/api/events/', {'page_size': 3, 'fields': 'id'})
+        self.assertEqual(sum(pages, []), [event.pk for event in reversed(self.events)])
+
+    def test_tampered_cursor_rejected(self):
+        for cursor in ('abc', base64.urlsafe_b64encode(b'{"k": ["demain", 1], "r": 0}').decode()):
+            self.assertEqual(self.client.get('/api/events/', {'cursor': cursor}).status_code, 404)
+
+    def test_other_orderings_fall_back_to_page_numbers(self):
+        response = self.client.get('/api/events/', {'ordering': 'price', 'page_size': 5})
+        self.assertEqual(response.data['count'], 7)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_include_total(self):
+        data = self.client.get('/api/events/', {'include_total': '1', 'page_size': 2}).data
+        self.assertEqual((data['count'], data['count_is_exact']), (7, True))
+
+        plan = MagicMock()
+        plan.vendor = 'postgresql'
+        plan.cursor.return_value.__enter__.return_value.fetchone.return_value = ([{'Plan': {'Plan Rows': 12345}}],)
+        paginator = EventCursorPagination()
+        with mock.patch('events.pagination.connections', {'default': plan}):
+            self.assertEqual(paginator.estimate_count(Event.objects.all()), (12345, False))
+        sql = plan.cursor.return_value.__enter__.return_value.execute.call_args[0][0]
+        self.assertTrue(sql.startswith('EXPLAIN (FORMAT JSON) SELECT'))
+
+    def test_custom_actions_use_their_own_page_size(self):
+        for i in range(6):
+            create_event(self.organizer)
+        self.assertEqual(len(self.client.get('/api/events/upcoming/').data['results']), 10)
+        self.assertEqual(len(self.client.get('/api/events/upcoming/', {'page_size': 4}).data['results']), 4)
+        self.assertEqual(len(self.client.get('/api/events/').data['results']), 13)
+
+    def test_nearby_walks_distance_keyset(self):
+        Event.objects.all().delete()
+        for title, latitude, longitude in (
+            ('Dakar', 14.7167, -17.4677), ('Rufisque', 14.7158, -17.2730), ('Bargny', 14.6970, -17.2250),
+            ('Dakar bis', 14.7167, -17.4677),
+        ):
+            create_event(self.organizer, title=title, latitude=latitude, longitude=longitude)
+        pages, last = self.walk('/api/events/nearby/', {'lat': 14.72, 'lng': -17.46, 'radius': 30, 'page_size': 1})
+        titles = [Event.objects.get(pk=page[0]).title for page in pages]
+        self.assertEqual(titles, ['Dakar', 'Dakar bis', 'Rufisque', 'Bargny'])
+        self.assertNotIn('count', last)
+
+
+class SeatReservationTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, max_participants=1)
+        self.client = APIClient()
+
+    def test_register_reserves_seat_and_waitlists_when_full(self):
+        first = User.objects.create_user('first')
+        second = User.objects.create_user('second')
+
+        self.client.force_authenticate(first)
+        response = self.client.post(f'/api/events/{self.event.id}/register/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'confirmed')
+
+        self.client.force_authenticate(second)
+        response = self.client.post(f'/api/events/{self.event.id}/register/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'waitlist')
+        self.assertEqual(response.data['waitlist_position'], 1)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_cancellation_promotes_waitlist_in_fifo_order(self):
+        holder = EventRegistration.objects.register(self.event, User.objects.create_user('holder'))
+        first = EventRegistration.objects.register(self.event, User.objects.create_user('w1'))
+        second = EventRegistration.objects.register(self.event, User.objects.create_user('w2'))
+        self.assertEqual(second.waitlist_position(), 2)
+
+        holder.cancel()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(first.status, 'confirmed')
+        self.assertEqual(second.status, 'waitlist')
+        self.assertEqual(second.waitlist_position(), 1)
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_waitlisted_registration_cannot_promote_itself(self):
+        EventRegistration.objects.register(self.event, User.objects.create_user('holder'))
+        first = EventRegistration.objects.register(self.event, User.objects.create_user('w1'))
+        second = EventRegistration.objects.register(self.event, User.objects.create_user('w2'))
+        # Une place se libère sans promotion automatique
+        Event.objects.filter(pk=self.event.pk).update(max_participants=2)
+
+        self.client.force_authenticate(second.user)
+        response = self.client.patch(f'/api/registrations/{second.pk}/', {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.data['status'], 'waitlist')
+        self.assertEqual((first.waitlist_position(), second.waitlist_position()), (1, 2))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_unregister_releases_seat_once(self):
+        user = User.objects.create_user('user')
+        registration = EventRegistration.objects.register(self.event, user)
+        registration.cancel()
+        registration.cancel()
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 0)
+
+        # La place libérée peut être reprise, et l'inscription réactivée
+        EventRegistration.objects.register(self.event, user)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_organizer_edit_keeps_concurrent_reservations(self):
+        # Instance chargée avant l'inscription, comme un formulaire resté ouvert
+        stale = Event.objects.get(pk=self.event.pk)
+        EventRegistration.objects.register(self.event, User.objects.create_user('participant'))
+        stale.title = 'Concert déplacé'
+        stale.save()
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.title, self.event.current_participants), ('Concert déplacé', 1))
+
+        self.client.force_authenticate(self.organizer)
+        response = self.client.patch(
+            f'/api/events/{self.event.pk}/', {'description': 'Nouvelle salle'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_patch_cannot_reconfirm_a_cancelled_registration(self):
+        EventRegistration.objects.register(self.event, User.objects.create_user('holder'))
+        cancelled = EventRegistration.objects.register(self.event, User.objects.create_user('late'))
+        cancelled.cancel()
+        self.client.force_authenticate(cancelled.user)
+        response = self.client.patch(f'/api/registrations/{cancelled.pk}/', {'status': 'confirmed'}, format='json')
+        # Statut en lecture seule : pas de réservation tentée hors du gestionnaire, donc pas de 500
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+    def test_model_save_enforces_capacity(self):
+        EventRegistration.objects.create(
+            event=self.event, user=User.objects.create_user('a')
+        )
+        with self.assertRaises(EventFullError):
+            EventRegistration.objects.create(
+                event=self.event, user=User.objects.create_user('b')
+            )
+
+
+class BulkRegistrationTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, max_participants=3)
+        self.users = [
+            User.objects.create_user(f'user{i}', email=f'user{i}@example.com')
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.url = f'/api/events/{self.event.id}/bulk_register/'
+
+    def test_all_or_nothing_rejects_when_capacity_is_short(self):
+        response = self.client.post(self.url, {
+            'users': [user.id for user in self.users],
+            'mode': 'all_or_nothing'
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(EventRegistration.objects.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 0)
+
+    def test_fill_confirms_what_fits_and_waitlists_the_rest(self):
+        EventRegistration.objects.register(self.event, self.users[0])
+        response = self.client.post(self.url, {
+            'users': [user.id for user in self.users[:3]],
+            'emails': ['USER3@example.com', 'user4@example.com', 'nobody@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        statuses = [row['status'] for row in response.data['results']]
+        self.assertEqual(statuses, [
+            'already_registered', 'confirmed', 'confirmed',
+            'waitlist', 'waitlist', 'unknown_user'
+        ])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 3)
+
+    def test_malformed_lists_are_rejected(self):
+        for payload in (
+            {'emails': ['user0@example.com', 42]},
+            {'emails': [None]},
+            {'emails': 'user0@example.com'},
+            {'users': '12'},
+            {'users': [{'id': 1}]},
+        ):
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(EventRegistration.objects.exists())
+
+    def test_form_encoded_lists_use_repeated_keys(self):
+        response = self.client.post(self.url, {
+            'emails': ['user0@example.com', 'user1@example.com'],
+            'users': [self.users[2].id],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['status'] for row in response.data['results']], ['confirmed'] * 3)
+
+
+class UserEventsDashboardTests(TestCase):
+    url = '/api/auth/my-events/'
+
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.organizer.profile.role = 'both'
+        self.organizer.profile.save()
+        self.other = User.objects.create_user('other')
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def add_events(self, count):
+        for i in range(count):
+            event = create_event(self.organizer, status='published' if i % 2 else 'draft')
+            if i % 2:
+                EventRegistration.objects.register(event, self.other)
+            EventRegistration.objects.register(create_event(self.other), self.organizer)
+
+    def test_query_count_does_not_grow_with_events(self):
+        self.add_events(1)
+        # Statistiques, événements organisés, événements suivis
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+        self.add_events(10)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['stats'], {
+            'total_events': 11,
+            'published_events': 5,
+            'draft_events': 6,
+            'total_registrations': 5,
+        })
+        self.assertEqual(len(response.data['registered_events']), 11)
+
+
+class RegistrationAnalyticsTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, max_participants=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.url = f'/api/events/{self.event.pk}/analytics/'
+
+    def test_incremental_rollups_match_backfill(self):
+        first = EventRegistration.objects.register(self.event, User.objects.create_user('first'))
+        EventRegistration.objects.register(self.event, User.objects.create_user('second'))
+        EventRegistration.objects.register(self.event, User.objects.create_user('third'))
+        EventRegistration.objects.hold(create_event(self.organizer), User.objects.create_user('other'))
+        # La place annulée passe au premier de la liste d'attente
+        first.cancel()
+        EventRegistration.objects.register(self.event, User.objects.create_user('fourth'))
+        EventRegistration.objects.get(user__username='fourth').delete()
+
+        incremental = self.client.get(self.url).data
+        self.assertEqual(incremental['totals'], {'confirmed': 2, 'cancelled': 1, 'waitlisted': 0})
+        self.assertEqual(len(incremental['series']), 1)
+
+        call_command('backfill_registration_stats', stdout=StringIO())
+        self.assertEqual(self.client.get(self.url).data, incremental)
+
+    def test_period_filter_and_permissions(self):
+        today = timezone.localdate()
+        EventRegistration.objects.register(self.event, User.objects.create_user('first'))
+        response = self.client.get(self.url, {'start': today + timedelta(days=1)})
+        self.assertEqual(response.data['series'], [])
+        response = self.client.get(self.url, {'start': today, 'end': today})
+        self.assertEqual(response.data['series'], [{'day': today, 'confirmed': 1, 'cancelled': 0, 'waitlisted': 0}])
+        self.assertEqual(self.client.get(self.url, {'start': 'hier'}).status_code, 400)
+
+        self.client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ParticipantExportTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer)
+        self.registrations = [
+            EventRegistration.objects.register(self.event, User.objects.create_user(name, email=f'{name}@example.com'))
+            for name in ('awa', 'moussa', 'fatou')
+        ]
+        EventRegistration.objects.filter(pk=self.registrations[0].pk).update(
+            registration_date=timezone.now() - timedelta(days=2)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.url = f'/api/events/{self.event.pk}/export_participants/'
+
+    def emails(self, content):
+        return [line.split(',')[2] for line in content.decode('utf-8').splitlines()[1:]]
+
+    def test_csv_is_streamed_in_chunks(self):
+        with mock.patch('events.exports.STREAM_BUFFER_SIZE', 1):
+            response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        # Un bloc par ligne (l'en-tête accompagne la première)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(self.emails(b''.join(chunks)), ['awa@example.com', 'moussa@example.com', 'fatou@example.com'])
+
+    def test_gzip_and_since(self):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {'gzip': '1', 'since': since})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(self.emails(content), ['moussa@example.com', 'fatou@example.com'])
+
+    def test_invalid_since_and_other_users_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'hier'}).status_code, 400)
+        self.client.force_authenticate(User.objects.create_user('intrus'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, title='Gala')
+        for name in ('awa', 'moussa'):
+            EventRegistration.objects.register(
+                self.event, User.objects.create_user(name, email=f'{name}@example.com', first_name=name.title()),
+                notes=f'Note de {name}'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def run_worker(self):
+        call_command('run_export_worker', '--once', stdout=StringIO())
+
+    def download(self, job_id):
+        response = self.client.get(f'/api/exports/{job_id}/download/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_job_lifecycle_and_csv_contents(self):
+        response = self.client.post('/api/exports/', {'event': self.event.pk, 'format': 'csv'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.client.get(f'/api/exports/{job_id}/download/').status_code, 409)
+
+        self.run_worker()
+        job = self.client.get(f'/api/exports/{job_id}/').data
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['total_rows'], job['processed_rows']), (2, 2))
+        self.assertIsNotNone(job['download_url'])
+
+        lines = self.download(job_id).splitlines()
+        self.assertEqual(lines[0], 'Prénom,Nom,Email,Date d\'inscription,Notes')
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['awa@example.com', 'moussa@example.com'])
+        self.assertTrue(lines[1].endswith(',Note de awa'))
+
+    def test_ndjson_organizer_export_covers_all_events(self):
+        other = create_event(self.organizer, title='Atelier')
+        EventRegistration.objects.register(other, User.objects.create_user('fatou', email='fatou@example.com'))
+        job = ExportJob.objects.create(user=self.organizer, scope='organizer', format='ndjson')
+
+        self.run_worker()
+        rows = [json.loads(line) for line in self.download(job.pk).splitlines()]
+        self.assertEqual([(row['event_title'], row['email']) for row in rows], [
+            ('Gala', 'awa@example.com'), ('Gala', 'moussa@example.com'), ('Atelier', 'fatou@example.com')
+        ])
+
+    def test_job_abandoned_by_a_crashed_worker_is_picked_up_again(self):
+        job = ExportJob.objects.create(user=self.organizer, event=self.event)
+        crashed = exports.claim_next_export_job()
+        self.assertEqual((crashed.pk, crashed.attempts), (job.pk, 1))
+        # Bail encore valide : personne d'autre ne prend le job
+        self.assertIsNone(exports.claim_next_export_job())
+
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.processed_rows), ('completed', 2, 2))
+
+        # Le worker qu'on croyait arrêté se réveille : il ne touche plus au job
+        with self.assertRaises(exports.LeaseLost):
+            exports.run_export_job(crashed)
+        exports.fail_export_job(crashed, 'trop tard')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+
+    def test_job_that_keeps_crashing_workers_fails(self):
+        job = ExportJob.objects.create(user=self.organizer, event=self.event)
+        for _ in range(exports.MAX_ATTEMPTS):
+            exports.claim_next_export_job()
+            ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertIsNone(exports.claim_next_export_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', exports.MAX_ATTEMPTS))
+
+
+class EventViewCounterTests(TestCase):
+    def test_hyperloglog_estimate_is_close(self):
+        sketch = HyperLogLog()
+        for i in range(20000):
+            sketch.add(f'visitor-{i % 5000}')
+        self.assertAlmostEqual(sketch.count(), 5000, delta=5000 * 0.1)
+
+    def test_retrieve_buffers_views_without_writing_event(self):
+        organizer = User.objects.create_user('organizer')
+        event = create_event(organizer)
+        updated_at = event.updated_at
+        client = APIClient()
+
+        with self.settings(EVENT_VIEWS_FLUSH_SIZE=100, EVENT_VIEWS_FLUSH_INTERVAL=3600):
+            for _ in range(3):
+                self.assertEqual(client.get(f'/api/events/{event.id}/').status_code, 200)
+            self.assertFalse(EventViewStats.objects.exists())
+            view_buffer.flush()
+
+        stats = EventViewStats.objects.get(event=event)
+        self.assertEqual(stats.views_count, 3)
+        self.assertEqual(stats.unique_visitors, 1)
+        event.refresh_from_db()
+        self.assertEqual(event.updated_at, updated_at)
+
+    def test_analytics_reports_views_merged_across_flushes(self):
+        organizer = User.objects.create_user('organizer')
+        event = create_event(organizer)
+        with self.settings(EVENT_VIEWS_FLUSH_SIZE=100, EVENT_VIEWS_FLUSH_INTERVAL=3600):
+            view_buffer.flush()
+            for visitor in ('a', 'b', 'a'):
+                view_buffer.record(event.pk, visitor)
+            view_buffer.flush()
+            for visitor in ('b', 'c'):
+                view_buffer.record(event.pk, visitor)
+            view_buffer.flush()
+
+        client = APIClient()
+        client.force_authenticate(organizer)
+        response = client.get(f'/api/events/{event.pk}/analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['views'], {'views_count': 5, 'unique_visitors': 3})
+
+        client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(client.get(f'/api/events/{event.pk}/analytics/').status_code, 403)
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user('organizer')
+        self.concert = create_event(organizer, title='Fête du jazz', description='Jazz et jazz manouche toute la nuit')
+        self.brunch = create_event(organizer, title='Brunch', description='Un trio de jazz en fond sonore')
+        create_event(organizer, title='Jazz en brouillon', status='draft')
+        create_event(organizer, title='Marché', description='Artisanat local')
+        self.client = APIClient()
+
+    def search(self, q):
+        response = self.client.get('/api/events/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [event['id'] for event in response.data['results']]
+
+    def test_ranked_by_relevance_and_accent_insensitive(self):
+        self.assertEqual(self.search('jazz'), [self.concert.pk, self.brunch.pk])
+        self.assertEqual(self.search('FETE'), [self.concert.pk])
+        response = self.client.get('/api/events/search/', {'q': 'fete jaz'})
+        self.assertEqual(response.data['results'][0]['title_highlighted'], '<mark>Fête</mark> du <mark>jazz</mark>')
+        self.assertGreater(response.data['results'][0]['rank'], 0)
+
+    def test_index_follows_writes_that_bypass_save(self):
+        Event.objects.filter(pk=self.brunch.pk).update(search_document='salsa')
+        self.assertEqual(self.search('salsa'), [self.brunch.pk])
+        self.assertEqual(self.search('jazz'), [self.concert.pk])
+
+        self.concert.search_document = 'salsa cubaine'
+        Event.objects.bulk_update([self.concert], ['search_document'])
+        self.assertEqual(len(self.search('salsa')), 2)
+
+        Event.objects.filter(pk=self.brunch.pk).delete()
+        self.assertEqual(self.search('salsa'), [self.concert.pk])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM events_event_fts WHERE rowid = %s', [self.brunch.pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_triggers_are_recreated_after_migrate(self):
+        # Ce que fait SQLite quand une migration reconstruit events_event
+        with connection.cursor() as cursor:
+            for name in ('events_event_fts_insert', 'events_event_fts_update', 'events_event_fts_delete'):
+                cursor.execute(f'DROP TRIGGER {name}')
+        Event.objects.filter(pk=self.brunch.pk).update(search_document='salsa')
+        self.assertEqual(self.search('salsa'), [])
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(self.search('salsa'), [self.brunch.pk])
+        self.concert.title = 'Soirée salsa'
+        self.concert.save()
+        self.assertEqual(sorted(self.search('salsa')), sorted([self.concert.pk, self.brunch.pk]))
+
+
+class FacetTests(TestCase):
+    url = '/api/events/facets/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        organizer = User.objects.create_user('organizer')
+        music = Category.objects.create(name='Musique')
+        sport = Category.objects.create(name='Sport')
+        # Midi (UTC) : aucune des dates ci-dessous ne franchit une limite de période
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        for category, city, is_free, offset in [
+            (music, 'Dakar', True, timedelta(hours=2)),
+            (music, 'Dakar', False, timedelta(days=3)),
+            (sport, 'Thiès', True, timedelta(days=20)),
+            (None, 'Dakar', False, timedelta(days=60)),
+            (sport, 'Thiès', True, -timedelta(days=2)),
+        ]:
+            create_event(
+                organizer, category=category, city=city, is_free=is_free,
+                start_date=self.now + offset, end_date=self.now + offset + timedelta(hours=1)
+            )
+        self.music, self.sport = music, sport
+
+    def get_facets(self, params=None):
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_buckets_count_the_fixture(self):
+        data = self.get_facets()
+        self.assertEqual(data['total'], 5)
+        # Sans catégorie : compté dans le total seulement
+        self.assertCountEqual(data['category'], [
+            {'id': self.music.id, 'name': 'Musique', 'count': 2},
+            {'id': self.sport.id, 'name': 'Sport', 'count': 2},
+        ])
+        self.assertEqual([(city['label'], city['count']) for city in data['city']], [('Dakar', 3), ('Thiès', 2)])
+        self.assertEqual(data['is_free'], [{'value': True, 'count': 3}, {'value': False, 'count': 2}])
+        self.assertEqual(data['date'], [
+            {'value': 'past', 'count': 1}, {'value': 'today', 'count': 1}, {'value': 'week', 'count': 1},
+            {'value': 'month', 'count': 1}, {'value': 'later', 'count': 1},
+        ])
+
+    def test_facets_follow_the_list_filters_and_are_cached(self):
+        data = self.get_facets({'is_free': 'false'})
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['category'], [{'id': self.music.id, 'name': 'Musique', 'count': 1}])
+        self.assertEqual(data['is_free'], [{'value': False, 'count': 2}])
+
+        # Même filtre, pagination différente : servi par le cache
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_facets({'is_free': 'false', 'page': '2'}), data)
+
+
+class CityKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        organizer = User.objects.create_user('organizer')
+        self.events = [create_event(organizer, city=city) for city in ('Dakar', 'dakar ', 'DAKAR', 'Saint-Louis')]
+
+    def test_city_filter_ignores_case_and_spaces(self):
+        for city in ('Dakar', 'dakar ', 'DAKAR'):
+            with self.subTest(city=city):
+                response = self.client.get('/api/events/', {'city': city, 'include_total': '1'})
+                self.assertEqual(response.data['count'], 3)
+        response = self.client.get('/api/events/', {'city': 'saint louis', 'include_total': '1'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_city_facet_merges_spellings(self):
+        cities = self.client.get('/api/events/facets/').data['city']
+        self.assertEqual(
+            [(city['value'], city['count']) for city in cities],
+            [('dakar', 3), ('saint louis', 1)]
+        )
+        self.assertEqual(cities[0]['label'].lower(), 'dakar')
+
+    def test_backfill_fills_missing_keys(self):
+        Event.objects.update(city_key='', location_key='')
+        out = StringIO()
+        call_command('backfill_city_keys', '--batch-size', '2', stdout=out)
+        self.assertIn('4 événements', out.getvalue())
+        self.assertEqual(
+            list(Event.objects.order_by('id').values_list('city_key', 'location_key')),
+            [('dakar', 'grand theatre')] * 3 + [('saint louis', 'grand theatre')]
+        )
+
+        out = StringIO()
+        call_command('backfill_city_keys', stdout=out)
+        self.assertIn('0 événements', out.getvalue())
+
+
+class AutocompleteTests(TestCase):
+    url = '/api/autocomplete/'
+
+    def setUp(self):
+        # Index du processus : reconstruit depuis la base de chaque test
+        autocomplete_index.reset()
+        self.addCleanup(autocomplete_index.reset)
+        self.organizer = User.objects.create_user('organizer')
+        self.category = Category.objects.create(name='Festival')
+        create_event(self.organizer, title='Fête de la musique', category=self.category)
+        create_event(self.organizer, title='Festival de jazz', category=self.category, is_featured=True)
+        create_event(self.organizer, title='Festin privé', status='draft')
+        self.client = APIClient()
+
+    def suggest(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['type'], row['label']) for row in response.data['suggestions']]
+
+    def test_prefixes_match_any_word_without_accents(self):
+        self.assertEqual(self.suggest('fe', types='event'), [
+            ('event', 'Festival de jazz'), ('event', 'Fête de la musique')
+        ])
+        self.assertEqual(self.suggest('MUSI'), [('event', 'Fête de la musique')])
+        self.assertEqual(self.suggest('fest'), [
+            ('event', 'Festival de jazz'), ('category', 'Festival')
+        ])
+        self.assertEqual(self.suggest('   '), [])
+
+    def test_cities_merge_spellings(self):
+        create_event(self.organizer, title='Atelier', city='DAKAR ')
+        response = self.client.get(self.url, {'q': 'dak', 'types': 'city'})
+        self.assertEqual(response.data['suggestions'], [
+            {'type': 'city', 'id': 'dakar', 'label': 'Dakar', 'count': 3}
+        ])
+
+    def test_index_follows_committed_writes(self):
+        self.suggest('fe')
+        with self.captureOnCommitCallbacks(execute=True):
+            added = create_event(self.organizer, title='Ferme ouverte')
+        self.assertIn(('event', 'Ferme ouverte'), self.suggest('ferme'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.status = 'draft'
+            added.save()
+        self.assertEqual(self.suggest('ferme'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Concerts'
+            self.category.save()
+            Event.objects.get(title='Festival de jazz').delete()
+        self.assertEqual(self.suggest('fest'), [])
+        self.assertEqual(self.suggest('conc', types='category'), [('category', 'Concerts')])
+
+    def test_rebuild_keeps_serving_the_previous_index(self):
+        self.suggest('fe')
+        load = Snapshot.load
+        served = []
+
+        def slow_load(snapshot):
+            load(snapshot)
+            # Pendant la reconstruction, un autre thread interroge l'index
+            lookup = threading.Thread(target=lambda: served.append(autocomplete_index.suggest('festival')))
+            lookup.start()
+            lookup.join(timeout=5)
+            self.assertFalse(lookup.is_alive())
+            # Modification reçue après la lecture de la base : rejouée sur le nouvel index
+            with self.captureOnCommitCallbacks(execute=True):
+                create_event(self.organizer, title='Festival des arts')
+
+        Event.objects.filter(title='Festival de jazz').update(title='Nuit du jazz')
+        previous = autocomplete_index.snapshot
+        with mock.patch.object(Snapshot, 'load', slow_load):
+            autocomplete_index.build()
+        self.assertEqual([row['label'] for row in served[0]], ['Festival de jazz', 'Festival'])
+        self.assertIsNot(autocomplete_index.snapshot, previous)
+        self.assertEqual(self.suggest('festival'), [('event', 'Festival des arts'), ('category', 'Festival')])
+        self.assertEqual(self.suggest('nuit'), [('event', 'Nuit du jazz')])
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.suggest('fe')
+        autocomplete_index.built_at -= autocomplete_index.rebuild_interval + 1
+        with mock.patch('events.autocomplete.threading.Thread') as thread:
+            self.suggest('fe')
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+
+class RadiusSearchTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user('organizer')
+        create_event(organizer, title='Dakar', latitude=14.7167, longitude=-17.4677)
+        create_event(organizer, title='Rufisque', latitude=14.7158, longitude=-17.2730)
+        create_event(organizer, title='Thiès', latitude=14.7910, longitude=-16.9359)
+        create_event(organizer, title='Paris', latitude=48.8566, longitude=2.3522)
+        create_event(organizer, title='Sans coordonnées', city='Ville inconnue', location='Salle des fêtes')
+        self.client = APIClient()
+
+    def test_nearby_sorted_by_distance(self):
+        response = self.client.get('/api/events/nearby/', {'lat': 14.72, 'lng': -17.46, 'radius': 30})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([event['title'] for event in results], ['Dakar', 'Rufisque'])
+        self.assertLess(results[0]['distance_km'], results[1]['distance_km'])
+        self.assertAlmostEqual(results[1]['distance_km'], 20.6, delta=1)
+
+    def test_geohash_follows_coordinates(self):
+        event = Event.objects.get(title='Dakar')
+        self.assertTrue(event.geohash.startswith('edee'))
+        event.latitude = event.longitude = None
+        event.save(update_fields=['latitude', 'longitude'])
+        event.refresh_from_db()
+        self.assertEqual(event.geohash, '')
+
+    def test_invalid_coordinates_rejected(self):
+        response = self.client.get('/api/events/nearby/', {'lat': 'abc', 'lng': -17.46})
+        self.assertEqual(response.status_code, 400)
+
+
+class MapClusterTests(TestCase):
+    url = '/api/events/clusters/'
+    params = {'bbox': '-17.6,14.6,-16.8,14.9', 'zoom': 12}
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user('organizer')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dakar = create_event(self.organizer, latitude=14.7167, longitude=-17.4677)
+            self.rufisque = create_event(self.organizer, latitude=14.7158, longitude=-17.2730)
+        self.client = APIClient()
+
+    def total(self):
+        return sum(cluster['count'] for cluster in self.client.get(self.url, self.params).data['clusters'])
+
+    def test_moved_event_leaves_cached_cell(self):
+        self.assertEqual(self.total(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.total(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rufisque.latitude, self.rufisque.longitude = 48.8566, 2.3522
+            self.rufisque.save()
+        self.assertEqual(self.total(), 1)
+
+    def test_aggregate_computed_before_invalidation_is_not_served(self):
+        compute = map_clusters.aggregate_cells
+
+        def compute_then_cancel(cells, precision):
+            # L'événement est annulé pendant le calcul, après la lecture en base
+            aggregates = compute(cells, precision)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.dakar.status = 'cancelled'
+                self.dakar.save()
+            return aggregates
+
+        with mock.patch('events.clusters.aggregate_cells', side_effect=compute_then_cancel):
+            self.assertEqual(self.total(), 2)
+        self.assertEqual(self.total(), 1)
+
+
+class GeocodingTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+
+    def test_address_geocoded_from_gazetteer_and_cached(self):
+        event = create_event(self.organizer, city='Thies', location='Salle des fêtes')
+        self.assertTrue(event.geocoded)
+        self.assertAlmostEqual(event.latitude, 14.791, places=2)
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(geocode(event), (event.latitude, event.longitude))
+
+        event.city = 'Saint-Louis'
+        event.save()
+        self.assertAlmostEqual(event.latitude, 16.03, places=2)
+
+    def test_manual_coordinates_are_kept(self):
+        event = create_event(self.organizer, city='Thiès', location='Salle des fêtes', latitude=14.8, longitude=-16.9)
+        self.assertFalse(event.geocoded)
+        event.city = 'Kaolack'
+        event.save()
+        self.assertEqual((event.latitude, event.longitude), (14.8, -16.9))
+
+    def test_backfill_command_geocodes_missing_coordinates(self):
+        thies = create_event(self.organizer, city='Thiès', location='Salle des fêtes')
+        unknown = create_event(self.organizer, city='Atlantide', location='Nulle part')
+        manual = create_event(self.organizer, city='Kaolack', location='Stade', latitude=1.0, longitude=2.0)
+        stale = create_event(self.organizer, city='Saint-Louis', location='Place Faidherbe')
+        # Événements antérieurs au géocodage, et coordonnées calculées avec un ancien gazetteer
+        Event.objects.filter(pk__in=[thies.pk, unknown.pk]).update(
+            latitude=None, longitude=None, geocoded=False, geohash=''
+        )
+        Event.objects.filter(pk=stale.pk).update(latitude=0.0, longitude=0.0, geohash='s00000000000')
+
+        out = StringIO()
+        with mock.patch.object(map_clusters, 'invalidate') as invalidate:
+            call_command('geocode_events', '--batch-size', '1', stdout=out)
+        self.assertIn('2 événements examinés, 1 localisés', out.getvalue())
+        thies.refresh_from_db()
+        self.assertTrue(thies.geocoded)
+        self.assertAlmostEqual(thies.latitude, 14.791, places=2)
+        self.assertTrue(thies.geohash)
+        self.assertIn(thies.geohash, [geohash for call in invalidate.call_args_list for geohash in call.args])
+        self.assertIsNone(Event.objects.get(pk=unknown.pk).latitude)
+
+        call_command('geocode_events', '--refresh', stdout=StringIO())
+        stale.refresh_from_db()
+        self.assertAlmostEqual(stale.latitude, 16.03, places=2)
+        manual.refresh_from_db()
+        self.assertEqual((manual.latitude, manual.longitude, manual.geocoded), (1.0, 2.0, False))
+
+
+class CalendarTests(TestCase):
+    url = '/api/events/calendar/'
+
+    def setUp(self):
+        organizer = User.objects.create_user('organizer')
+        self.music = Category.objects.create(name='Musique')
+        utc = ZoneInfo('UTC')
+        for start, kwargs in [
+            (datetime(2030, 3, 1, 0, 0, tzinfo=utc), {'category': self.music}),
+            (datetime(2030, 3, 10, 12, 0, tzinfo=utc), {}),
+            # 00:30 le 11 mars à Paris
+            (datetime(2030, 3, 10, 23, 30, tzinfo=utc), {'category': self.music}),
+            (datetime(2030, 3, 12, 9, 0, tzinfo=utc), {'status': 'draft'}),
+            # 1er avril 00:00 à Paris : hors de mars à Paris, dans mars en UTC
+            (datetime(2030, 3, 31, 22, 0, tzinfo=utc), {}),
+            # Borne supérieure exclue
+            (datetime(2030, 4, 1, 0, 0, tzinfo=utc), {}),
+        ]:
+            create_event(organizer, start_date=start, end_date=start + timedelta(hours=1), **kwargs)
+        self.client = APIClient()
+
+    def counts(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {str(day['date']): day['count'] for day in response.data['days'] if day['count']}
+
+    def test_days_in_utc(self):
+        response = self.client.get(self.url, {'month': '2030-03'})
+        self.assertEqual(len(response.data['days']), 31)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(self.counts(response), {'2030-03-01': 1, '2030-03-10': 2, '2030-03-31': 1})
+
+    def test_days_follow_the_requested_timezone(self):
+        response = self.client.get(self.url, {'month': '2030-03', 'tz': 'Europe/Paris'})
+        self.assertEqual(response.data['timezone'], 'Europe/Paris')
+        # Le 1er mars 00:00 UTC tombe le 1er à 01:00 à Paris
+        self.assertEqual(self.counts(response), {'2030-03-01': 1, '2030-03-10': 1, '2030-03-11': 1})
+
+    def test_list_filters_apply(self):
+        response = self.client.get(self.url, {'month': '2030-03', 'category': self.music.pk})
+        self.assertEqual(self.counts(response), {'2030-03-01': 1, '2030-03-10': 1})
+
+    def test_invalid_parameters(self):
+        for params in ({'month': '2030-13'}, {'month': 'mars'}, {'tz': 'Mars/Olympus'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user('organizer')
+        self.participant = User.objects.create_user('participant')
+        self.event = create_event(organizer, title='Festival, édition 2026')
+        EventRegistration.objects.register(self.event, self.participant)
+        api = APIClient()
+        api.force_authenticate(self.participant)
+        self.url = api.get('/api/auth/calendar-feeds/').data['registrations']
+
+    def test_feed_lists_confirmed_registrations(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('SUMMARY:Festival\\, édition 2026', body)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+
+    def test_unchanged_feed_returns_304_until_registration_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        EventRegistration.objects.get(user=self.participant).cancel()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tampered_token_rejected(self):
+        self.assertEqual(self.client.get(self.url.replace('.ics', 'x.ics')).status_code, 404)
+
+    def test_etag_changes_on_partial_writes(self):
+        api = APIClient()
+        api.force_authenticate(self.event.organizer)
+        url = api.get('/api/auth/calendar-feeds/').data['organizer']
+        etag = self.client.get(url)['ETag']
+
+        # Titre enregistré seul (update_fields) : l'ancien ETag ne doit plus donner de 304
+        self.event.title = 'Festival, édition 2027'
+        self.event.save(update_fields=['title'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('édition 2027', b''.join(response.streaming_content).decode())
+
+        # Jauge ramenée au nombre de sièges par le plan de salle
+        other = create_event(self.event.organizer)
+        etag = self.client.get(url)['ETag']
+        response = api.put(f'/api/events/{other.pk}/seats/', {'rows': 2, 'seats_per_row': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_organizer_feed_output(self):
+        organizer = self.event.organizer
+        draft = create_event(
+            organizer, title='Atelier ' + 'très long ' * 10, status='draft',
+            start_date=self.event.start_date - timedelta(days=1), end_date=self.event.start_date - timedelta(hours=20)
+        )
+        api = APIClient()
+        api.force_authenticate(organizer)
+        url = api.get('/api/auth/calendar-feeds/').data['organizer']
+        # Un jeton ne donne pas accès à l'autre flux
+        self.assertEqual(self.client.get(url.replace('/organizer/', '/registrations/')).status_code, 404)
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        lines = body.split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        unfolded = body.replace('\r\n ', '')
+        self.assertLess(unfolded.index(f'UID:event-{draft.pk}@'), unfolded.index(f'UID:event-{self.event.pk}@'))
+        self.assertIn('SUMMARY:' + draft.title + '\r\n', unfolded)
+        self.assertIn('STATUS:TENTATIVE', unfolded)
+        self.assertIn('DTSTART:' + self.event.start_date.astimezone(ZoneInfo('UTC')).strftime('%Y%m%dT%H%M%SZ'), unfolded)
+        self.assertIn('LOCATION:Grand Théâtre\\, Boulevard de la République\\, Dakar', unfolded)
+
+
+class RecurringEventTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        paris = ZoneInfo('Europe/Paris')
+        start = datetime(2026, 10, 5, 19, 0, tzinfo=paris)
+        self.master = create_event(self.organizer, title='Meetup', start_date=start, end_date=start + timedelta(hours=2))
+        EventRecurrence.objects.create(
+            event=self.master, frequency='weekly', weekdays='0,2', count=8, timezone='Europe/Paris'
+        )
+        self.client = APIClient()
+
+    def list_window(self, **params):
+        params.update({'start': '2026-10-01', 'end': '2026-11-01', 'ordering': 'start_date'})
+        return self.client.get('/api/events/', params).data['results']
+
+    def test_occurrences_expanded_in_local_time_and_paginated(self):
+        first_page = self.client.get('/api/events/', {
+            'start': '2026-10-01', 'end': '2026-11-01', 'ordering': 'start_date', 'page_size': 4
+        }).data
+        second_page = self.client.get(first_page['next']).data
+        results = first_page['results'] + second_page['results']
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results[0]['id'], self.master.pk)
+        self.assertEqual({event['series'] for event in results[1:]}, {self.master.pk})
+        # 19 h à Paris de part et d'autre du passage à l'heure d'hiver
+        self.assertEqual(results[5]['start_date'], '2026-10-21T17:00:00Z')
+        self.assertEqual(results[6]['start_date'], '2026-10-26T18:00:00Z')
+        self.assertIsNone(second_page['next'])
+
+    def test_materialized_occurrence_replaces_computed_one(self):
+        participant = User.objects.create_user('participant')
+        self.client.force_authenticate(participant)
+        response = self.client.post(
+            f'/api/events/{self.master.pk}/occurrences/', {'start': '2026-10-12T19:00:00+02:00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        EventRegistration.objects.register(Event.objects.get(pk=response.data['id']), participant)
+
+        results = self.list_window()
+        self.assertEqual(len(results), 8)
+        stored = [event for event in results if event['id'] == response.data['id']]
+        self.assertEqual(stored[0]['current_participants'], 1)
+
+    def test_unknown_occurrence_rejected(self):
+        self.client.force_authenticate(self.organizer)
+        response = self.client.post(
+            f'/api/events/{self.master.pk}/occurrences/', {'start': '2026-10-13T19:00:00+02:00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleConflictTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer)
+        self.client = APIClient()
+
+    def test_overlapping_registration_returns_warning(self):
+        participant = User.objects.create_user('participant')
+        EventRegistration.objects.register(self.event, participant)
+        overlapping = create_event(
+            self.organizer, location='Stade Léopold Senghor',
+            start_date=self.event.start_date + timedelta(hours=2), end_date=self.event.end_date + timedelta(hours=2)
+        )
+        following = create_event(
+            self.organizer, location='Stade Léopold Senghor',
+            start_date=overlapping.end_date, end_date=overlapping.end_date + timedelta(hours=1)
+        )
+        self.client.force_authenticate(participant)
+        response = self.client.post(f'/api/events/{overlapping.pk}/register/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([warning['event_id'] for warning in response.data['warnings']], [self.event.pk])
+        # Intervalles semi-ouverts : enchaîner deux événements n'est pas un conflit
+        response = self.client.post(f'/api/events/{following.pk}/register/')
+        self.assertNotIn('warnings', response.data)
+
+    def test_organizer_report_lists_double_booked_venue(self):
+        other = User.objects.create_user('other')
+        clash = create_event(
+            other, location='GRAND  theatre', city='dakar',
+            start_date=self.event.start_date + timedelta(hours=1), end_date=self.event.end_date
+        )
+        create_event(other, location='Grand Théâtre', status='cancelled')
+        self.client.force_authenticate(self.organizer)
+        response = self.client.get('/api/events/conflicts/')
+        self.assertEqual(response.data['count'], 1)
+        conflict = response.data['results'][0]
+        self.assertEqual({event['event_id'] for event in conflict['events']}, {self.event.pk, clash.pk})
+        self.assertFalse(conflict['same_organizer'])
+
+    def test_organizer_report_pairs_own_events_once_and_skips_third_parties(self):
+        second = create_event(
+            self.organizer, start_date=self.event.start_date + timedelta(hours=2),
+            end_date=self.event.end_date + timedelta(hours=2)
+        )
+        other = User.objects.create_user('other')
+        # Deux événements de tiers qui se chevauchent entre eux, mais pas ceux de l'organisateur
+        later = self.event.end_date + timedelta(days=1)
+        for _ in range(2):
+            create_event(other, start_date=later, end_date=later + timedelta(hours=1))
+        self.client.force_authenticate(self.organizer)
+        response = self.client.get('/api/events/conflicts/')
+        self.assertEqual(response.data['count'], 1)
+        conflict = response.data['results'][0]
+        self.assertEqual([event['event_id'] for event in conflict['events']], [self.event.pk, second.pk])
+        self.assertTrue(conflict['same_organizer'])
+
+    def test_interval_index_finds_long_intervals_starting_early(self):
+        day = timezone.now()
+        index = conflicts.IntervalIndex([
+            (day, day + timedelta(days=3), 'festival'),
+            (day + timedelta(hours=1), day + timedelta(hours=2), 'concert'),
+            (day + timedelta(hours=2), day + timedelta(hours=3), 'atelier'),
+        ])
+        window = (day + timedelta(days=2), day + timedelta(days=2, hours=1))
+        self.assertEqual(index.overlapping(*window), ['festival'])
+        self.assertEqual(index.overlapping(day + timedelta(hours=1), day + timedelta(hours=2)), ['festival', 'concert'])
+        self.assertEqual(conflicts.IntervalIndex().overlapping(*window), [])
+
+
+class SeatMapTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        response = self.client.put(
+            f'/api/events/{self.event.pk}/seats/', {'rows': 3, 'seats_per_row': 4}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_block_never_spans_two_rows(self):
+        # Rangée A : places 1 et 2 prises ; rangée B : place 1 prise
+        occupied = seating.seats_mask([0, 1, 4])
+        self.assertEqual(seating.find_block(occupied, 3, 4, 3), 5)
+        self.assertEqual(seating.find_block(occupied, 3, 4, 4), 8)
+        self.assertIsNone(seating.find_block(occupied | seating.seats_mask([9]), 3, 4, 4))
+        self.assertEqual(seating.seat_label(5, 4), 'B2')
+        self.assertEqual(seating.row_name(27), 'AB')
+
+    def test_group_seated_together_and_seat_passed_to_waitlist(self):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.max_participants, 12)
+        EventRegistration.objects.register(self.event, User.objects.create_user('single'))
+        users = [User.objects.create_user(f'group{i}') for i in range(4)]
+        self.client.post(f'/api/events/{self.event.pk}/bulk_register/', {'users': [user.pk for user in users]}, format='json')
+        seats = sorted(EventRegistration.objects.filter(user__in=users).values_list('seat', flat=True))
+        self.assertEqual(seats, [4, 5, 6, 7])
+
+        for i in range(7):
+            EventRegistration.objects.register(self.event, User.objects.create_user(f'filler{i}'))
+        waiting = EventRegistration.objects.register(self.event, User.objects.create_user('waiting'))
+        self.assertEqual(waiting.status, 'waitlist')
+        self.assertIsNone(waiting.seat)
+
+        EventRegistration.objects.get(user__username='group1').cancel()
+        waiting = EventRegistration.objects.get(pk=waiting.pk)
+        self.assertEqual((waiting.status, waiting.seat), ('confirmed', 5))
+        self.client.force_authenticate(waiting.user)
+        self.assertEqual(self.client.get(f'/api/registrations/{waiting.pk}/').data['seat_label'], 'B2')
+
+        waiting.cancel()
+        seat_map = EventSeatMap.objects.get(event=self.event)
+        self.assertEqual(seat_map.available(), 1)
+        self.assertEqual(EventRegistration.objects.register(self.event, waiting.user).seat, 5)
+
+
+    def test_contiguous_group_booking(self):
+        singles = [
+            EventRegistration.objects.register(self.event, User.objects.create_user(f'single{i}'))
+            for i in range(10)
+        ]
+        singles[1].cancel()
+        singles[5].cancel()
+        # Places libres : A2, B2, C3, C4
+        url = f'/api/events/{self.event.pk}/bulk_register/'
+        trio = [User.objects.create_user(f'trio{i}').pk for i in range(3)]
+
+        response = self.client.post(url, {'users': trio, 'contiguous': True}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(EventRegistration.objects.filter(user__in=trio).exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 8)
+        self.assertEqual(EventSeatMap.objects.get(event=self.event).available(), 4)
+
+        response = self.client.post(url, {'users': trio[:2], 'contiguous': 'true'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        seats = EventRegistration.objects.filter(user__in=trio[:2]).order_by('seat').values_list('seat', flat=True)
+        self.assertEqual(list(seats), [10, 11])
+
+        # Sans contiguous, le groupe occupe les places restantes éparses
+        response = self.client.post(url, {'users': trio[2:] + [User.objects.create_user('solo').pk]}, format='json')
+        self.assertEqual(response.data['confirmed'], 2)
+        self.assertEqual(EventSeatMap.objects.get(event=self.event).available(), 0)
+
+class SeatHoldTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, max_participants=2)
+        self.client = APIClient()
+
+    def hold(self, username):
+        self.client.force_authenticate(User.objects.get_or_create(username=username)[0])
+        return self.client.post(f'/api/events/{self.event.pk}/hold/')
+
+    def test_holds_count_against_capacity_until_confirmed(self):
+        self.assertEqual(self.hold('first').status_code, 201)
+        self.assertEqual(self.hold('second').data['status'], 'held')
+        self.assertEqual(self.hold('third').status_code, 409)
+
+        event = self.client.get(f'/api/events/{self.event.pk}/').data
+        self.assertEqual((event['current_participants'], event['remaining_spots'], event['is_full']), (0, 0, True))
+
+        self.client.force_authenticate(User.objects.get(username='first'))
+        self.assertEqual(self.client.post(f'/api/events/{self.event.pk}/register/').data['status'], 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.current_participants, self.event.held_seats), (1, 1))
+
+    def test_expired_holds_are_swept_and_reclaimed(self):
+        self.hold('first')
+        self.hold('second')
+        waiting = EventRegistration.objects.register(self.event, User.objects.create_user('waiting'))
+        self.assertEqual(waiting.status, 'waitlist')
+        EventRegistration.objects.filter(user__username='first').update(
+            hold_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        # Jauge pleine : la réservation expirée est libérée au profit de la liste d'attente
+        late = EventRegistration.objects.register(self.event, User.objects.create_user('late'))
+        self.assertEqual(late.status, 'waitlist')
+        self.assertEqual(EventRegistration.objects.get(pk=waiting.pk).status, 'confirmed')
+
+        EventRegistration.objects.filter(status='held').update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(EventRegistration.objects.expire_holds(batch_size=1), 1)
+        self.assertEqual(EventRegistration.objects.get(pk=late.pk).status, 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.current_participants, self.event.held_seats), (2, 0))
+
+    def test_patch_cannot_turn_a_registration_into_a_hold(self):
+        registration = EventRegistration.objects.register(self.event, User.objects.create_user('first'))
+        self.client.force_authenticate(registration.user)
+        response = self.client.patch(
+            f'/api/registrations/{registration.pk}/', {'status': 'held', 'notes': 'Allergies'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['notes']), ('confirmed', 'Allergies'))
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.current_participants, self.event.held_seats), (1, 0))
+
+
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user('organizer')
+        # Une admission par minute : seul le premier arrivé passe tout de suite
+        self.event = create_event(self.organizer, admission_rate=1)
+        self.client = APIClient()
+
+    def join(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/events/{self.event.pk}/queue/')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_only_admitted_tokens_reach_registration(self):
+        first, second = User.objects.create_user('first'), User.objects.create_user('second')
+        first_ticket = self.join(first)
+        second_ticket = self.join(second)
+        self.assertTrue(first_ticket['admitted'])
+        self.assertEqual((second_ticket['position'], second_ticket['ahead'], second_ticket['admitted']), (2, 1, False))
+        self.assertEqual(self.join(second)['token'], second_ticket['token'])
+
+        url = f'/api/events/{self.event.pk}/register/'
+        self.assertEqual(self.client.post(url, {'queue_token': second_ticket['token']}).status_code, 429)
+        # Jeton admis, mais obtenu par un autre utilisateur
+        self.assertEqual(self.client.post(url, {'queue_token': first_ticket['token']}).status_code, 429)
+        self.client.force_authenticate(first)
+        self.assertEqual(self.client.post(url, {'queue_token': first_ticket['token']}).status_code, 201)
+
+    def test_status_polling_reads_only_the_token(self):
+        ticket = self.join(User.objects.create_user('first'))
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(0):
+            response = self.client.get(ticket['status_url'])
+        self.assertTrue(response.json()['admitted'])
+        self.assertEqual(self.client.get('/api/waiting-room/forged/').status_code, 404)
+
+    def test_queue_reopened_after_draining_keeps_pacing(self):
+        self.join(User.objects.create_user('first'))
+        with mock.patch('events.waiting_room.time.time', return_value=time.time() + 3600):
+            late = [self.join(User.objects.create_user(f'late{i}')) for i in range(3)]
+        self.assertEqual([ticket['position'] for ticket in late], [1, 2, 3])
+        self.assertEqual([ticket['admitted'] for ticket in late], [True, False, False])
+
+    def test_enabling_requires_shared_cache(self):
+        self.client.force_authenticate(self.organizer)
+        response = self.client.patch(f'/api/events/{self.event.pk}/', {'admission_rate': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('admission_rate', response.data)
+
+
+class ShardedCounterTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('organizer')
+        self.event = create_event(self.organizer, max_participants=5)
+        EventRegistration.objects.register(self.event, User.objects.create_user('early'))
+        self.event.counter_shards = 4
+        self.event.save()
+
+    def test_capacity_split_across_shards_and_summed_on_read(self):
+        shards = EventCounterShard.objects.filter(event=self.event)
+        self.assertEqual(sum(shard.capacity for shard in shards), 5)
+        self.assertEqual(sum(shard.participants for shard in shards), 1)
+
+        for i in range(5):
+            EventRegistration.objects.register(self.event, User.objects.create_user(f'user{i}'))
+        self.assertEqual(EventRegistration.objects.filter(status='waitlist').count(), 1)
+        EventRegistration.objects.get(user__username='user0').cancel()
+        self.assertFalse(EventRegistration.objects.filter(status='waitlist').exists())
+
+        client = APIClient()
+        with self.assertNumQueries(2):
+            # Page d'événements, puis totaux des compteurs répartis
+            listed = client.get('/api/events/', {'fields': 'id,current_participants,is_full'}).data['results']
+        self.assertEqual(listed, [{'id': self.event.pk, 'current_participants': 5, 'is_full': True}])
+        self.assertEqual(client.get(f'/api/events/{self.event.pk}/').data['remaining_spots'], 0)
+
+    def test_holds_and_folding_back_keep_totals(self):
+        holder = User.objects.create_user('holder')
+        EventRegistration.objects.hold(self.event, holder)
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertEqual((event.participant_count, event.held_count, event.remaining_spots), (1, 1, 3))
+        EventRegistration.objects.register(self.event, holder)
+
+        event.counter_shards = 0
+        event.save()
+        event.refresh_from_db()
+        self.assertEqual((event.current_participants, event.held_seats), (2, 0))
+        self.assertFalse(EventCounterShard.objects.exists())
+
+
+class ConcurrentRegistrationTests(TransactionTestCase):
+    capacity = 5
+    attempts = 20
+
+    def register_concurrently(self, event):
+        users = [
+            User.objects.create_user(f'user{i}')
+            for i in range(self.attempts)
+        ]
+        barrier = threading.Barrier(self.attempts)
+        results = []
+
+        def register(user):
+            # Chaque thread part du même objet Event, donc d'un compteur périmé
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        EventRegistration.objects.register(event, user, waitlist=False)
+                        results.append('confirmed')
+                    except EventFullError:
+                        results.append('full')
+                    except OperationalError:
+                        # SQLite verrouille la base entière : on réessaie
+                        time.sleep(random.random() / 20)
+                        continue
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=register, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        confirmed = EventRegistration.objects.filter(event=event, status='confirmed').count()
+        self.assertEqual(results.count('confirmed'), self.capacity)
+        self.assertEqual(results.count('full'), self.attempts - self.capacity)
+        self.assertEqual(confirmed, self.capacity)
+
+    def test_concurrent_registrations_never_overbook(self):
+        organizer = User.objects.create_user('organizer')
+        event = create_event(organizer, max_participants=self.capacity)
+        self.register_concurrently(event)
+        event.refresh_from_db()
+        self.assertEqual(event.current_participants, self.capacity)
+
+    def test_sharded_counter_never_overbooks(self):
+        organizer = User.objects.create_user('organizer')
+        event = create_event(organizer, max_participants=self.capacity, counter_shards=4)
+        self.register_concurrently(event)
+        event = Event.objects.get(pk=event.pk)
+        self.assertEqual((event.participant_count, event.current_participants), (self.capacity, 0))
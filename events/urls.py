@@ -13,6 +13,7 @@ router.register(r'events', views.EventViewSet)
 router.register(r'registrations', views.EventRegistrationViewSet, basename='registration')
 router.register(r'images', views.EventImageViewSet, basename='image')
 router.register(r'comments', views.EventCommentViewSet, basename='comment')
+router.register(r'exports', views.ExportJobViewSet, basename='export')
 
 urlpatterns = [
     path('', views.home_view, name='home'),  # Page d'accueil
@@ -25,6 +26,16 @@ urlpatterns = [
     path('auth/profile/', views.user_profile, name='user_profile'),
     path('auth/profile/update/', views.update_user_profile, name='update_user_profile'),
     path('auth/my-events/', views.user_events, name='user_events'),
+    path('auth/calendar-feeds/', views.calendar_feeds, name='calendar_feeds'),
+    
+    # Flux iCalendar (authentifiés par leur jeton signé)
+    path('ical/<str:kind>/<str:token>.ics', views.ical_feed, name='ical_feed'),
+    
+    # Suivi de la salle d'attente (jeton signé, sans base de données)
+    path('waiting-room/<str:token>/', views.waiting_room_status, name='waiting_room_status'),
+    
+    # Autocomplétion de la barre de recherche
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
     
     # API endpoints
     path('', include(router.urls)),
@@ -2,21 +2,46 @@ from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Sum, Min, Prefetch, Case, When, Value, CharField
+from django.db.models.functions import Coalesce, TruncDate
+from django.db import IntegrityError
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.conf import settings
+from django.core.cache import cache
 from datetime import datetime, timedelta
+from collections import Counter
+from urllib.parse import urlencode
+import hashlib
 
-from .models import Category, Event, EventRegistration, EventImage, EventComment, UserProfile
+from .models import (
+    Category, Event, EventRegistration, EventImage, EventComment, UserProfile, ExportJob,
+    EventDailyStats, EventViewStats, EventRecurrence, EventSeatMap, EventCounterShard,
+    EventFullError, NoContiguousSeatsError, AlreadyRegisteredError
+)
+from .pagination import EventCursorPagination
+from . import dateranges, geo, ical, search, seating, waiting_room
+from . import clusters as map_clusters
+from . import conflicts as schedule_conflicts
+from . import recurrence as event_series
+from .analytics import view_buffer, visitor_key
+from .autocomplete import autocomplete_index, SUGGESTION_TYPES
+from .exports import participant_registrations, iter_participant_csv, gzip_stream
 from .serializers import (
-    CategorySerializer, EventSerializer, EventCreateSerializer, EventUpdateSerializer,
-    EventRegistrationSerializer, EventRegistrationCreateSerializer, EventRegistrationUpdateSerializer,
+    CategorySerializer, EventSerializer, EventListSerializer, EventCreateSerializer, EventUpdateSerializer,
+    EventRegistrationSerializer,
     EventImageSerializer, EventImageCreateSerializer,
     EventCommentSerializer, EventCommentCreateSerializer, EventCommentUpdateSerializer,
-    UserSerializer, UserRegistrationSerializer, UserProfileSerializer
+    UserSerializer, UserRegistrationSerializer, UserProfileSerializer,
+    ExportJobSerializer, ExportJobCreateSerializer, EventRecurrenceSerializer, EventSeatMapSerializer
 )
 
 def home_view(request):
@@ -79,6 +104,21 @@ def home_view(request):
     """
     return HttpResponse(html_content)
 
+def with_related(queryset, related):
+    """Charger uniquement les relations d'événement qui seront sérialisées"""
+    if 'category' in related:
+        queryset = queryset.select_related('category')
+    if 'organizer' in related:
+        queryset = queryset.select_related('organizer__profile')
+    if 'images' in related:
+        queryset = queryset.prefetch_related('images')
+    if 'comments' in related:
+        queryset = queryset.prefetch_related(Prefetch(
+            'comments',
+            queryset=EventComment.objects.select_related('user__profile')
+        ))
+    return queryset
+
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -145,30 +185,42 @@ def update_user_profile(request):
 def user_events(request):
     """Endpoint pour récupérer les événements de l'utilisateur selon son rôle"""
     user = request.user
+    context = {'request': request}
+    related = EventListSerializer.get_related_fields(request)
     
     if user.profile.role in ['organizer', 'both']:
         # Événements organisés par l'utilisateur
         organized_events = Event.objects.filter(organizer=user)
-        organized_serializer = EventSerializer(organized_events, many=True)
-        
-        # Statistiques pour les organisateurs
-        stats = {
-            'total_events': organized_events.count(),
-            'published_events': organized_events.filter(status='published').count(),
-            'draft_events': organized_events.filter(status='draft').count(),
-            'total_registrations': EventRegistration.objects.filter(
-                event__organizer=user, 
-                status='confirmed'
-            ).count()
-        }
+        organized_serializer = EventListSerializer(
+            with_related(organized_events, related), many=True, context=context
+        )
+        
+        # Statistiques pour les organisateurs : une seule requête agrégée,
+        # les inscriptions confirmées étant déjà comptées par événement
+        stats = organized_events.aggregate(
+            total_events=Count('id'),
+            published_events=Count('id', filter=Q(status='published')),
+            draft_events=Count('id', filter=Q(status='draft')),
+            total_registrations=Coalesce(Sum('current_participants'), 0),
+            sharded_events=Count('id', filter=Q(counter_shards__gt=0)),
+        )
+        # Événements à compteur réparti : les participants sont comptés sur leurs lignes
+        if stats.pop('sharded_events'):
+            stats['total_registrations'] += EventCounterShard.objects.filter(
+                event__organizer=user
+            ).aggregate(total=Coalesce(Sum('participants'), 0))['total']
     else:
         organized_serializer = None
         stats = None
     
     # Événements auxquels l'utilisateur est inscrit
-    registrations = EventRegistration.objects.filter(user=user, status='confirmed')
-    registered_events = [reg.event for reg in registrations]
-    registered_serializer = EventSerializer(registered_events, many=True)
+    registered_events = Event.objects.filter(
+        registrations__user=user,
+        registrations__status='confirmed'
+    )
+    registered_serializer = EventListSerializer(
+        with_related(registered_events, related), many=True, context=context
+    )
     
     return Response({
         'organized_events': organized_serializer.data if organized_serializer else [],
@@ -176,6 +228,75 @@ def user_events(request):
         'stats': stats
     })
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def autocomplete(request):
+    """
+    Suggestions pour la barre de recherche : titres d'événements publiés,
+    villes et catégories commençant par ?q=. ?types=event,city,category et ?limit=
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    types = request.query_params.get('types')
+    types = [t for t in types.split(',') if t in SUGGESTION_TYPES] if types else SUGGESTION_TYPES
+    
+    return Response({
+        'query': query,
+        'suggestions': autocomplete_index.suggest(query, limit=limit, types=types)
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feeds(request):
+    """Adresses des flux iCalendar de l'utilisateur, à ajouter dans un agenda"""
+    return Response({
+        kind: request.build_absolute_uri(
+            reverse('ical_feed', kwargs={'kind': kind, 'token': ical.feed_token(request.user, kind)})
+        )
+        for kind in ical.FEED_KINDS
+    })
+
+@require_GET
+def ical_feed(request, kind, token):
+    """
+    Flux iCalendar public (le jeton signé tient lieu d'authentification).
+    Une requête If-None-Match sur un flux inchangé reçoit un 304.
+    """
+    user_id = ical.user_id_from_token(kind, token)
+    if user_id is None:
+        raise Http404()
+    etag = f'"{ical.feed_etag(kind, user_id)}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    
+    response = StreamingHttpResponse(
+        ical.iter_feed(kind, user_id, request.get_host().split(':')[0]),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'inline; filename="eventfy-{kind}.ics"'
+    return response
+
+@require_GET
+def waiting_room_status(request, token):
+    """
+    Position dans la salle d'attente. Seul le jeton signé est lu : aucune
+    requête en base ni en cache, les clients peuvent interroger en boucle.
+    """
+    payload = waiting_room.read_token(token)
+    if payload is None:
+        raise Http404()
+    data = waiting_room.status(payload)
+    response = JsonResponse(data)
+    if data['retry_after']:
+        response['Retry-After'] = str(data['retry_after'])
+    return response
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Permission personnalisée pour permettre aux propriétaires de modifier leurs objets
@@ -213,83 +334,395 @@ class CategoryViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
 
+class EventSearchFilter(filters.BaseFilterBackend):
+    """
+    ?search= via l'index plein texte (GIN sur PostgreSQL, FTS5 sur SQLite),
+    insensible aux accents, à la place des icontains de SearchFilter
+    """
+    search_param = 'search'
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search.filter_queryset(queryset, query)
+
+class EventFilter(django_filters.FilterSet):
+    """Filtres de la liste ; ?city= compare la forme canonique de la ville"""
+    city = django_filters.CharFilter(method='filter_city')
+    
+    class Meta:
+        model = Event
+        fields = ['category', 'status', 'city', 'is_free', 'is_featured']
+    
+    def filter_city(self, queryset, name, value):
+        return queryset.filter(city_key=search.city_key(value))
+
 class EventViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les événements
     """
     queryset = Event.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'status', 'city', 'is_free', 'is_featured']
-    search_fields = ['title', 'description', 'location', 'city']
+    pagination_class = EventCursorPagination
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, filters.OrderingFilter]
+    filterset_class = EventFilter
     ordering_fields = ['start_date', 'end_date', 'created_at', 'price']
     ordering = ['-start_date']
     
-    def get_queryset(self):
-        queryset = Event.objects.select_related('category', 'organizer').prefetch_related('images', 'comments')
+    # Actions renvoyant des collections : représentation compacte par défaut
+    LIST_ACTIONS = ['list', 'featured', 'upcoming', 'nearby', 'search']
+    # Actions qui n'ont besoin d'aucune relation
+    BARE_ACTIONS = ['register', 'hold', 'queue', 'bulk_register', 'unregister', 'analytics', 'export_participants', 'facets', 'clusters', 'calendar', 'recurrence', 'conflicts', 'seats']
+    BULK_REGISTER_LIMIT = 500
+    # Paramètres sans effet sur les facettes (exclus de la clé de cache)
+    FACETS_IGNORED_PARAMS = {'cursor', 'page', 'page_size', 'ordering', 'fields', 'expand', 'include_total'}
+    
+    def get_related_fields(self):
+        """Relations à charger selon l'action et les paramètres fields/expand"""
+        if self.action in self.LIST_ACTIONS:
+            return EventListSerializer.get_related_fields(self.request)
+        if self.action in self.BARE_ACTIONS:
+            # Seul l'événement lui-même est nécessaire
+            return set()
+        return {'category', 'organizer', 'images', 'comments'}
+    
+    def get_base_queryset(self):
+        """Événements filtrés par statut et par distance, sans fenêtre de dates"""
+        queryset = with_related(Event.objects.all(), self.get_related_fields())
         
         # Filtrer par statut si spécifié
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Filtrer par date si spécifié
-        date_filter = self.request.query_params.get('date', None)
-        if date_filter:
-            try:
-                if date_filter == 'today':
-                    today = timezone.now().date()
-                    queryset = queryset.filter(start_date__date=today)
-                elif date_filter == 'week':
-                    week_start = timezone.now().date()
-                    week_end = week_start + timedelta(days=7)
-                    queryset = queryset.filter(start_date__date__range=[week_start, week_end])
-                elif date_filter == 'month':
-                    month_start = timezone.now().date().replace(day=1)
-                    next_month = (month_start + timedelta(days=32)).replace(day=1)
-                    month_end = next_month - timedelta(days=1)
-                    queryset = queryset.filter(start_date__date__range=[month_start, month_end])
-            except:
-                pass
-        
-        # Filtrer par distance si coordonnées fournies
-        lat = self.request.query_params.get('lat', None)
-        lng = self.request.query_params.get('lng', None)
-        radius = self.request.query_params.get('radius', 50)  # km par défaut
-        
-        if lat and lng:
-            # Ici on pourrait implémenter un filtre géographique
-            # Pour l'instant, on filtre juste par ville
-            pass
+        # Filtrer par distance si coordonnées fournies (?lat=&lng=&radius= en km, 50 par défaut)
+        try:
+            point = geo.parse_point(self.request.query_params)
+        except ValueError:
+            point = None
+        if point:
+            queryset = geo.within_radius(queryset, *point)
         
         return queryset
     
+    def get_date_window(self):
+        """
+        Fenêtre [début, fin) demandée par ?date=today|week|month et/ou
+        ?start=&end=, en timestamps dans le fuseau ?tz= ; bornes absentes à None
+        """
+        params = self.request.query_params
+        start = end = None
+        try:
+            tz = dateranges.resolve_timezone(params.get('tz'))
+            if params.get('date'):
+                start, end = dateranges.period_range(params['date'], tz) or (None, None)
+            if params.get('start'):
+                bound = dateranges.parse_bound(params['start'], tz)
+                start = bound if start is None else max(start, bound)
+            if params.get('end'):
+                bound = dateranges.parse_bound(params['end'], tz)
+                end = bound if end is None else min(end, bound)
+        except ValueError:
+            return None, None
+        return start, end
+    
+    def get_queryset(self):
+        if self.detail:
+            # Sur un événement donné, ?start=&end= bornent l'action (analytics), pas l'événement
+            return self.get_base_queryset()
+        return dateranges.filter_range(self.get_base_queryset(), *self.get_date_window())
+    
+    def get_series_occurrences(self, start, end):
+        """Occurrences calculées des événements récurrents correspondant aux filtres"""
+        masters = self.filter_queryset(self.get_base_queryset()).filter(
+            Q(recurrence__until__isnull=True) | Q(recurrence__until__gte=start),
+            recurrence__isnull=False, start_date__lt=end
+        ).select_related('recurrence').order_by()
+        return event_series.expand(masters, start, end)
+    
+    def get_virtual_events(self):
+        """Occurrences à fusionner dans la liste quand une fenêtre de dates bornée est demandée"""
+        if self.action != 'list':
+            return []
+        start, end = self.get_date_window()
+        if start is None or end is None or end - start > event_series.MAX_WINDOW:
+            return []
+        return self.get_series_occurrences(start, end)
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return EventCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return EventUpdateSerializer
+        elif self.action in self.LIST_ACTIONS:
+            return EventListSerializer
         return EventSerializer
     
     def perform_create(self, serializer):
         serializer.save(organizer=self.request.user)
     
     def retrieve(self, request, *args, **kwargs):
-        """Récupérer un événement spécifique et incrémenter les vues"""
+        """Récupérer un événement spécifique et comptabiliser la vue"""
         instance = self.get_object()
         
-        # Incrémenter le compteur de vues
-        instance.increment_views()
+        # La vue est mise en tampon puis écrite par lots, hors de la ligne Event
+        view_buffer.record(instance.pk, visitor_key(request))
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Recherche classée par pertinence avec extraits surlignés.
+        ?q=<texte>, ?limit= (20 par défaut, 50 maximum)
+        """
+        query = request.query_params.get('q', '').strip()
+        if not search.tokenize(query):
+            return Response({'error': 'Paramètre q requis'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+        
+        queryset = self.get_queryset().filter(status='published')
+        results = search.ranked_search(queryset, query, limit=limit)
+        serializer = self.get_serializer(results, many=True)
+        data = serializer.data
+        for item, event in zip(data, results):
+            item['rank'] = getattr(event, 'search_rank', None)
+            item['snippet'] = search.highlight(event.description, query)
+            item['title_highlighted'] = search.highlight(event.title, query)
+        return Response({'query': query, 'count': len(data), 'results': data})
+    
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Groupes d'événements publiés pour la carte.
+        ?bbox=ouest,sud,est,nord (degrés) et ?zoom= (0 à 20)
+        """
+        try:
+            west, south, east, north = (float(value) for value in request.query_params.get('bbox', '').split(','))
+            zoom = int(request.query_params.get('zoom', 10))
+        except ValueError:
+            return Response(
+                {'error': 'Paramètres bbox (ouest,sud,est,nord) et zoom requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+            return Response({'error': 'Zone invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        precision, clusters = map_clusters.clusters_in_box(south, north, west, east, zoom)
+        return Response({'zoom': zoom, 'precision': precision, 'clusters': clusters})
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Nombre d'événements publiés par jour pour un mois (?month=AAAA-MM,
+        mois courant par défaut), en une requête groupée. Accepte les mêmes
+        filtres que la liste, et ?tz= pour le découpage des jours.
+        """
+        try:
+            tz = dateranges.resolve_timezone(request.query_params.get('tz'))
+            month = request.query_params.get('month')
+            if month:
+                year, month = (int(part) for part in month.split('-'))
+            else:
+                today = timezone.localdate(timezone=tz)
+                year, month = today.year, today.month
+            start, end = dateranges.month_range(year, month, tz)
+        except ValueError:
+            return Response(
+                {'error': 'Paramètres month (AAAA-MM) ou tz invalides'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset()).filter(status='published')
+        counts = dict(
+            dateranges.filter_range(queryset, start, end).order_by().annotate(
+                day=TruncDate('start_date', tzinfo=tz)
+            ).values('day').annotate(count=Count('id')).values_list('day', 'count')
+        )
+        # Occurrences des événements récurrents, calculées pour le mois
+        for occurrence in self.get_series_occurrences(start, end):
+            if occurrence.status == 'published':
+                day = occurrence.start_date.astimezone(tz).date()
+                counts[day] = counts.get(day, 0) + 1
+        days = []
+        day = start.date()
+        while day < end.date():
+            days.append({'date': day, 'count': counts.get(day, 0)})
+            day += timedelta(days=1)
+        return Response({
+            'month': f'{year:04d}-{month:02d}',
+            'timezone': str(tz),
+            'total': sum(counts.values()),
+            'days': days,
+        })
+    
+    @action(detail=True, methods=['get', 'put', 'delete'])
+    def recurrence(self, request, pk=None):
+        """Règle de répétition de l'événement (modifiable par l'organisateur)"""
+        event = self.get_object()
+        rule = EventRecurrence.objects.filter(event=event).first()
+        
+        if request.method == 'GET':
+            if rule is None:
+                return Response({'error': 'Cet événement n\'est pas récurrent'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(EventRecurrenceSerializer(rule).data)
+        
+        if request.method == 'DELETE':
+            if rule is not None:
+                rule.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        if event.series_id is not None:
+            return Response(
+                {'error': 'Une occurrence ne peut pas porter sa propre règle'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = EventRecurrenceSerializer(rule, data=request.data, context={'event': event})
+        serializer.is_valid(raise_exception=True)
+        serializer.save(event=event)
+        return Response(serializer.data, status=status.HTTP_200_OK if rule else status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'put', 'delete'])
+    def seats(self, request, pk=None):
+        """
+        Plan de salle numéroté de l'événement (modifiable par l'organisateur
+        tant qu'aucune inscription n'est confirmée)
+        """
+        event = self.get_object()
+        seat_map = EventSeatMap.objects.filter(event=event).first()
+        
+        if request.method == 'GET':
+            if seat_map is None:
+                return Response({'error': 'Cet événement n\'a pas de plan de salle'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(EventSeatMapSerializer(seat_map).data)
+        
+        if request.method == 'DELETE':
+            if seat_map is not None:
+                EventRegistration.objects.filter(event=event, seat__isnull=False).update(seat=None)
+                seat_map.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        if event.participant_count or event.held_count:
+            return Response(
+                {'error': 'Le plan ne peut plus être modifié après les premières inscriptions'},
+                status=status.HTTP_409_CONFLICT
+            )
+        serializer = EventSeatMapSerializer(seat_map, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows, seats_per_row = serializer.validated_data['rows'], serializer.validated_data['seats_per_row']
+        saved = serializer.save(event=event, occupied=seating.encode(0, rows * seats_per_row))
+        # La jauge ne peut pas dépasser le nombre de sièges
+        if event.max_participants is None or event.max_participants > saved.capacity:
+            Event.objects.filter(pk=event.pk).update(max_participants=saved.capacity, updated_at=timezone.now())
+            if event.counter_shards:
+                EventCounterShard.objects.configure(event)
+        return Response(serializer.data, status=status.HTTP_200_OK if seat_map else status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def occurrences(self, request, pk=None):
+        """
+        Matérialiser l'occurrence prévue à {"start": ...} d'un événement
+        récurrent, pour s'y inscrire ou la modifier séparément
+        """
+        master = self.get_object()
+        start = parse_datetime(str(request.data.get('start', '')))
+        if getattr(master, 'recurrence', None) is None or start is None or timezone.is_naive(start):
+            return Response(
+                {'error': 'Paramètre start (date-heure avec fuseau) requis sur un événement récurrent'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not event_series.is_occurrence(master, start):
+            return Response({'error': 'Aucune occurrence à cette date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        occurrence, created = event_series.materialize(master, start)
+        return Response(
+            EventSerializer(occurrence, context={'request': request}).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def conflicts(self, request):
+        """
+        Doubles réservations de lieu impliquant les événements de l'organisateur,
+        à partir de maintenant ou dans la fenêtre ?date= / ?start=&end=
+        """
+        start, end = self.get_date_window()
+        report = schedule_conflicts.organizer_report(request.user, start or timezone.now(), end)
+        return Response({'count': len(report), 'results': report})
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Compteurs par catégorie, ville, gratuité et période pour les filtres
+        courants (mêmes paramètres que la liste), en une seule requête groupée
+        mise en cache quelques secondes.
+        """
+        params = sorted(
+            (key, value) for key, values in request.query_params.lists()
+            if key not in self.FACETS_IGNORED_PARAMS for value in values
+        )
+        cache_key = 'event-facets:' + hashlib.md5(urlencode(params).encode()).hexdigest()
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.compute_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(cache_key, data, settings.FACETS_CACHE_TTL)
+        return Response(data)
+    
+    def compute_facets(self, queryset):
+        now = timezone.now()
+        today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        date_bucket = Case(
+            When(start_date__lt=now, then=Value('past')),
+            When(start_date__lt=today + timedelta(days=1), then=Value('today')),
+            When(start_date__lt=today + timedelta(days=7), then=Value('week')),
+            When(start_date__lt=today + timedelta(days=31), then=Value('month')),
+            default=Value('later'),
+            output_field=CharField()
+        )
+        rows = queryset.order_by().annotate(date_bucket=date_bucket).values(
+            'category_id', 'category__name', 'city_key', 'is_free', 'date_bucket'
+        ).annotate(count=Count('id'), city=Min('city'))
+        
+        total = 0
+        categories, cities = {}, {}
+        is_free = Counter()
+        dates = Counter({bucket: 0 for bucket in ('past', 'today', 'week', 'month', 'later')})
+        for row in rows:
+            count = row['count']
+            total += count
+            if row['category_id'] is not None:
+                entry = categories.setdefault(
+                    row['category_id'],
+                    {'id': row['category_id'], 'name': row['category__name'], 'count': 0}
+                )
+                entry['count'] += count
+            city = cities.setdefault(row['city_key'], {'value': row['city_key'], 'label': row['city'].strip(), 'count': 0})
+            city['count'] += count
+            is_free[row['is_free']] += count
+            dates[row['date_bucket']] += count
+        
+        return {
+            'total': total,
+            'category': sorted(categories.values(), key=lambda entry: -entry['count']),
+            'city': sorted(cities.values(), key=lambda entry: -entry['count']),
+            'is_free': [{'value': value, 'count': count} for value, count in is_free.most_common()],
+            'date': [{'value': bucket, 'count': count} for bucket, count in dates.items()],
+        }
+    
+    def paginated_response(self, queryset, page_size=None):
+        """Paginer une action personnalisée comme la liste principale (page_size : taille par défaut)"""
+        page = self.paginator.paginate_queryset(queryset, self.request, view=self, page_size=page_size)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Récupérer les événements mis en avant"""
         featured_events = self.get_queryset().filter(is_featured=True, status='published')
-        serializer = self.get_serializer(featured_events, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(featured_events)
     
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
@@ -297,115 +730,294 @@ class EventViewSet(viewsets.ModelViewSet):
         upcoming_events = self.get_queryset().filter(
             start_date__gte=timezone.now(),
             status='published'
-        ).order_by('start_date')[:10]
-        serializer = self.get_serializer(upcoming_events, many=True)
-        return Response(serializer.data)
+        ).order_by('start_date')
+        return self.paginated_response(upcoming_events, page_size=10)
     
     @action(detail=False, methods=['get'])
     def nearby(self, request):
-        """Récupérer les événements à proximité (par ville)"""
+        """
+        Récupérer les événements à proximité : triés par distance avec
+        ?lat=&lng=&radius=, ou à défaut filtrés par ?city=
+        """
+        if 'lat' in request.query_params or 'lng' in request.query_params:
+            try:
+                point = geo.parse_point(request.query_params)
+            except ValueError:
+                point = None
+            if point is None:
+                return Response(
+                    {'error': 'Paramètres lat, lng ou radius invalides'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Parcouru par curseur sur (distance_km, start_date, id), sans COUNT(*)
+            nearby_events = self.get_queryset().filter(
+                status='published'
+            ).order_by('distance_km', 'start_date', 'id')
+            return self.paginated_response(nearby_events)
+        
         city = request.query_params.get('city', None)
         if city:
             nearby_events = self.get_queryset().filter(
-                city__iexact=city,
+                city_key=search.city_key(city),
                 status='published'
             ).order_by('start_date')
-            serializer = self.get_serializer(nearby_events, many=True)
-            return Response(serializer.data)
+            return self.paginated_response(nearby_events)
         return Response({'error': 'Paramètre city requis'}, status=status.HTTP_400_BAD_REQUEST)
     
+    def check_admission(self, request, pk):
+        """
+        Réponse 429 si l'événement a une salle d'attente et que la requête ne
+        présente pas de jeton admis (queue_token ou en-tête X-Queue-Token)
+        """
+        try:
+            event_id = int(pk)
+        except (TypeError, ValueError):
+            return None
+        if waiting_room.admission_rate(event_id) is None:
+            return None
+        token = request.data.get('queue_token') or request.headers.get('X-Queue-Token')
+        if waiting_room.is_admitted(token, event_id, request.user.pk):
+            return None
+        return Response(
+            {
+                'error': 'Inscriptions régulées : rejoignez la salle d\'attente',
+                'queue_url': reverse('event-queue', args=[event_id]),
+            },
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def queue(self, request, pk=None):
+        """
+        Rejoindre la salle d'attente d'un événement très demandé. Le jeton
+        renvoyé se suit sur status_url puis accompagne l'inscription.
+        """
+        try:
+            event_id = int(pk)
+        except ValueError:
+            raise Http404()
+        rate = waiting_room.admission_rate(event_id)
+        if rate is None:
+            return Response(
+                {'error': 'Cet événement n\'a pas de salle d\'attente'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        token = waiting_room.join(event_id, request.user.pk, rate)
+        data = waiting_room.status(waiting_room.read_token(token))
+        data['token'] = token
+        data['status_url'] = request.build_absolute_uri(reverse('waiting_room_status', args=[token]))
+        return Response(data, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def register(self, request, pk=None):
         """S'inscrire à un événement"""
+        rejected = self.check_admission(request, pk)
+        if rejected is not None:
+            return rejected
         event = self.get_object()
         
-        # Vérifier si l'utilisateur est déjà inscrit
-        existing_registration = EventRegistration.objects.filter(
-            event=event, 
-            user=request.user,
-            status__in=['confirmed', 'pending']
-        ).first()
+        # Vérifier que l'événement est publié
+        if event.status != 'published':
+            return Response(
+                {'error': 'Cet événement n\'est pas encore publié'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if existing_registration:
+        # Vérifier que l'événement n'est pas passé
+        if event.start_date <= timezone.now():
             return Response(
-                {'error': 'Vous êtes déjà inscrit à cet événement'},
+                {'error': 'Impossible de s\'inscrire à un événement passé'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Vérifier que l'événement n'est pas complet
-        if event.is_full:
+        # La place est réservée par un UPDATE conditionnel dans la même
+        # transaction que l'inscription : pas de surréservation possible
+        try:
+            registration = EventRegistration.objects.register(
+                event, request.user, notes=request.data.get('notes', '')
+            )
+        except AlreadyRegisteredError:
             return Response(
-                {'error': 'Cet événement est complet'},
+                {'error': 'Vous êtes déjà inscrit à cet événement'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Vérifier que l'événement est publié
+        # Événement complet : l'inscription est placée en liste d'attente
+        response_data = EventRegistrationSerializer(registration).data
+        if registration.status == 'waitlist':
+            response_data['waitlist_position'] = registration.waitlist_position()
+        # Chevauchement avec d'autres inscriptions : signalé, sans bloquer
+        warnings = schedule_conflicts.registration_warnings(request.user, event)
+        if warnings:
+            response_data['warnings'] = warnings
+        return Response(response_data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def hold(self, request, pk=None):
+        """
+        Retenir une place quelques minutes pendant la finalisation ; l'inscription
+        (POST register) confirme ensuite la place retenue
+        """
+        rejected = self.check_admission(request, pk)
+        if rejected is not None:
+            return rejected
+        event = self.get_object()
+        
         if event.status != 'published':
             return Response(
                 {'error': 'Cet événement n\'est pas encore publié'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if event.start_date <= timezone.now():
+            return Response(
+                {'error': 'Impossible de s\'inscrire à un événement passé'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Vérifier que l'événement n'est pas passé
-        from django.utils import timezone
+        try:
+            registration = EventRegistration.objects.hold(event, request.user)
+        except AlreadyRegisteredError:
+            return Response(
+                {'error': 'Vous êtes déjà inscrit à cet événement'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except EventFullError:
+            return Response(
+                {'error': 'Plus aucune place disponible', 'remaining_spots': 0},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(EventRegistrationSerializer(registration).data, status=status.HTTP_201_CREATED)
+    
+    @staticmethod
+    def list_param(data, name):
+        """
+        Valeurs d'un paramètre liste : clés répétées d'un formulaire, ou tableau
+        JSON. Tout autre type donne None (et non les caractères d'une chaîne).
+        """
+        if hasattr(data, 'getlist'):
+            return data.getlist(name)
+        value = data.get(name, [])
+        return value if isinstance(value, list) else None
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_register(self, request, pk=None):
+        """
+        Inscrire un groupe de participants (organisateur seulement).
+        Corps : {"users": [ids], "emails": [...], "mode": "fill" | "all_or_nothing", "notes": "",
+        "contiguous": false} ; contiguous exige des places côte à côte dans une salle numérotée
+        """
+        event = self.get_object()
+        
+        if event.organizer != request.user:
+            return Response(
+                {'error': 'Vous n\'avez pas l\'autorisation d\'inscrire des participants à cet événement'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if event.status != 'published':
+            return Response(
+                {'error': 'Cet événement n\'est pas encore publié'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if event.start_date <= timezone.now():
             return Response(
                 {'error': 'Impossible de s\'inscrire à un événement passé'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Créer l'inscription
+        mode = request.data.get('mode', 'fill')
+        if mode not in ('fill', 'all_or_nothing'):
+            return Response(
+                {'error': 'Paramètre mode invalide (fill ou all_or_nothing)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            user_ids = [int(user_id) for user_id in self.list_param(request.data, 'users')]
+        except (TypeError, ValueError):
+            return Response({'error': 'Paramètre users invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        emails_param = self.list_param(request.data, 'emails')
+        if emails_param is None or not all(isinstance(email, str) for email in emails_param):
+            return Response(
+                {'error': 'Paramètre emails invalide (liste d\'adresses attendue)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        emails = [email.strip().lower() for email in emails_param if email.strip()]
+        
+        if not user_ids and not emails:
+            return Response({'error': 'Aucun participant fourni'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) + len(emails) > self.BULK_REGISTER_LIMIT:
+            return Response(
+                {'error': f'Maximum {self.BULK_REGISTER_LIMIT} participants par requête'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Résolution des participants en une seule requête
+        email_filter = Q()
+        for email in emails:
+            email_filter |= Q(email__iexact=email)
+        found = list(User.objects.filter(Q(id__in=user_ids) | email_filter))
+        by_id = {user.id: user for user in found}
+        by_email = {user.email.lower(): user for user in found if user.email}
+        
+        rows = [('user', user_id, by_id.get(user_id)) for user_id in user_ids]
+        rows += [('email', email, by_email.get(email)) for email in emails]
+        users = list({user.id: user for _, _, user in rows if user is not None}.values())
+        
         try:
-            registration = EventRegistration.objects.create(
-                event=event,
-                user=request.user,
+            outcome = EventRegistration.objects.bulk_register(
+                event, users,
                 notes=request.data.get('notes', ''),
-                status='confirmed'
+                all_or_nothing=(mode == 'all_or_nothing'),
+                contiguous=str(request.data.get('contiguous', '')).lower() in ('1', 'true')
             )
-            
-            # Mettre à jour le nombre de participants
-            event.current_participants = EventRegistration.objects.filter(
-                event=event,
-                status='confirmed'
-            ).count()
-            event.save()
-            
-            response_serializer = EventRegistrationSerializer(registration)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
+        except NoContiguousSeatsError:
+            return Response(
+                {'error': 'Aucun bloc de places côte à côte assez grand pour le groupe'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except EventFullError:
             return Response(
-                {'error': f'Erreur lors de l\'inscription: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Places insuffisantes pour inscrire tout le groupe', 'remaining_spots': event.remaining_spots},
+                status=status.HTTP_409_CONFLICT
             )
+        except IntegrityError:
+            return Response(
+                {'error': 'Inscriptions concurrentes détectées, veuillez réessayer'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        results = [
+            {key: value, 'status': outcome.get(user.id, 'already_registered') if user else 'unknown_user'}
+            for key, value, user in rows
+        ]
+        statuses = list(outcome.values())
+        return Response({
+            'event_id': event.id,
+            'mode': mode,
+            'confirmed': statuses.count('confirmed'),
+            'waitlisted': statuses.count('waitlist'),
+            'remaining_spots': event.remaining_spots,
+            'results': results
+        }, status=status.HTTP_201_CREATED if statuses else status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'], permission_classes=[permissions.IsAuthenticated])
     def unregister(self, request, pk=None):
         """Se désinscrire d'un événement"""
         event = self.get_object()
         
-        try:
-            registration = EventRegistration.objects.get(
-                event=event, 
-                user=request.user,
-                status='confirmed'
-            )
-            registration.status = 'cancelled'
-            registration.save()
-            
-            # Mettre à jour le nombre de participants
-            event.current_participants = EventRegistration.objects.filter(
-                event=event,
-                status='confirmed'
-            ).count()
-            event.save()
-            
-            return Response({'message': 'Désinscription effectuée'}, status=status.HTTP_200_OK)
-        except EventRegistration.DoesNotExist:
+        registration = EventRegistration.objects.filter(
+            event=event,
+            user=request.user,
+            status__in=['confirmed', 'waitlist', 'held']
+        ).first()
+        if registration is None:
             return Response(
                 {'error': 'Vous n\'êtes pas inscrit à cet événement'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        registration.cancel()
+        return Response({'message': 'Désinscription effectuée'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def participants(self, request, pk=None):
@@ -444,42 +1056,80 @@ class EventViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
-    def export_participants(self, request, pk=None):
-        """Exporter la liste des participants en CSV (organisateur seulement)"""
+    def analytics(self, request, pk=None):
+        """
+        Courbe des inscriptions par jour (organisateur seulement), lue uniquement
+        dans les agrégats quotidiens. ?start= et ?end= (AAAA-MM-JJ) bornent la période.
+        """
         event = self.get_object()
         
-        # Vérifier que l'utilisateur est l'organisateur de l'événement
         if event.organizer != request.user:
             return Response(
-                {'error': 'Vous n\'avez pas l\'autorisation d\'exporter les participants de cet événement'},
+                {'error': 'Vous n\'avez pas l\'autorisation de voir les statistiques de cet événement'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        import csv
-        from django.http import HttpResponse
+        daily_stats = EventDailyStats.objects.filter(event=event)
+        for param, lookup in (('start', 'day__gte'), ('end', 'day__lte')):
+            value = request.query_params.get(param)
+            if value:
+                day = parse_date(value)
+                if day is None:
+                    return Response(
+                        {'error': f'Paramètre {param} invalide (format AAAA-MM-JJ attendu)'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                daily_stats = daily_stats.filter(**{lookup: day})
         
-        # Créer la réponse CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="participants_{event.title}_{event.id}.csv"'
+        series = list(daily_stats.values('day', 'confirmed', 'cancelled', 'waitlisted'))
+        views = EventViewStats.objects.filter(event=event).values('views_count', 'unique_visitors').first()
+        return Response({
+            'event_id': event.id,
+            'views': views or {'views_count': 0, 'unique_visitors': 0},
+            'totals': {
+                field: sum(row[field] for row in series)
+                for field in ('confirmed', 'cancelled', 'waitlisted')
+            },
+            'series': series
+        })
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export_participants(self, request, pk=None):
+        """
+        Exporter la liste des participants en CSV (organisateur seulement).
+        Le fichier est diffusé au fil de l'eau ; ?gzip=1 le compresse et
+        ?since=<date ISO> ne renvoie que les inscriptions postérieures.
+        """
+        event = self.get_object()
         
-        writer = csv.writer(response)
-        writer.writerow(['Prénom', 'Nom', 'Email', 'Date d\'inscription', 'Notes'])
+        # Vérifier que l'utilisateur est l'organisateur de l'événement
+        if event.organizer != request.user:
+            return Response(
+                {'error': 'Vous n\'avez pas l\'autorisation d\'exporter les participants de cet événement'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        # Récupérer les inscriptions confirmées
-        registrations = EventRegistration.objects.filter(
-            event=event,
-            status='confirmed'
-        ).select_related('user').order_by('registration_date')
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {'error': 'Paramètre since invalide (format ISO 8601 attendu)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
         
-        for registration in registrations:
-            writer.writerow([
-                registration.user.first_name,
-                registration.user.last_name,
-                registration.user.email,
-                registration.registration_date.strftime('%d/%m/%Y %H:%M'),
-                registration.notes or ''
-            ])
+        registrations = participant_registrations(event=event, since=since)
+        content = iter_participant_csv(registrations)
+        filename = f'participants_{event.title}_{event.id}.csv'
         
+        if request.query_params.get('gzip') in ('1', 'true'):
+            response = StreamingHttpResponse(gzip_stream(content), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(content, content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
 class EventRegistrationViewSet(viewsets.ModelViewSet):
@@ -490,79 +1140,7 @@ class EventRegistrationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
     
     def get_queryset(self):
-        return EventRegistration.objects.filter(user=self.request.user)
-
-class UserEventsViewSet(viewsets.ReadOnlyModelViewSet):
-    """
-    ViewSet pour récupérer les événements de l'utilisateur avec statistiques
-    """
-    permission_classes = [permissions.IsAuthenticated]
-    
-    @action(detail=False, methods=['get'])
-    def my_events(self, request):
-        """Récupérer les événements de l'utilisateur avec statistiques détaillées"""
-        user = request.user
-        
-        # Événements organisés par l'utilisateur
-        organized_events = Event.objects.filter(organizer=user).select_related('category')
-        
-        # Événements auxquels l'utilisateur est inscrit
-        registered_events = Event.objects.filter(
-            eventregistration__user=user,
-            eventregistration__status='confirmed'
-        ).select_related('category')
-        
-        # Statistiques pour les organisateurs
-        stats = {}
-        if organized_events.exists():
-            from django.db.models import Sum, Count
-            
-            # Calculer les statistiques
-            total_events = organized_events.count()
-            published_events = organized_events.filter(status='published').count()
-            upcoming_events = organized_events.filter(
-                start_date__gte=timezone.now(),
-                status='published'
-            ).count()
-            
-            # Total des inscriptions pour tous les événements de l'organisateur
-            total_registrations = EventRegistration.objects.filter(
-                event__organizer=user,
-                status='confirmed'
-            ).count()
-            
-            # Total des vues pour tous les événements
-            total_views = organized_events.aggregate(
-                total=Sum('views_count')
-            )['total'] or 0
-            
-            stats = {
-                'total_events': total_events,
-                'published_events': published_events,
-                'upcoming_events': upcoming_events,
-                'total_registrations': total_registrations,
-                'total_views': total_views
-            }
-        
-        # Sérialiser les données
-        organized_serializer = EventSerializer(organized_events, many=True)
-        registered_serializer = EventSerializer(registered_events, many=True)
-        
-        return Response({
-            'organized_events': organized_serializer.data,
-            'registered_events': registered_serializer.data,
-            'stats': stats
-        })
-    
-    def get_serializer_class(self):
-        if self.action == 'create':
-            return EventRegistrationCreateSerializer
-        elif self.action in ['update', 'partial_update']:
-            return EventRegistrationUpdateSerializer
-        return EventRegistrationSerializer
-    
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        return EventRegistration.objects.filter(user=self.request.user).select_related('event__seat_map')
 
 class EventImageViewSet(viewsets.ModelViewSet):
     """
@@ -607,3 +1185,37 @@ class EventCommentViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+class ExportJobViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet pour les exports en arrière-plan : création, suivi et téléchargement.
+    Les jobs sont traités par `python manage.py run_export_worker`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'head', 'options']
+    
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+    
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return ExportJobCreateSerializer
+        return ExportJobSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(user=request.user)
+        response_serializer = ExportJobSerializer(job, context=self.get_serializer_context())
+        return Response(response_serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Télécharger le fichier d'un export terminé"""
+        job = self.get_object()
+        if job.status != 'completed' or not job.file:
+            return Response(
+                {'error': 'Cet export n\'est pas encore disponible'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.split('/')[-1])
@@ -0,0 +1,151 @@
+"""
+Salle d'attente des événements très demandés.
+
+Un événement dont admission_rate est renseigné n'accepte les inscriptions
+(register, hold) que sur présentation d'un jeton d'admission. Rejoindre la
+file attribue une position (compteur atomique du cache) et une heure
+d'admission : les positions sont espacées de 60 / admission_rate secondes à
+partir de l'heure d'ouverture de la file. Quand la file s'est vidée, une
+nouvelle ouverture (nouveau compteur) repart de l'heure courante ; elle est
+posée une seule fois par cache.add, si bien que les arrivées simultanées
+reçoivent toutes des heures espacées. Le jeton signé porte cette heure : le
+suivi de la file ne lit ni la base ni le cache, et seules les requêtes
+admises atteignent la ligne de l'événement. Un jeton admis reste valable
+WAITING_ROOM_ADMISSION_WINDOW secondes, pour l'utilisateur qui l'a obtenu.
+
+La file est partagée entre les processus par le cache : elle ne peut être
+activée qu'avec un cache commun (Redis ou Memcached, voir REDIS_URL).
+"""
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache, caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+CACHE_PREFIX = 'waiting-room:'
+
+# Configuration de la file conservée en cache (relue en base au besoin)
+CONFIG_TTL = 300
+
+SALT = 'events.waiting_room'
+
+# Délai maximal conseillé entre deux vérifications de la file
+MAX_POLL_INTERVAL = 30
+
+# Durée de conservation du compteur d'une ouverture de file
+QUEUE_TTL = 24 * 3600
+
+# Caches dont les compteurs sont communs à tous les processus
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+def _key(event_id, name):
+    return f'{CACHE_PREFIX}{event_id}:{name}'
+
+
+def shared_cache():
+    """Le cache par défaut est-il commun à tous les processus ?"""
+    backend = caches['default']
+    return f'{type(backend).__module__}.{type(backend).__name__}' in SHARED_CACHE_BACKENDS
+
+
+def admission_rate(event_id):
+    """Admissions par minute, ou None si l'événement n'a pas de file (ou n'est pas publié)"""
+    from .models import Event
+
+    config = cache.get(_key(event_id, 'config'))
+    if config is None:
+        row = Event.objects.filter(pk=event_id).values_list('admission_rate', 'status').first()
+        rate = row[0] if row and row[1] == 'published' else None
+        config = {'rate': rate}
+        cache.set(_key(event_id, 'config'), config, CONFIG_TTL)
+    return config['rate']
+
+
+def _next_position(event_id, generation):
+    key = _key(event_id, f'position:{generation}')
+    cache.add(key, 0, QUEUE_TTL)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Compteur évincé entre add et incr
+        cache.add(key, 0, QUEUE_TTL)
+        return cache.incr(key)
+
+
+def _open(key, now):
+    """Ouverture stockée sous key, créée à l'heure courante si absente"""
+    opening = {'at': now, 'gen': uuid.uuid4().hex}
+    cache.add(key, opening, QUEUE_TTL)
+    return cache.get(key) or opening
+
+
+def join(event_id, user_id, rate):
+    """Jeton de l'utilisateur dans la file (le même tant qu'il est valable)"""
+    user_key = _key(event_id, f'user:{user_id}')
+    token = cache.get(user_key)
+    if token is not None:
+        return token
+
+    now = time.time()
+    interval = 60 / rate
+    opening = _open(_key(event_id, 'opened'), now)
+    while True:
+        position = _next_position(event_id, opening['gen'])
+        admit_at = opening['at'] + (position - 1) * interval
+        if admit_at >= now - interval:
+            break
+        # File vidée depuis : une seule réouverture par ouverture périmée,
+        # que toutes les arrivées simultanées relisent
+        opening = _open(_key(event_id, f'reopened:{opening["gen"]}'), now)
+        cache.set(_key(event_id, 'opened'), opening, None)
+
+    token = signing.dumps({'e': event_id, 'u': user_id, 'p': position, 'a': admit_at, 'r': rate}, salt=SALT)
+    cache.add(user_key, token, max(0, math.ceil(admit_at - now)) + settings.WAITING_ROOM_ADMISSION_WINDOW)
+    return token
+
+
+def read_token(token):
+    """Contenu du jeton, ou None s'il est invalide"""
+    try:
+        return signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+
+
+def status(payload, now=None):
+    """État d'un jeton décodé : admis, personnes devant, délai conseillé avant la prochaine vérification"""
+    now = now or time.time()
+    wait = payload['a'] - now
+    expires_at = payload['a'] + settings.WAITING_ROOM_ADMISSION_WINDOW
+    return {
+        'event_id': payload['e'],
+        'position': payload['p'],
+        'admitted': wait <= 0 and now <= expires_at,
+        'expired': now > expires_at,
+        'ahead': max(0, math.ceil(wait * payload['r'] / 60)),
+        'retry_after': max(0, min(math.ceil(wait), MAX_POLL_INTERVAL)),
+        'admission_expires_at': datetime.fromtimestamp(expires_at, tz=timezone.utc).isoformat(),
+    }
+
+
+def is_admitted(token, event_id, user_id):
+    payload = read_token(token or '')
+    if payload is None or payload['e'] != event_id or payload['u'] != user_id:
+        return False
+    return status(payload)['admitted']
+
+
+@receiver(post_save, sender='events.Event')
+@receiver(post_delete, sender='events.Event')
+def reset_config(sender, instance, **kwargs):
+    cache.delete(_key(instance.pk, 'config'))